@@ -422,6 +422,10 @@ ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS nivel_educativo TE
 ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS modalidad TEXT;
 ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS dedup_hash TEXT;
 ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS salario_imputado INTEGER;
+ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS empresa_norm TEXT;
+ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS search_tsv TSVECTOR;
+ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS minhash BYTEA;
+ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS near_dup_cluster TEXT;
 
 -- Deduplication index: prevents same job from appearing twice across portals
 CREATE UNIQUE INDEX IF NOT EXISTS idx_ofertas_dedup_hash
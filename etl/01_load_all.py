@@ -14,6 +14,10 @@ import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine, text
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from layer_versions import bump_layer_versions
+from simplified_layers import build_simplified
+
 # ============================================================
 # CONFIGURACIÓN
 # ============================================================
@@ -977,6 +981,15 @@ def main():
     try: load_nbi_regional()
     except Exception as e: report("nbi", "error", detail=str(e)[:50], dane_code="URABA")
 
+    # Invalida los tiles en caché de las capas cartográficas recargadas
+    reloaded = sorted({r["dataset"] for r in results if r["status"] == "ok"}
+                      & {"limite_municipal", "manzanas_censales"})
+    if reloaded:
+        with engine.begin() as conn:
+            if "limite_municipal" in reloaded:
+                build_simplified(conn, "cartografia", "limite_municipal", "geom")
+            bump_layer_versions(conn, reloaded)
+
     # Resumen Final
     print("\n" + "=" * 70)
     print("  RESUMEN FINAL ETL REGIONAL")
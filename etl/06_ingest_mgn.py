@@ -1,9 +1,15 @@
 import os
+import sys
+from pathlib import Path
 import geopandas as gpd
 import pandas as pd
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from layer_versions import bump_layer_versions
+from simplified_layers import build_simplified
+
 load_dotenv()
 
 # Municipios Urabá (Solo el código de municipio de 3 dígitos)
@@ -74,6 +80,8 @@ def ingest_mgn_veredas():
             DROP TABLE IF EXISTS cartografia.veredas_mgn;
             ALTER TABLE cartografia.veredas_mgn_temp RENAME TO veredas_mgn;
         """))
+        build_simplified(conn, "cartografia", "veredas_mgn", "geom")
+        bump_layer_versions(conn, ["veredas_mgn"])
     
     print("Ingesta completa exitosa (via WKT manual).")
 
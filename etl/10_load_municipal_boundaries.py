@@ -23,6 +23,8 @@ from sqlalchemy import create_engine, text
 # ---------------------------------------------------------------------------
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 from config import DB_URL
+from layer_versions import bump_layer_versions
+from simplified_layers import build_simplified
 
 GEOJSON_PATH = next(
     (p for p in [
@@ -157,6 +159,13 @@ def main():
         ))
         print("  Indice espacial creado")
 
+        # Versiones simplificadas por zoom para /api/geo/uraba y /api/layers
+        build_simplified(conn, "cartografia", "limite_municipal", "geom")
+        build_simplified(conn, "cartografia", "igac_uraba", "geometry")
+
+        # Invalida los tiles en caché de ambas capas
+        bump_layer_versions(conn, ["limite_municipal", "igac_uraba"])
+
     print("\nDone!")
 
 
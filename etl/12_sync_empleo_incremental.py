@@ -4,13 +4,25 @@ ETL 12 — Sync incremental de ofertas laborales SQLite → Supabase
 =================================================================
 Lee nuevas ofertas desde ~/uraba_empleos/empleos_uraba.db
 y las inserta en empleo.ofertas_laborales (PostgreSQL/Supabase).
-Solo inserta ofertas que no existen ya (por content_hash).
+Solo lee las filas de SQLite posteriores a la marca de agua de cada fuente
+(empleo.sync_watermarks, ver sync_state) y solo inserta ofertas que no
+existen ya: content_hash y dedup_hash se verifican en PostgreSQL.
+
+El enriquecimiento (skills, sector, salario, ...) corre en paralelo en un
+pool de procesos (enrichment_pipeline) y las ofertas se cargan con COPY a
+una tabla staging y un único INSERT ... ON CONFLICT (bulk_io). Antes de
+insertarse, cada oferta recibe su firma MinHash y su near_dup_cluster
+(near_dup): las reposteadas en otro portal con otro texto quedan en el
+mismo cluster.
 
 Uso:
   python etl/12_sync_empleo_incremental.py
+  python etl/12_sync_empleo_incremental.py --workers 4 --chunk-size 200
+  python etl/12_sync_empleo_incremental.py --full   # ignora las marcas de agua
   # O con cron / GitHub Actions para sync automático
 """
 
+import argparse
 import sqlite3
 import sys
 from pathlib import Path
@@ -21,54 +33,34 @@ from config import DB_URL
 
 SQLITE_PATH = Path.home() / "uraba_empleos" / "empleos_uraba.db"
 
-from etl_sync import (
-    extract_skills,
-    classify_sector,
-    extract_enrichment,
-    parse_salary,
-    get_dane_code,
-    compute_dedup_hash,
-)
+from analytics_refresh import refresh_analytics
+from enrichment_pipeline import DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS, enrich_stream
+from bulk_io import bulk_insert_offers
+from etl_sync import get_dane_code, search_fields
+from near_dup import NearDupAssigner
+from sync_state import WatermarkTracker, load_watermarks, pending_rows_sql, save_watermarks
+
+WATERMARK_SOURCE = "sqlite_ofertas"
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Sync incremental de ofertas SQLite → PostgreSQL")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Procesos de enriquecimiento (1 = sin pool)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Ofertas por lote enviado a cada proceso")
+    parser.add_argument("--full", action="store_true",
+                        help="Releer todo el SQLite (la deduplicación en PG evita repetidos)")
+    args = parser.parse_args()
+
     if not SQLITE_PATH.exists():
         print(f"ERROR: No se encontró {SQLITE_PATH}")
         sys.exit(1)
 
     engine = create_engine(DB_URL, pool_size=1, max_overflow=0)
 
-    # Get existing hashes from PG (both content_hash and dedup_hash)
-    with engine.connect() as conn:
-        existing_content = set()
-        existing_dedup = set()
-        try:
-            rows = conn.execute(text(
-                "SELECT content_hash, dedup_hash FROM empleo.ofertas_laborales "
-                "WHERE content_hash IS NOT NULL OR dedup_hash IS NOT NULL"
-            )).fetchall()
-            existing_content = {r[0] for r in rows if r[0]}
-            existing_dedup = {r[1] for r in rows if r[1]}
-        except Exception:
-            print("WARN: Table empleo.ofertas_laborales may not exist, will try to create")
-
-    print(f"  {len(existing_content)} ofertas existentes (content_hash)")
-    print(f"  {len(existing_dedup)} ofertas existentes (dedup_hash)")
-
-    # Read SQLite
     conn_sqlite = sqlite3.connect(str(SQLITE_PATH))
     conn_sqlite.row_factory = sqlite3.Row
-    all_rows = conn_sqlite.execute("SELECT * FROM ofertas ORDER BY id").fetchall()
-    print(f"  {len(all_rows)} ofertas en SQLite")
-
-    new_rows = [r for r in all_rows if r['content_hash'] not in existing_content]
-    print(f"  {len(new_rows)} nuevas ofertas (por content_hash) para sincronizar")
-
-    if not new_rows:
-        print("Nada nuevo para sincronizar.")
-        conn_sqlite.close()
-        engine.dispose()
-        return
 
     with engine.begin() as conn:
         # Ensure table exists
@@ -97,8 +89,10 @@ def main():
             )
         """))
         # Add new columns if table already exists (idempotent)
-        for col in ['nivel_experiencia', 'tipo_contrato', 'nivel_educativo', 'modalidad', 'dedup_hash']:
+        for col in ['nivel_experiencia', 'tipo_contrato', 'nivel_educativo', 'modalidad', 'dedup_hash',
+                    'empresa_norm']:
             conn.execute(text(f"ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS {col} TEXT"))
+        conn.execute(text("ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS search_tsv TSVECTOR"))
 
         # Create unique index on dedup_hash for cross-portal deduplication
         conn.execute(text("""
@@ -106,73 +100,60 @@ def main():
             ON empleo.ofertas_laborales (dedup_hash)
             WHERE dedup_hash IS NOT NULL
         """))
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_ofertas_content_hash
+            ON empleo.ofertas_laborales (content_hash)
+            WHERE content_hash IS NOT NULL
+        """))
 
-        inserted = 0
-        skipped_dedup = 0
-        for row in new_rows:
-            titulo = row['titulo']
-            desc = row['descripcion']
-            municipio = row['municipio']
-            empresa = row['empresa']
-
-            # Cross-portal dedup: skip if same title+company+municipality already exists
-            dedup = compute_dedup_hash(titulo, empresa, municipio)
-            if dedup in existing_dedup:
-                skipped_dedup += 1
-                continue
-
-            skills = extract_skills(titulo, desc)
-            sector = classify_sector(titulo, desc)
-            salario_num = parse_salary(row['salario'])
-            dane = get_dane_code(municipio)
-            enrich = extract_enrichment(titulo, desc)
-
-            fecha_pub = row['fecha_pub']
-            if fecha_pub and '/' in fecha_pub:
-                parts = fecha_pub.split('/')
-                if len(parts) == 3:
-                    fecha_pub = f"{parts[2]}-{parts[1]}-{parts[0]}"
-
-            conn.execute(text("""
-                INSERT INTO empleo.ofertas_laborales
-                    (titulo, empresa, salario_texto, salario_numerico, descripcion,
-                     fecha_publicacion, enlace, municipio, dane_code, fuente,
-                     sector, skills, fecha_scraping, content_hash, dedup_hash,
-                     nivel_experiencia, tipo_contrato, nivel_educativo, modalidad)
-                VALUES
-                    (:titulo, :empresa, :salario_texto, :salario_num, :descripcion,
-                     :fecha_pub, :enlace, :municipio, :dane, :fuente,
-                     :sector, :skills, :fecha_scraping, :hash, :dedup_hash,
-                     :nivel_experiencia, :tipo_contrato, :nivel_educativo, :modalidad)
-                ON CONFLICT (dedup_hash) WHERE dedup_hash IS NOT NULL DO NOTHING
-            """), {
-                "titulo": titulo,
-                "empresa": empresa,
-                "salario_texto": row['salario'],
-                "salario_num": salario_num,
-                "descripcion": desc,
-                "fecha_pub": fecha_pub if fecha_pub else None,
-                "enlace": row['enlace'],
-                "municipio": municipio,
-                "dane": dane,
-                "fuente": row['fuente'],
-                "sector": sector,
-                "skills": skills,
-                "fecha_scraping": row['fecha_scraping'],
-                "hash": row['content_hash'],
-                "dedup_hash": dedup,
-                "nivel_experiencia": enrich['nivel_experiencia'],
-                "tipo_contrato": enrich['tipo_contrato'],
-                "nivel_educativo": enrich['nivel_educativo'],
-                "modalidad": enrich['modalidad'],
-            })
-            existing_dedup.add(dedup)
-            inserted += 1
-
+        marks = {} if args.full else load_watermarks(conn, WATERMARK_SOURCE)
+        print(f"  Marcas de agua: {marks or 'ninguna (lectura completa)'}")
+        sql, params = pending_rows_sql(marks)
+        tracker = WatermarkTracker()
+
+        def pending_rows():
+            # Streaming cursor over the SQLite rows past the watermarks
+            for r in conn_sqlite.execute(sql, params):
+                tracker.see(r)
+                yield dict(r)
+
+        def staged_rows():
+            for row in enrich_stream(pending_rows(), args.workers, args.chunk_size):
+                fecha_pub = row['fecha_pub']
+                if fecha_pub and '/' in fecha_pub:
+                    parts = fecha_pub.split('/')
+                    if len(parts) == 3:
+                        fecha_pub = f"{parts[2]}-{parts[1]}-{parts[0]}"
+
+                yield {
+                    **row,
+                    "salario_texto": row['salario'],
+                    "fecha_publicacion": fecha_pub if fecha_pub else None,
+                    "dane_code": get_dane_code(row['municipio']),
+                    **search_fields(row['titulo'], row['empresa'], row['descripcion']),
+                }
+
+        # COPY into a staging table + one INSERT that skips known content_hash /
+        # dedup_hash in PostgreSQL (indexed lookups, no hash sets in memory).
+        # Near-duplicate clusters are assigned per chunk on the way in.
+        near_dup = NearDupAssigner(conn)
+        inserted, skipped, hashes = bulk_insert_offers(conn, near_dup.stream(staged_rows()))
+        near_dup.write(hashes)
+        save_watermarks(conn, WATERMARK_SOURCE, tracker.marks)
+
+        print(f"  {inserted + skipped} ofertas nuevas leídas de SQLite")
         print(f"  Insertadas: {inserted} nuevas ofertas")
-        print(f"  Omitidas por deduplicación cross-portal: {skipped_dedup}")
+        print(f"  Omitidas (ya existentes o duplicadas cross-portal): {skipped}")
 
     conn_sqlite.close()
+
+    if not inserted:
+        print("Nada nuevo para sincronizar.")
+    # Siempre: las vistas también deben reflejar cambios en filas existentes
+    # (backfills, correcciones manuales) hechos desde el último refresh
+    print("\nRefrescando vistas analytics...")
+    refresh_analytics(engine)
+
     engine.dispose()
     print("Sync completado!")
 
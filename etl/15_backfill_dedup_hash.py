@@ -10,6 +10,8 @@ from sqlalchemy import create_engine, text
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 from config import DB_URL
 from etl_sync import compute_dedup_hash
+from bulk_io import bulk_update
+from analytics_refresh import refresh_analytics
 
 def main():
     engine = create_engine(DB_URL, pool_size=1, max_overflow=0)
@@ -35,19 +37,16 @@ def main():
             duplicates.append(row_id)
         else:
             seen_hashes[h] = row_id
-            updates.append((row_id, h))
+            updates.append({"id": row_id, "dedup_hash": h})
 
     print(f"  {len(updates)} unique rows to update")
     print(f"  {len(duplicates)} duplicate rows to remove")
 
-    with engine.begin() as conn:
-        # Update unique rows
-        for row_id, h in updates:
-            conn.execute(
-                text("UPDATE empleo.ofertas_laborales SET dedup_hash = :h WHERE id = :id"),
-                {"h": h, "id": row_id},
-            )
+    # Update unique rows (COPY + one UPDATE ... FROM per chunk)
+    bulk_update(engine, "empleo.ofertas_laborales", ("id", "INTEGER"),
+                [("dedup_hash", "TEXT")], updates, label="dedup_hash")
 
+    with engine.begin() as conn:
         # Delete duplicates
         if duplicates:
             conn.execute(
@@ -55,6 +54,9 @@ def main():
                 {"ids": duplicates},
             )
 
+    print("  Refreshing analytics views...")
+    refresh_analytics(engine)
+
     engine.dispose()
     print(f"  Backfill complete. Updated: {len(updates)}, Removed: {len(duplicates)}")
 
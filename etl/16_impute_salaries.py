@@ -9,8 +9,14 @@ Fallback chain:
   2. sector + municipio (≥3 muestra)
   3. sector alone (≥3 muestra)
 
+Las medianas se calculan con groupby de pandas y se asignan con merges
+(salary_imputation), sin bucle por oferta. Solo se recalculan los sectores
+cuyas ofertas cambiaron desde la última corrida (huella por sector en
+empleo.salario_imputacion_estado); --full recalcula todo.
+
 Writes result to empleo.ofertas_laborales.salario_imputado.
 """
+import argparse
 import os
 import sys
 from pathlib import Path
@@ -20,6 +26,11 @@ sys.path.insert(0, str(Path(__file__).resolve().parent))
 
 from sqlalchemy import create_engine, text
 
+from analytics_refresh import refresh_analytics
+from bulk_io import bulk_update
+from salary_imputation import (changed_sectors, impute, level_counts, load_offers, load_state,
+                               save_state, sector_fingerprints, sector_keys, to_updates)
+
 DATABASE_URL = os.environ.get("DATABASE_URL")
 if not DATABASE_URL:
     print("ERROR: DATABASE_URL not set")
@@ -38,113 +49,11 @@ def ensure_column():
     print("[OK] Column salario_imputado ensured.")
 
 
-def build_reference_table(conn):
-    """Build salary reference medians at different granularity levels."""
-    # Level 1: Full granularity
-    level1 = conn.execute(text("""
-        SELECT sector, municipio, nivel_educativo, nivel_experiencia,
-               PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY salario_numerico) as mediana,
-               COUNT(*) as muestra
-        FROM empleo.ofertas_laborales
-        WHERE salario_numerico IS NOT NULL
-        GROUP BY sector, municipio, nivel_educativo, nivel_experiencia
-        HAVING COUNT(*) >= 3
-    """)).fetchall()
-
-    # Level 2: sector + municipio
-    level2 = conn.execute(text("""
-        SELECT sector, municipio,
-               PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY salario_numerico) as mediana,
-               COUNT(*) as muestra
-        FROM empleo.ofertas_laborales
-        WHERE salario_numerico IS NOT NULL
-        GROUP BY sector, municipio
-        HAVING COUNT(*) >= 3
-    """)).fetchall()
-
-    # Level 3: sector only
-    level3 = conn.execute(text("""
-        SELECT sector,
-               PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY salario_numerico) as mediana,
-               COUNT(*) as muestra
-        FROM empleo.ofertas_laborales
-        WHERE salario_numerico IS NOT NULL
-        GROUP BY sector
-        HAVING COUNT(*) >= 3
-    """)).fetchall()
-
-    # Build lookup dicts
-    ref1 = {}
-    for r in level1:
-        key = (r[0], r[1], r[2], r[3])
-        ref1[key] = int(r[4])
-
-    ref2 = {}
-    for r in level2:
-        key = (r[0], r[1])
-        ref2[key] = int(r[2])
-
-    ref3 = {}
-    for r in level3:
-        ref3[r[0]] = int(r[1])
-
-    print(f"  Reference tables: L1={len(ref1)} | L2={len(ref2)} | L3={len(ref3)}")
-    return ref1, ref2, ref3
-
-
-def impute(conn, ref1, ref2, ref3):
-    """Impute salaries for offers missing salario_numerico."""
-    # Reset previous imputations
-    conn.execute(text("UPDATE empleo.ofertas_laborales SET salario_imputado = NULL"))
-
-    # Fetch offers without salary
-    rows = conn.execute(text("""
-        SELECT id, sector, municipio, nivel_educativo, nivel_experiencia
-        FROM empleo.ofertas_laborales
-        WHERE salario_numerico IS NULL
-    """)).fetchall()
-
-    print(f"  Offers without salary: {len(rows)}")
-
-    updates = []
-    l1_hits = l2_hits = l3_hits = misses = 0
-
-    for row in rows:
-        oid, sector, muni, edu, exp = row
-
-        # Try level 1
-        key1 = (sector, muni, edu, exp)
-        if key1 in ref1:
-            updates.append({"oid": oid, "sal": ref1[key1]})
-            l1_hits += 1
-            continue
-
-        # Try level 2
-        key2 = (sector, muni)
-        if key2 in ref2:
-            updates.append({"oid": oid, "sal": ref2[key2]})
-            l2_hits += 1
-            continue
-
-        # Try level 3
-        if sector in ref3:
-            updates.append({"oid": oid, "sal": ref3[sector]})
-            l3_hits += 1
-            continue
-
-        misses += 1
-
-    # Batch update
-    if updates:
-        for batch_start in range(0, len(updates), 500):
-            batch = updates[batch_start:batch_start + 500]
-            for u in batch:
-                conn.execute(text(
-                    "UPDATE empleo.ofertas_laborales SET salario_imputado = :sal WHERE id = :oid"
-                ), u)
-
-    print(f"  Imputed: L1={l1_hits} | L2={l2_hits} | L3={l3_hits} | Misses={misses}")
-    print(f"  Total imputed: {len(updates)} / {len(rows)} ({round(len(updates)/max(len(rows),1)*100, 1)}%)")
+def write_imputations(updates):
+    """Apply *updates* set-based, touching only rows whose value changes."""
+    changed = bulk_update(engine, "empleo.ofertas_laborales", ("id", "INTEGER"),
+                          [("salario_imputado", "INTEGER")], updates, label="salario_imputado")
+    print(f"  Rows changed: {changed}")
 
 
 def main():
@@ -152,11 +61,41 @@ def main():
     print("ETL 16: Salary Imputation")
     print("=" * 60)
 
+    parser = argparse.ArgumentParser(description="Imputación salarial por mediana jerárquica")
+    parser.add_argument("--full", action="store_true",
+                        help="Recalcular todos los sectores aunque no hayan cambiado")
+    args = parser.parse_args()
+
     ensure_column()
 
+    with engine.connect() as conn:
+        offers = load_offers(conn)
+        previous = {} if args.full else load_state(conn)
+
+    fingerprints = sector_fingerprints(offers)
+    changed = changed_sectors(fingerprints, previous)
+    print(f"  Sectors changed: {len(changed)} / {len(fingerprints)}")
+    if not changed:
+        print("[DONE] Nothing changed since the last run.")
+        return
+
+    subset = offers[sector_keys(offers).isin(changed).to_numpy()]
+    result = impute(subset)
+    hits = level_counts(result, subset)
+    without = sum(hits.values())
+    imputed = without - hits["misses"]
+    print(f"  Offers without salary: {without}")
+    print(f"  Imputed: L1={hits['L1']} | L2={hits['L2']} | L3={hits['L3']} | Misses={hits['misses']}")
+    print(f"  Total imputed: {imputed} / {without} ({round(imputed/max(without,1)*100, 1)}%)")
+
+    # Offers of the recomputed sectors that have a real salary get NULL here,
+    # so imputations made before the salary was known are cleared too
+    write_imputations(to_updates(result))
     with engine.begin() as conn:
-        ref1, ref2, ref3 = build_reference_table(conn)
-        impute(conn, ref1, ref2, ref3)
+        save_state(conn, fingerprints, changed)
+
+    print("Refreshing analytics views...")
+    refresh_analytics(engine)
 
     print("[DONE] Salary imputation complete.")
 
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+ETL 17 — Pre-generar tiles vectoriales de las capas cartográficas estáticas
+==========================================================================
+Renderiza con la misma lógica del API (ST_AsMVT) todos los tiles del bbox
+de Urabá (unión de los bbox de config.MUNICIPIOS) para un rango de zooms y
+los guarda en el archivo MBTiles que sirve /api/layers/{id}/tiles.
+
+Los tiles quedan asociados a la versión actual de cada capa
+(cartografia.layer_versions); cuando un loader ETL vuelve a cargar la capa
+su versión sube y los tiles viejos dejan de servirse.
+
+Uso:
+  python etl/17_seed_tile_cache.py --min-zoom 6 --max-zoom 12
+  python etl/17_seed_tile_cache.py --layers limite_municipal --path /tmp/tiles.mbtiles
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from config import DB_URL, MUNICIPIOS
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_URL", DB_URL)
+
+from src.backend.routers.layers import (  # noqa: E402
+    STATIC_TILE_LAYERS,
+    _layer_attributes,
+    _layer_version,
+    render_tile,
+)
+from src.backend.tile_cache import TileCache, tiles_for_bbox  # noqa: E402
+
+
+def uraba_bbox():
+    """Union of the municipal bounding boxes."""
+    return [
+        min(b[0] for _, _, b in MUNICIPIOS),
+        min(b[1] for _, _, b in MUNICIPIOS),
+        max(b[2] for _, _, b in MUNICIPIOS),
+        max(b[3] for _, _, b in MUNICIPIOS),
+    ]
+
+
+def seed(cache: TileCache, layers, min_zoom: int, max_zoom: int, force: bool = False):
+    bbox = uraba_bbox()
+    for layer_id in layers:
+        version = _layer_version(layer_id)
+        fields = _layer_attributes(layer_id)
+        pruned = cache.prune(layer_id, version)
+        print(f"\n--- {layer_id} (versión {version}, {pruned} tiles viejos eliminados) ---")
+        for z in range(min_zoom, max_zoom + 1):
+            t0 = time.time()
+            rendered = skipped = empty = 0
+            for x, y in tiles_for_bbox(bbox, z):
+                if not force and cache.get(layer_id, version, z, x, y) is not None:
+                    skipped += 1
+                    continue
+                tile = render_tile(layer_id, z, x, y, fields)
+                cache.put(layer_id, version, z, x, y, tile)
+                rendered += 1
+                empty += not tile
+            print(f"  z{z}: {rendered} renderizados ({empty} vacíos), "
+                  f"{skipped} ya en caché — {time.time() - t0:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generar tiles MVT de capas estáticas")
+    parser.add_argument("--path", default=os.getenv("TILE_CACHE_PATH", "observatorio-tiles.mbtiles"))
+    parser.add_argument("--layers", nargs="+", default=list(STATIC_TILE_LAYERS),
+                        choices=STATIC_TILE_LAYERS)
+    parser.add_argument("--min-zoom", type=int, default=6)
+    parser.add_argument("--max-zoom", type=int, default=12)
+    parser.add_argument("--force", action="store_true", help="Re-renderizar tiles ya cacheados")
+    args = parser.parse_args()
+
+    if args.min_zoom > args.max_zoom:
+        parser.error("--min-zoom debe ser <= --max-zoom")
+
+    print(f"Tile cache: {args.path}")
+    cache = TileCache(args.path)
+    seed(cache, args.layers, args.min_zoom, args.max_zoom, force=args.force)
+    print(f"\nTotal tiles en caché: {cache.count()}")
+
+
+if __name__ == "__main__":
+    main()
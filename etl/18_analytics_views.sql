@@ -0,0 +1,128 @@
+-- ============================================================
+-- Migration: analytics schema — materialized views for /api/analytics/laboral/*
+-- ============================================================
+-- Pre-aggregated versions of the heavy GROUP BY / UNNEST / PERCENTILE_CONT
+-- queries of routers/analytics.py. Each view has a unique index so it can be
+-- refreshed with REFRESH MATERIALIZED VIEW CONCURRENTLY (readers are never
+-- blocked). Idempotent; refreshed by etl/analytics_refresh.py, which the
+-- ETLs that write empleo.ofertas_laborales call when they finish.
+--
+-- Views only depend on empleo.ofertas_laborales, so cartography loaders can
+-- still DROP/CREATE their tables (coordinates are joined at read time).
+--
+-- Every view counts one offer per vacancy: the representative of each
+-- near-duplicate cluster (near_dup_cluster = dedup_hash, etl/near_dup.py)
+-- and the offers not clustered yet, i.e. one row per
+-- COALESCE(near_dup_cluster, dedup_hash). Same filter as every aggregate
+-- of the API (UNICAS_CONDITION in src/backend/services/empleo_cube.py).
+
+CREATE SCHEMA IF NOT EXISTS analytics;
+
+-- Requires the salario_imputado, dedup_hash and near_dup_cluster columns
+-- (00_schema.sql, or migrations 14 and 22 plus ETL 16 on older databases).
+-- analytics_refresh.py only runs this file when a view is missing or
+-- predates the per-vacancy filter, so no DDL touches the table on syncs.
+
+-- Views created before the per-vacancy filter are rebuilt once
+DO $$
+DECLARE
+    v RECORD;
+BEGIN
+    FOR v IN SELECT matviewname FROM pg_matviews
+             WHERE schemaname = 'analytics' AND strpos(definition, 'near_dup_cluster') = 0
+    LOOP
+        EXECUTE 'DROP MATERIALIZED VIEW analytics.' || quote_ident(v.matviewname);
+    END LOOP;
+END $$;
+
+-- 1. Concentración laboral por municipio
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics.concentracion_municipio AS
+SELECT
+    o.municipio,
+    o.dane_code,
+    COUNT(*) AS ofertas,
+    COUNT(DISTINCT o.empresa) AS empresas,
+    COUNT(DISTINCT o.sector) AS sectores,
+    ROUND(AVG(o.salario_numerico)) AS salario_promedio,
+    STRING_AGG(DISTINCT o.sector, ', ' ORDER BY o.sector) AS sectores_presentes
+FROM empleo.ofertas_laborales o
+WHERE o.dane_code IS NOT NULL
+  AND (o.near_dup_cluster IS NULL OR o.near_dup_cluster = o.dedup_hash)
+GROUP BY o.municipio, o.dane_code;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_concentracion_municipio
+ON analytics.concentracion_municipio (dane_code, municipio);
+
+-- 2. Cadenas productivas: sector × municipio y demanda de skills por sector
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics.sector_municipio AS
+SELECT sector, municipio, COUNT(*) AS ofertas,
+       COUNT(DISTINCT empresa) AS empresas,
+       ROUND(AVG(salario_numerico)) AS salario_promedio
+FROM empleo.ofertas_laborales
+WHERE sector IS NOT NULL AND (near_dup_cluster IS NULL OR near_dup_cluster = dedup_hash)
+GROUP BY sector, municipio;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_sector_municipio
+ON analytics.sector_municipio (sector, municipio);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics.sector_skill AS
+SELECT sector, skill, COUNT(*) AS demanda
+FROM empleo.ofertas_laborales, UNNEST(skills) AS skill
+WHERE sector IS NOT NULL AND (near_dup_cluster IS NULL OR near_dup_cluster = dedup_hash)
+GROUP BY sector, skill;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_sector_skill
+ON analytics.sector_skill (sector, skill);
+
+-- 3. Estacionalidad: mes × sector (suma y conteo de salarios para promediar por mes)
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics.estacionalidad_mes_sector AS
+SELECT EXTRACT(MONTH FROM fecha_publicacion)::int AS mes,
+       sector,
+       COUNT(*) AS ofertas,
+       SUM(salario_numerico) AS salario_suma,
+       COUNT(salario_numerico) AS salario_n
+FROM empleo.ofertas_laborales
+WHERE fecha_publicacion IS NOT NULL AND (near_dup_cluster IS NULL OR near_dup_cluster = dedup_hash)
+GROUP BY mes, sector;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_estacionalidad_mes_sector
+ON analytics.estacionalidad_mes_sector (mes, sector);
+
+-- 4. Informalidad: tipos de contrato por municipio
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics.contratos_municipio AS
+SELECT municipio, dane_code,
+       COUNT(*) AS total_ofertas,
+       COUNT(CASE WHEN tipo_contrato IN ('Prestacion de servicios', 'Obra o labor') THEN 1 END) AS no_indefinido,
+       COUNT(CASE WHEN tipo_contrato = 'Indefinido' THEN 1 END) AS indefinido
+FROM empleo.ofertas_laborales
+WHERE tipo_contrato IS NOT NULL AND dane_code IS NOT NULL
+  AND (near_dup_cluster IS NULL OR near_dup_cluster = dedup_hash)
+GROUP BY municipio, dane_code;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_contratos_municipio
+ON analytics.contratos_municipio (dane_code, municipio);
+
+-- 5. Salario imputado: tabla de referencia y cobertura
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics.salario_referencia AS
+SELECT sector, municipio, nivel_educativo, nivel_experiencia,
+       ROUND(AVG(salario_numerico)) AS salario_estimado,
+       COUNT(*) AS muestra,
+       PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY salario_numerico) AS mediana
+FROM empleo.ofertas_laborales
+WHERE salario_numerico IS NOT NULL AND (near_dup_cluster IS NULL OR near_dup_cluster = dedup_hash)
+GROUP BY sector, municipio, nivel_educativo, nivel_experiencia
+HAVING COUNT(*) >= 3;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_salario_referencia
+ON analytics.salario_referencia (sector, municipio, nivel_educativo, nivel_experiencia);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics.salario_cobertura AS
+SELECT 1 AS id,
+       COUNT(*) AS total,
+       COUNT(CASE WHEN salario_numerico IS NOT NULL THEN 1 END) AS con_salario,
+       COUNT(CASE WHEN salario_imputado IS NOT NULL THEN 1 END) AS con_imputado
+FROM empleo.ofertas_laborales
+WHERE (near_dup_cluster IS NULL OR near_dup_cluster = dedup_hash);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_salario_cobertura
+ON analytics.salario_cobertura (id);
@@ -0,0 +1,38 @@
+-- ============================================================
+-- Migration: indexes for keyset (cursor) pagination
+-- ============================================================
+-- /api/empleo/ofertas and /api/geo/places/directory page with
+-- WHERE (sort_key, id) < (cursor) ORDER BY sort_key, id LIMIT n (> for ASC).
+-- An index matching each ORDER BY lets PostgreSQL start at the cursor and
+-- read only n rows, whatever the depth of the page.
+
+-- 1. Ofertas: ORDER BY fecha_publicacion DESC NULLS LAST, id DESC
+CREATE INDEX IF NOT EXISTS idx_ofertas_fecha_id
+ON empleo.ofertas_laborales (fecha_publicacion DESC NULLS LAST, id DESC);
+
+-- 2. Directorio de negocios: ORDER BY <columna> {ASC|DESC} NULLS LAST,
+-- place_id {ASC|DESC}. A backward scan of an ASC NULLS LAST index yields
+-- DESC NULLS FIRST, so each direction needs its own index.
+CREATE INDEX IF NOT EXISTS idx_places_name_id
+ON servicios.google_places_regional (name NULLS LAST, place_id);
+
+CREATE INDEX IF NOT EXISTS idx_places_category_id
+ON servicios.google_places_regional (category NULLS LAST, place_id);
+
+CREATE INDEX IF NOT EXISTS idx_places_rating_id
+ON servicios.google_places_regional (rating NULLS LAST, place_id);
+
+CREATE INDEX IF NOT EXISTS idx_places_ratings_total_id
+ON servicios.google_places_regional (user_ratings_total NULLS LAST, place_id);
+
+CREATE INDEX IF NOT EXISTS idx_places_name_id_desc
+ON servicios.google_places_regional (name DESC NULLS LAST, place_id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_places_category_id_desc
+ON servicios.google_places_regional (category DESC NULLS LAST, place_id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_places_rating_id_desc
+ON servicios.google_places_regional (rating DESC NULLS LAST, place_id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_places_ratings_total_id_desc
+ON servicios.google_places_regional (user_ratings_total DESC NULLS LAST, place_id DESC);
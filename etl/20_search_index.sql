@@ -0,0 +1,39 @@
+-- ============================================================
+-- Migration: full-text and trigram search for ofertas and places
+-- ============================================================
+-- Replaces the leading-wildcard ILIKE of /api/empleo/ofertas?busqueda= and
+-- /api/geo/places/directory?search= (sequential scans over descripcion)
+-- with GIN-indexed lookups:
+--   * search_tsv: weighted tsvector (título A, empresa B, descripción C)
+--     written by the sync ETL from accent-folded text (etl_sync._normalize)
+--   * empresa_norm: folded company name with a trigram index (fuzzy match)
+--   * places: trigram indexes on f_unaccent(lower(name/address))
+-- After running it, fill existing rows with:
+--   python etl/21_backfill_search.py
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() is STABLE (it depends on the dictionary search path); pinning the
+-- dictionary makes it safe to use in index expressions.
+CREATE OR REPLACE FUNCTION public.f_unaccent(text)
+RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
+-- 1. Ofertas
+ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS search_tsv TSVECTOR;
+ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS empresa_norm TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_ofertas_search_tsv
+ON empleo.ofertas_laborales USING GIN (search_tsv);
+
+CREATE INDEX IF NOT EXISTS idx_ofertas_empresa_trgm
+ON empleo.ofertas_laborales USING GIN (empresa_norm gin_trgm_ops);
+
+-- 2. Directorio de negocios
+CREATE INDEX IF NOT EXISTS idx_places_name_trgm
+ON servicios.google_places_regional USING GIN (f_unaccent(lower(name)) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_places_address_trgm
+ON servicios.google_places_regional USING GIN (f_unaccent(lower(address)) gin_trgm_ops);
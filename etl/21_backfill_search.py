@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+ETL 21 — Backfill search_tsv / empresa_norm for existing ofertas_laborales rows.
+Run after etl/20_search_index.sql; new offers get both columns from ETL 12.
+"""
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from config import DB_URL
+from etl_sync import search_fields, SEARCH_TSV_SQL
+
+BATCH_SIZE = 1000
+
+
+def main():
+    engine = create_engine(DB_URL, pool_size=1, max_overflow=0)
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT id, titulo, empresa, descripcion FROM empleo.ofertas_laborales "
+            "WHERE search_tsv IS NULL ORDER BY id"
+        )).fetchall()
+
+    print(f"  {len(rows)} rows to backfill")
+    if not rows:
+        engine.dispose()
+        return
+
+    update = text(f"""
+        UPDATE empleo.ofertas_laborales
+        SET search_tsv = {SEARCH_TSV_SQL}, empresa_norm = :empresa_norm
+        WHERE id = :id
+    """)
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        with engine.begin() as conn:
+            conn.execute(update, [
+                {"id": row_id, **search_fields(titulo, empresa, descripcion)}
+                for row_id, titulo, empresa, descripcion in batch
+            ])
+        print(f"  {start + len(batch)}/{len(rows)}")
+
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE empleo.ofertas_laborales"))
+
+    engine.dispose()
+    print(f"  Backfill complete. Updated: {len(rows)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+-- ============================================================
+-- Migration: near-duplicate clusters of ofertas (MinHash + LSH)
+-- ============================================================
+-- dedup_hash only merges offers whose título/empresa/municipio are
+-- identical once folded; the same vacancy reposted on another portal with a
+-- reworded title or description gets its own row. ETL 12 now stores:
+--   * minhash: MinHash signature of the offer text (etl/near_dup.py)
+--   * near_dup_cluster: dedup_hash of the first offer of its cluster;
+--     near_dup_cluster = dedup_hash marks the representative of a vacancy
+--   * empleo.ofertas_lsh: LSH band buckets, so candidates are found with
+--     a primary-key lookup instead of comparing against every offer
+-- Count distinct vacancies with COUNT(DISTINCT COALESCE(near_dup_cluster, dedup_hash, id::text))
+-- or keep representatives only with (near_dup_cluster IS NULL OR near_dup_cluster = dedup_hash).
+-- After running it, cluster existing rows with:
+--   python etl/23_backfill_near_dup.py
+
+ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS minhash BYTEA;
+ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS near_dup_cluster TEXT;
+
+CREATE TABLE IF NOT EXISTS empleo.ofertas_lsh (
+    band SMALLINT NOT NULL,
+    bucket BIGINT NOT NULL,
+    dedup_hash TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, dedup_hash)
+);
+
+CREATE INDEX IF NOT EXISTS idx_ofertas_near_dup_cluster
+ON empleo.ofertas_laborales (near_dup_cluster)
+WHERE near_dup_cluster IS NOT NULL;
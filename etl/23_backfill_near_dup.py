@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+ETL 23 — Backfill minhash / near_dup_cluster / ofertas_lsh for existing rows.
+Run after etl/22_near_dup.sql; new offers are clustered inline by ETL 12.
+Offers are processed oldest first, so the first publication of a vacancy
+becomes the representative of its cluster.
+"""
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from config import DB_URL
+from bulk_io import bulk_update
+from analytics_refresh import refresh_analytics
+from enrichment_pipeline import chunked
+from near_dup import (ASSIGN_CHUNK_ROWS, NEAR_DUP_DDL, LSHIndex, cluster_signed,
+                      load_candidates, sign_rows, write_lsh_entries)
+
+
+def main():
+    engine = create_engine(DB_URL, pool_size=1, max_overflow=0)
+
+    with engine.begin() as conn:
+        for ddl in NEAR_DUP_DDL:
+            conn.execute(text(ddl))
+
+    with engine.connect() as conn:
+        rows = [dict(r._mapping) for r in conn.execute(text(
+            "SELECT id, titulo, empresa, municipio, descripcion, dedup_hash "
+            "FROM empleo.ofertas_laborales "
+            "WHERE minhash IS NULL AND dedup_hash IS NOT NULL "
+            "ORDER BY fecha_scraping NULLS FIRST, id"
+        ))]
+
+        print(f"  {len(rows)} rows to backfill")
+        if not rows:
+            engine.dispose()
+            return
+
+        index = LSHIndex()
+        entries = []
+        for chunk in chunked(rows, ASSIGN_CHUNK_ROWS):
+            signed = sign_rows(chunk)
+            load_candidates(conn, signed, index)
+            entries.extend(cluster_signed(signed, index))
+
+    signed_rows = [r for r in rows if r["minhash"] is not None]
+    clusters = {r["near_dup_cluster"] for r in signed_rows}
+    print(f"  {len(signed_rows)} signed rows in {len(clusters)} clusters")
+
+    bulk_update(engine, "empleo.ofertas_laborales", ("id", "INTEGER"),
+                [("minhash", "BYTEA"), ("near_dup_cluster", "TEXT")],
+                signed_rows, label="near_dup")
+
+    with engine.begin() as conn:
+        written = write_lsh_entries(conn, entries)
+        conn.execute(text("ANALYZE empleo.ofertas_lsh"))
+
+    print("  Refreshing analytics views...")
+    refresh_analytics(engine)
+
+    engine.dispose()
+    print(f"  Backfill complete. Updated: {len(signed_rows)}, LSH entries: {written}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Refresh de las vistas materializadas del schema analytics
+=========================================================
+Crea las vistas de 18_analytics_views.sql solo si falta alguna (o es
+anterior al filtro de una oferta por vacante) y las refresca con
+REFRESH MATERIALIZED VIEW CONCURRENTLY, de modo que el API sigue leyendo la
+versión anterior mientras se recalculan. Lo llaman al terminar los scripts
+que escriben empleo.ofertas_laborales (ETL 12, 13, 15, 16 y 23); también
+se puede correr solo:
+
+  python etl/analytics_refresh.py
+"""
+
+import sys
+import time
+from pathlib import Path
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+VIEWS_SQL = Path(__file__).resolve().parent / "18_analytics_views.sql"
+
+ANALYTICS_VIEWS = [
+    "analytics.concentracion_municipio",
+    "analytics.sector_municipio",
+    "analytics.sector_skill",
+    "analytics.estacionalidad_mes_sector",
+    "analytics.contratos_municipio",
+    "analytics.salario_referencia",
+    "analytics.salario_cobertura",
+]
+
+
+# Vistas al día: existen y ya filtran una oferta por vacante
+CURRENT_VIEWS_SQL = """
+    SELECT COUNT(*) FROM pg_matviews
+    WHERE schemaname || '.' || matviewname = ANY(:views)
+      AND strpos(definition, 'near_dup_cluster') > 0
+"""
+
+
+def views_missing(conn) -> bool:
+    """Whether any of ANALYTICS_VIEWS has to be (re)created."""
+    current = conn.execute(text(CURRENT_VIEWS_SQL), {"views": ANALYTICS_VIEWS}).scalar()
+    return current < len(ANALYTICS_VIEWS)
+
+
+def refresh_analytics(engine, concurrently: bool = True):
+    """Create the analytics views if any is missing, then refresh each one."""
+    with engine.begin() as conn:
+        if views_missing(conn):
+            print("  Creando vistas analytics...")
+            conn.execute(text(VIEWS_SQL.read_text(encoding="utf-8")))
+
+    mode = "CONCURRENTLY " if concurrently else ""
+    for view in ANALYTICS_VIEWS:
+        t0 = time.time()
+        with engine.begin() as conn:
+            conn.execute(text(f"REFRESH MATERIALIZED VIEW {mode}{view}"))
+        print(f"  [OK] {view} ({time.time() - t0:.1f}s)")
+
+
+def main():
+    from config import DB_URL
+
+    print("Refrescando vistas analytics...")
+    engine = create_engine(DB_URL)
+    refresh_analytics(engine)
+    engine.dispose()
+    print("Done!")
+
+
+if __name__ == "__main__":
+    main()
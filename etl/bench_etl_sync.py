@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark del enriquecimiento de ofertas (skills, sector, experiencia, ...)
+===========================================================================
+Compara el PatternMatcher de etl_sync (prefiltro de literales + regex
+precompiladas) con el recorrido original de un re.search por patrón, sobre
+las ofertas del SQLite local del scraper o, si no existe, un corpus
+sintético. Verifica además que ambos den exactamente el mismo resultado.
+
+Uso:
+  python etl/bench_etl_sync.py
+  python etl/bench_etl_sync.py --docs 5000 --synthetic
+"""
+
+import argparse
+import random
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from etl_sync import (
+    CONTRATO_PATTERNS,
+    EDUCACION_PATTERNS,
+    EXPERIENCIA_PATTERNS,
+    MODALIDAD_PATTERNS,
+    SECTOR_PATTERNS,
+    SKILL_PATTERNS,
+    enrich_offer,
+)
+
+SQLITE_PATH = Path.home() / "uraba_empleos" / "empleos_uraba.db"
+
+SAMPLE_WORDS = (
+    "operario de cosecha y empaque en finca bananera, manejo de excel y word, "
+    "auxiliar contable con experiencia de 2 años, contrato a término fijo, "
+    "técnico en sistemas, bachiller, presencial en Apartadó, conductor con "
+    "licencia C2 y moto propia, atención al cliente, ventas, mercadeo, "
+    "enfermera jefe IPS, docente de inglés, soldadura, montacargas, aduanas, "
+    "la empresa busca personal con disponibilidad inmediata y trabajo en equipo"
+).replace(",", "").split()
+
+
+def reference(titulo, descripcion):
+    """The original implementation: one re.search per pattern."""
+    combined = f"{titulo or ''} {descripcion or ''}".lower()
+    skills = []
+    for pattern, name in SKILL_PATTERNS:
+        if name not in skills and re.search(pattern, combined, re.IGNORECASE):
+            skills.append(name)
+    result = {'skills': skills, 'sector': 'Otro'}
+    for pattern, sector in SECTOR_PATTERNS:
+        if re.search(pattern, combined, re.IGNORECASE):
+            result['sector'] = sector
+            break
+    for patterns, key in [
+        (EXPERIENCIA_PATTERNS, 'nivel_experiencia'),
+        (CONTRATO_PATTERNS, 'tipo_contrato'),
+        (EDUCACION_PATTERNS, 'nivel_educativo'),
+        (MODALIDAD_PATTERNS, 'modalidad'),
+    ]:
+        result[key] = next(
+            (label for pattern, label in patterns if re.search(pattern, combined, re.IGNORECASE)),
+            None,
+        )
+    return result
+
+
+def load_docs(n: int, synthetic: bool):
+    if not synthetic and SQLITE_PATH.exists():
+        conn = sqlite3.connect(SQLITE_PATH)
+        rows = conn.execute("SELECT titulo, descripcion FROM ofertas LIMIT ?", (n,)).fetchall()
+        conn.close()
+        if rows:
+            return rows, str(SQLITE_PATH)
+    rng = random.Random(42)
+    docs = [
+        (" ".join(rng.choices(SAMPLE_WORDS, k=6)), " ".join(rng.choices(SAMPLE_WORDS, k=rng.randint(40, 300))))
+        for _ in range(n)
+    ]
+    return docs, "corpus sintético"
+
+
+def timed(fn, docs, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = [fn(t, d) for t, d in docs]
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del matcher de enriquecimiento")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--synthetic", action="store_true", help="No leer el SQLite del scraper")
+    args = parser.parse_args()
+
+    docs, source = load_docs(args.docs, args.synthetic)
+    print(f"{len(docs)} ofertas ({source}), mejor de {args.repeat}")
+
+    expected, t_ref = timed(reference, docs, args.repeat)
+    got, t_new = timed(enrich_offer, docs, args.repeat)
+
+    mismatches = sum(a != b for a, b in zip(expected, got))
+    print(f"  re.search por patrón : {len(docs) / t_ref:10.0f} docs/s")
+    print(f"  PatternMatcher       : {len(docs) / t_new:10.0f} docs/s  (x{t_ref / t_new:.1f})")
+    print(f"  Diferencias          : {mismatches}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
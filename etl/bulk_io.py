@@ -0,0 +1,171 @@
+"""
+Bulk writers for empleo.ofertas_laborales based on COPY.
+
+Rows are streamed with ``COPY ... FROM STDIN`` (CSV) into a temporary
+staging table in chunks, then applied with one set-based statement:
+``INSERT ... SELECT ... ON CONFLICT (dedup_hash) DO NOTHING`` for new
+offers (bulk_insert_offers) or ``UPDATE ... FROM staging`` for backfills
+(bulk_update). Tens of thousands of rows therefore cost a handful of round
+trips instead of one per row. Needs a psycopg2 connection (requirements-etl).
+"""
+import io
+import time
+from itertools import islice
+
+from sqlalchemy import text
+
+from etl_sync import search_tsv_sql
+
+COPY_CHUNK_ROWS = 5000
+
+# (column, type) of the offers staged for insertion; search_* feed search_tsv_sql
+OFFER_STAGING_COLUMNS = [
+    ("titulo", "TEXT"),
+    ("empresa", "TEXT"),
+    ("salario_texto", "TEXT"),
+    ("salario_numerico", "INTEGER"),
+    ("descripcion", "TEXT"),
+    ("fecha_publicacion", "DATE"),
+    ("enlace", "TEXT"),
+    ("municipio", "TEXT"),
+    ("dane_code", "TEXT"),
+    ("fuente", "TEXT"),
+    ("sector", "TEXT"),
+    ("skills", "TEXT[]"),
+    ("fecha_scraping", "TIMESTAMP"),
+    ("content_hash", "TEXT"),
+    ("dedup_hash", "TEXT"),
+    ("nivel_experiencia", "TEXT"),
+    ("tipo_contrato", "TEXT"),
+    ("nivel_educativo", "TEXT"),
+    ("modalidad", "TEXT"),
+    ("empresa_norm", "TEXT"),
+    ("minhash", "BYTEA"),
+    ("near_dup_cluster", "TEXT"),
+    ("search_titulo", "TEXT"),
+    ("search_empresa", "TEXT"),
+    ("search_descripcion", "TEXT"),
+]
+
+_SEARCH_INPUTS = {"search_titulo", "search_empresa", "search_descripcion"}
+
+
+def _pg_array(values) -> str:
+    """PostgreSQL array literal of text *values*."""
+    items = ('"' + v.replace("\\", "\\\\").replace('"', '\\"') + '"' for v in values)
+    return "{" + ",".join(items) + "}"
+
+
+def _csv_field(value) -> str:
+    # Unquoted empty = NULL, quoted "" = empty string (COPY CSV semantics)
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        value = _pg_array(value)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        value = "\\x" + bytes(value).hex()
+    elif not isinstance(value, str):
+        value = str(value)
+    return '"' + value.replace('"', '""') + '"'
+
+
+def encode_csv(rows, columns) -> str:
+    """COPY-ready CSV text of *rows* (dicts) restricted to *columns*."""
+    return "".join(",".join(_csv_field(row.get(c)) for c in columns) + "\n" for row in rows)
+
+
+def copy_rows(cursor, table: str, columns, rows) -> None:
+    """Stream *rows* into *table* with one COPY."""
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        io.StringIO(encode_csv(rows, columns)),
+    )
+
+
+def bulk_insert_offers(conn, rows, chunk_rows: int = COPY_CHUNK_ROWS) -> tuple[int, int, set]:
+    """
+    Insert offers through a COPY-loaded staging table.
+
+    *conn* is a SQLAlchemy connection inside a transaction; *rows* is an
+    iterable of dicts keyed like OFFER_STAGING_COLUMNS (consumed in chunks).
+    Offers whose content_hash or dedup_hash already exists, or whose
+    dedup_hash repeats an earlier staged row, are skipped; both checks run
+    in PostgreSQL against the indexes. Returns ``(inserted, skipped,
+    hashes)``, *hashes* being the dedup_hash of the offers actually inserted.
+    """
+    columns = [c for c, _ in OFFER_STAGING_COLUMNS]
+    conn.execute(text(
+        "CREATE TEMP TABLE IF NOT EXISTS _ofertas_staging ("
+        "ord BIGSERIAL, "
+        + ", ".join(f"{c} {t}" for c, t in OFFER_STAGING_COLUMNS)
+        + ") ON COMMIT DROP"
+    ))
+
+    cursor = conn.connection.cursor()
+    staged = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            copy_rows(cursor, "_ofertas_staging", columns, chunk)
+            staged += len(chunk)
+            chunk = []
+    if chunk:
+        copy_rows(cursor, "_ofertas_staging", columns, chunk)
+        staged += len(chunk)
+    if not staged:
+        return 0, 0, set()
+
+    targets = [c for c in columns if c not in _SEARCH_INPUTS]
+    result = conn.execute(text(f"""
+        INSERT INTO empleo.ofertas_laborales ({', '.join(targets)}, search_tsv)
+        SELECT {', '.join('s.' + c for c in targets)}, {search_tsv_sql('s.{}')}
+        FROM _ofertas_staging s
+        WHERE s.content_hash IS NULL OR NOT EXISTS (
+            SELECT 1 FROM empleo.ofertas_laborales o WHERE o.content_hash = s.content_hash
+        )
+        ORDER BY s.ord
+        ON CONFLICT (dedup_hash) WHERE dedup_hash IS NOT NULL DO NOTHING
+        RETURNING dedup_hash
+    """))
+    returned = [r[0] for r in result.fetchall()]
+    return len(returned), staged - len(returned), {h for h in returned if h is not None}
+
+
+def bulk_update(engine, table: str, key: tuple, columns: list, rows,
+                chunk_rows: int = COPY_CHUNK_ROWS, label: str = None) -> int:
+    """
+    Set *columns* of *table* from *rows*, matching on *key*.
+
+    *key* is ``(name, type)`` and *columns* a list of ``(name, type)``;
+    *rows* is an iterable of dicts with the key and every column. Each chunk
+    of *chunk_rows* rows is COPYed into a staging table and applied with one
+    ``UPDATE ... FROM`` in its own transaction, so progress survives an
+    interrupted run. Rows whose values are already equal (IS NOT DISTINCT
+    FROM) are not rewritten. Returns the number of rows actually changed.
+    """
+    key_col = key[0]
+    names = [key_col] + [c for c, _ in columns]
+    staging = ", ".join(f"{c} {t}" for c, t in [key] + list(columns))
+    assignments = ", ".join(f"{c} = s.{c}" for c, _ in columns)
+    changed_only = " OR ".join(f"t.{c} IS DISTINCT FROM s.{c}" for c, _ in columns)
+    update_sql = text(f"""
+        UPDATE {table} AS t SET {assignments}
+        FROM _bulk_update_staging s
+        WHERE t.{key_col} = s.{key_col} AND ({changed_only})
+    """)
+
+    t0 = time.time()
+    seen = changed = 0
+    it = iter(rows)
+    while chunk := list(islice(it, chunk_rows)):
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE TEMP TABLE _bulk_update_staging ({staging}) ON COMMIT DROP"
+            ))
+            copy_rows(conn.connection.cursor(), "_bulk_update_staging", names, chunk)
+            changed += conn.execute(update_sql).rowcount
+        seen += len(chunk)
+        if label:
+            print(f"  {label}: {seen} filas procesadas, {changed} cambiadas ({time.time() - t0:.1f}s)")
+    return changed
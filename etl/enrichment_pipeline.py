@@ -0,0 +1,69 @@
+"""
+Parallel enrichment stage for the offer ETLs (12 sync, 13 backfill).
+
+Offers are cut into chunks and enriched in a ProcessPoolExecutor with the
+etl_sync extractors (skills, sector, experiencia/contrato/educación/
+modalidad, salario numérico, dedup_hash). Results come back in input
+order and are yielded as soon as the head chunk is done, with a bounded
+number of chunks in flight, so the DB writer starts inserting before the
+whole scrape has been processed and memory stays flat.
+
+Workers and chunk size default to ETL_WORKERS / ETL_CHUNK_SIZE (or the CPU
+count / 500); ``workers=1`` runs in the calling process.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from etl_sync import compute_dedup_hash, enrich_offer, parse_salary
+
+DEFAULT_WORKERS = int(os.environ.get("ETL_WORKERS", "0")) or (os.cpu_count() or 1)
+DEFAULT_CHUNK_SIZE = int(os.environ.get("ETL_CHUNK_SIZE", "500"))
+
+
+def enrich_record(record: dict) -> dict:
+    """*record* (titulo, descripcion[, empresa, municipio, salario]) plus its enrichment."""
+    titulo = record.get("titulo")
+    out = dict(record)
+    out.update(enrich_offer(titulo, record.get("descripcion")))
+    out["salario_numerico"] = parse_salary(record.get("salario"))
+    out["dedup_hash"] = compute_dedup_hash(titulo, record.get("empresa"), record.get("municipio"))
+    return out
+
+
+def _enrich_chunk(records: list) -> list:
+    return [enrich_record(r) for r in records]
+
+
+def chunked(iterable, size: int):
+    """Lists of up to *size* consecutive items of *iterable*."""
+    it = iter(iterable)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def enrich_stream(records, workers: int = None, chunk_size: int = None):
+    """
+    Yield ``enrich_record(r)`` for every *r* in *records*, in input order.
+
+    At most ``2 * workers`` chunks are pending at any time; *records* is
+    consumed lazily, so it can be a cursor or generator.
+    """
+    workers = workers or DEFAULT_WORKERS
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    chunks = chunked(records, chunk_size)
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _enrich_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_enrich_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
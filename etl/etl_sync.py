@@ -6,6 +6,12 @@ import hashlib
 import re
 import unicodedata
 
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
 MUNICIPIO_DANE = {
     "apartadó": "05045", "apartado": "05045",
     "turbo": "05837",
@@ -209,41 +215,158 @@ def compute_dedup_hash(titulo: str, empresa: str, municipio: str) -> str:
     return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
 
 
+def search_tsv_sql(ref: str = ":{}") -> str:
+    """SQL for the weighted tsvector of an offer built from accent-folded text.
+
+    *ref* renders each input (search_titulo, search_empresa,
+    search_descripcion; see search_fields): bind parameters by default, or
+    e.g. ``"s.{}"`` to read them from staging table columns.
+    """
+    return (
+        f"setweight(to_tsvector('spanish', {ref.format('search_titulo')}), 'A') || "
+        f"setweight(to_tsvector('spanish', {ref.format('search_empresa')}), 'B') || "
+        f"setweight(to_tsvector('spanish', {ref.format('search_descripcion')}), 'C')"
+    )
+
+
+SEARCH_TSV_SQL = search_tsv_sql()
+
+
+def search_fields(titulo: str, empresa: str, descripcion: str) -> dict:
+    """Accent-folded inputs of SEARCH_TSV_SQL plus empresa_norm (trigram column).
+
+    The API folds the query with the same rules (src/backend/search.py).
+    """
+    empresa_norm = _normalize(empresa or "")
+    return {
+        "search_titulo": _normalize(titulo or ""),
+        "search_empresa": empresa_norm,
+        "search_descripcion": _normalize(descripcion or ""),
+        "empresa_norm": empresa_norm or None,
+    }
+
+
+# Characters that re.IGNORECASE treats as equal to an ASCII letter although
+# str.lower() keeps them apart (sre "equivalences"); folded before the
+# literal prefilter so it never rejects a text the regex would match.
+_IGNORECASE_FOLD = str.maketrans({"\u0131": "i", "\u017f": "s"})
+
+
+def _required_literals(items) -> set | None:
+    """Literals one of which every match of the parsed pattern *items* contains.
+
+    Collects the leading literal run of each top-level branch (skipping
+    zero-width anchors such as \\b); None when some branch starts with a
+    class, repeat or group, i.e. the pattern cannot be prefiltered.
+    """
+    prefix = ""
+    for op, av in items:
+        if op is sre_constants.AT:
+            continue
+        if op is sre_constants.LITERAL:
+            prefix += chr(av).lower()
+            continue
+        if op is sre_constants.BRANCH:
+            literals = set()
+            for branch in av[1]:
+                sub = _required_literals(branch)
+                if sub is None:
+                    return {prefix} if prefix else None
+                literals |= {prefix + lit for lit in sub}
+            return literals
+        break
+    return {prefix} if prefix else None
+
+
+class PatternMatcher:
+    """
+    Pattern families (skills, sector, enrichment) compiled once and matched
+    with a shared literal prefilter.
+
+    Each document is scanned once for every required literal of every
+    pattern (``str.__contains__``, a C substring search); only patterns with
+    a literal present, or with no extractable literal, run their compiled
+    regex. Outputs are identical to ``re.search`` over each pattern in order.
+    """
+
+    def __init__(self, families: dict):
+        self.families = {}
+        literals = set()
+        for name, patterns in families.items():
+            rules = []
+            for pattern, label in patterns:
+                required = _required_literals(sre_parse.parse(pattern, re.IGNORECASE))
+                rules.append((re.compile(pattern, re.IGNORECASE), label,
+                              frozenset(required) if required else None))
+                literals |= required or set()
+            self.families[name] = rules
+        self.literals = tuple(sorted(literals))
+
+    def present(self, text: str) -> frozenset:
+        """Required literals that occur in the (lowercased) *text*."""
+        folded = text.translate(_IGNORECASE_FOLD)
+        return frozenset(lit for lit in self.literals if lit in folded)
+
+    def _candidates(self, family: str, text: str, present: frozenset):
+        for regex, label, required in self.families[family]:
+            if required is None or not required.isdisjoint(present):
+                if regex.search(text):
+                    yield label
+
+    def first(self, family: str, text: str, present: frozenset = None):
+        """Label of the first pattern of *family* matching *text*, or None."""
+        if present is None:
+            present = self.present(text)
+        return next(self._candidates(family, text, present), None)
+
+    def all(self, family: str, text: str, present: frozenset = None) -> list:
+        """Labels of every matching pattern of *family*, first occurrence order."""
+        if present is None:
+            present = self.present(text)
+        return list(dict.fromkeys(self._candidates(family, text, present)))
+
+
+ENRICHMENT_FIELDS = {
+    'nivel_experiencia': EXPERIENCIA_PATTERNS,
+    'tipo_contrato': CONTRATO_PATTERNS,
+    'nivel_educativo': EDUCACION_PATTERNS,
+    'modalidad': MODALIDAD_PATTERNS,
+}
+
+MATCHER = PatternMatcher({
+    'skills': SKILL_PATTERNS,
+    'sector': SECTOR_PATTERNS,
+    **ENRICHMENT_FIELDS,
+})
+
+
+def _combined(titulo, descripcion) -> str:
+    return f"{titulo or ''} {descripcion or ''}".lower()
+
+
 def extract_skills(titulo, descripcion):
-    combined = f"{titulo or ''} {descripcion or ''}".lower()
-    seen = set()
-    result = []
-    for pattern, name in SKILL_PATTERNS:
-        if name not in seen and re.search(pattern, combined, re.IGNORECASE):
-            seen.add(name)
-            result.append(name)
-    return result
+    return MATCHER.all('skills', _combined(titulo, descripcion))
 
 
 def classify_sector(titulo, descripcion):
-    combined = f"{titulo or ''} {descripcion or ''}".lower()
-    for pattern, sector in SECTOR_PATTERNS:
-        if re.search(pattern, combined, re.IGNORECASE):
-            return sector
-    return 'Otro'
+    return MATCHER.first('sector', _combined(titulo, descripcion)) or 'Otro'
 
 
 def extract_enrichment(titulo, descripcion):
-    combined = f"{titulo or ''} {descripcion or ''}".lower()
-    result = {}
-    for patterns, key in [
-        (EXPERIENCIA_PATTERNS, 'nivel_experiencia'),
-        (CONTRATO_PATTERNS, 'tipo_contrato'),
-        (EDUCACION_PATTERNS, 'nivel_educativo'),
-        (MODALIDAD_PATTERNS, 'modalidad'),
-    ]:
-        for pattern, label in patterns:
-            if re.search(pattern, combined, re.IGNORECASE):
-                result[key] = label
-                break
-        else:
-            result[key] = None
-    return result
+    combined = _combined(titulo, descripcion)
+    present = MATCHER.present(combined)
+    return {key: MATCHER.first(key, combined, present) for key in ENRICHMENT_FIELDS}
+
+
+def enrich_offer(titulo, descripcion) -> dict:
+    """skills, sector and the enrichment fields of one offer in a single prefilter pass."""
+    combined = _combined(titulo, descripcion)
+    present = MATCHER.present(combined)
+    return {
+        'skills': MATCHER.all('skills', combined, present),
+        'sector': MATCHER.first('sector', combined, present) or 'Otro',
+        **{key: MATCHER.first(key, combined, present) for key in ENRICHMENT_FIELDS},
+    }
 
 
 def parse_salary(salario_str):
@@ -0,0 +1,29 @@
+"""
+Data versions of the cartography layers.
+
+Each loader bumps the version of the layers it rewrote when it finishes.
+The API keys its on-disk tile cache by this version, so tiles rendered from
+the previous load stop being served as soon as the new version is visible.
+"""
+from sqlalchemy import text
+
+LAYER_VERSIONS_DDL = """
+CREATE TABLE IF NOT EXISTS cartografia.layer_versions (
+    layer_id TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+
+
+def bump_layer_versions(conn, layer_ids):
+    """Increment the data version of *layer_ids* (layer catalog ids) in one transaction."""
+    conn.execute(text(LAYER_VERSIONS_DDL))
+    for layer_id in layer_ids:
+        conn.execute(text("""
+            INSERT INTO cartografia.layer_versions (layer_id, version, updated_at)
+            VALUES (:l, 1, now())
+            ON CONFLICT (layer_id) DO UPDATE
+            SET version = cartografia.layer_versions.version + 1, updated_at = now()
+        """), {"l": layer_id})
+    print(f"  Versión de capas actualizada: {', '.join(layer_ids)}")
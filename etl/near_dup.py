@@ -0,0 +1,313 @@
+"""
+Near-duplicate detection of offers across portals (MinHash + LSH).
+
+dedup_hash only catches reposts whose título/empresa/municipio fold to the
+same text; the same vacancy published on two portals usually differs in a
+word of the title, the company spelling or the boilerplate around the
+description. Here every offer gets:
+
+* a MinHash signature (NUM_PERM 31-bit values, stored as ``minhash BYTEA``)
+  of the byte 5-grams of its folded título, empresa, municipio and
+  descripción, whose agreement rate estimates their Jaccard similarity;
+* BANDS LSH keys (one BIGINT per band of ROWS values) in
+  ``empleo.ofertas_lsh``, so the candidates of a new offer are the offers
+  sharing at least one band bucket — an indexed lookup, not a scan;
+* a ``near_dup_cluster``: the dedup_hash of the first offer of its cluster.
+  Candidates whose estimated similarity reaches NEAR_DUP_JACCARD join the
+  cluster of the best match; otherwise the offer starts its own cluster.
+  ``near_dup_cluster = dedup_hash`` therefore marks one offer per vacancy.
+
+Hashing is vectorised with NumPy and uses no process-seeded hash(), so
+signatures written by different runs are comparable. Schema in
+etl/22_near_dup.sql; existing rows are filled by etl/23_backfill_near_dup.py.
+"""
+import hashlib
+
+import numpy as np
+from sqlalchemy import text
+
+from bulk_io import copy_rows
+from etl_sync import _normalize
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_BYTES = 5
+NEAR_DUP_JACCARD = 0.7
+ASSIGN_CHUNK_ROWS = 1000
+
+NEAR_DUP_DDL = [
+    "ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS minhash BYTEA",
+    "ALTER TABLE empleo.ofertas_laborales ADD COLUMN IF NOT EXISTS near_dup_cluster TEXT",
+    """
+    CREATE TABLE IF NOT EXISTS empleo.ofertas_lsh (
+        band SMALLINT NOT NULL,
+        bucket BIGINT NOT NULL,
+        dedup_hash TEXT NOT NULL,
+        PRIMARY KEY (band, bucket, dedup_hash)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_ofertas_near_dup_cluster
+    ON empleo.ofertas_laborales (near_dup_cluster)
+    WHERE near_dup_cluster IS NOT NULL
+    """,
+]
+
+_PRIME = (1 << 31) - 1  # Mersenne prime: a*x + b stays below 2**63
+
+
+def _permutation_coefficients():
+    # Derived from blake2b, not np.random, so they never change between versions
+    a = np.empty(NUM_PERM, dtype=np.uint64)
+    b = np.empty(NUM_PERM, dtype=np.uint64)
+    for i in range(NUM_PERM):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=8).digest()
+        a[i] = int.from_bytes(digest[:4], "little") % (_PRIME - 1) + 1
+        b[i] = int.from_bytes(digest[4:], "little") % _PRIME
+    return a[:, None], b[:, None]
+
+
+_A, _B = _permutation_coefficients()
+
+
+def offer_text(titulo, empresa, municipio, descripcion) -> str:
+    """Folded text the signature is computed from (whitespace collapsed)."""
+    parts = (_normalize(p) for p in (titulo, empresa, municipio, descripcion) if p)
+    return " ".join(" ".join(parts).split())
+
+
+def shingles(value: str) -> np.ndarray:
+    """Distinct byte SHINGLE_BYTES-grams of *value*, each packed into a uint64."""
+    data = np.frombuffer(value.encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    n = data.size - SHINGLE_BYTES + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.uint64)
+    packed = np.zeros(n, dtype=np.uint64)
+    for j in range(SHINGLE_BYTES):
+        packed |= data[j:j + n] << np.uint64(8 * j)
+    return np.unique(packed)
+
+
+def signature(value: str) -> np.ndarray | None:
+    """MinHash signature (uint32[NUM_PERM]) of *value*; None if it is too short."""
+    grams = shingles(value)
+    if not grams.size:
+        return None
+    x = grams % np.uint64(_PRIME)
+    return ((_A * x + _B) % np.uint64(_PRIME)).min(axis=1).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the sets behind signatures *a* and *b*."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def band_keys(sig: np.ndarray) -> list[int]:
+    """One signed 64-bit bucket per band (BIGINT in empleo.ofertas_lsh)."""
+    raw = sig.astype("<u4").tobytes()
+    step = ROWS * 4
+    return [
+        int.from_bytes(hashlib.blake2b(raw[i:i + step], digest_size=8).digest(), "little", signed=True)
+        for i in range(0, len(raw), step)
+    ]
+
+
+def pack(sig: np.ndarray) -> bytes:
+    return sig.astype("<u4").tobytes()
+
+
+def unpack(raw) -> np.ndarray:
+    return np.frombuffer(bytes(raw), dtype="<u4").astype(np.uint32)
+
+
+class LSHIndex:
+    """In-memory banding index: key → (signature, cluster), buckets per band."""
+
+    def __init__(self):
+        self.buckets = [dict() for _ in range(BANDS)]
+        self.entries = {}
+
+    def add(self, key, sig: np.ndarray, cluster, keys: list[int] = None) -> None:
+        if key in self.entries:
+            return
+        self.entries[key] = (sig, cluster)
+        for band, bucket in enumerate(keys or band_keys(sig)):
+            self.buckets[band].setdefault(bucket, []).append(key)
+
+    def candidates(self, keys: list[int]) -> set:
+        found = set()
+        for band, bucket in enumerate(keys):
+            found.update(self.buckets[band].get(bucket, ()))
+        return found
+
+    def match(self, sig: np.ndarray, keys: list[int] = None, threshold: float = NEAR_DUP_JACCARD):
+        """Cluster of the most similar indexed signature at or above *threshold*, else None."""
+        best, best_sim = None, threshold
+        for key in self.candidates(keys or band_keys(sig)):
+            other, cluster = self.entries[key]
+            sim = similarity(sig, other)
+            if sim >= best_sim and (best is None or sim > best_sim or cluster < best):
+                best, best_sim = cluster, sim
+        return best
+
+
+def sign_rows(rows) -> list[tuple]:
+    """
+    ``(row, dedup_hash, signature, band_keys)`` for the *rows* that can be
+    clustered. Rows without dedup_hash or enough text get ``minhash`` and
+    ``near_dup_cluster`` set to None and are left out.
+    """
+    signed = []
+    for row in rows:
+        key = row.get("dedup_hash")
+        sig = signature(offer_text(row.get("titulo"), row.get("empresa"),
+                                   row.get("municipio"), row.get("descripcion"))) if key else None
+        if sig is None:
+            row["minhash"] = row["near_dup_cluster"] = None
+        else:
+            signed.append((row, key, sig, band_keys(sig)))
+    return signed
+
+
+def cluster_signed(signed, index: LSHIndex) -> list[dict]:
+    """
+    Set ``minhash`` and ``near_dup_cluster`` on the rows of *signed*, in order.
+
+    Each row is matched against *index* (stored candidates plus the rows
+    before it) and then added to it. Returns the
+    ``{"band", "bucket", "dedup_hash"}`` entries to store in ofertas_lsh.
+    """
+    entries = []
+    for row, key, sig, keys in signed:
+        existing = index.entries.get(key)
+        cluster = existing[1] if existing else (index.match(sig, keys) or key)
+        index.add(key, sig, cluster, keys)
+        row["minhash"] = pack(sig)
+        row["near_dup_cluster"] = cluster
+        entries.extend({"band": band, "bucket": bucket, "dedup_hash": key}
+                       for band, bucket in enumerate(keys))
+    return entries
+
+
+def assign_clusters(rows, index: LSHIndex = None) -> list[dict]:
+    """In-memory clustering of *rows* (dicts with dedup_hash, titulo, empresa, municipio, descripcion)."""
+    return cluster_signed(sign_rows(rows), index if index is not None else LSHIndex())
+
+
+CANDIDATES_SQL = text("""
+    SELECT DISTINCT o.dedup_hash, o.minhash, COALESCE(o.near_dup_cluster, o.dedup_hash) AS cluster
+    FROM empleo.ofertas_lsh l
+    JOIN empleo.ofertas_laborales o ON o.dedup_hash = l.dedup_hash
+    WHERE (l.band, l.bucket) IN (
+        SELECT * FROM unnest(CAST(:bands AS SMALLINT[]), CAST(:buckets AS BIGINT[]))
+    ) AND o.minhash IS NOT NULL
+""")
+
+
+def load_candidates(conn, signed, index: LSHIndex) -> None:
+    """Add to *index* the stored offers sharing a band bucket with any row of *signed*."""
+    bands, buckets = [], []
+    for _, _, _, keys in signed:
+        bands.extend(range(BANDS))
+        buckets.extend(keys)
+    if not bands:
+        return
+    for key, raw, cluster in conn.execute(CANDIDATES_SQL, {"bands": bands, "buckets": buckets}):
+        index.add(key, unpack(raw), cluster)
+
+
+REROOT_SQL = text("""
+    UPDATE empleo.ofertas_laborales o SET near_dup_cluster = r.new
+    FROM unnest(CAST(:old AS TEXT[]), CAST(:new AS TEXT[])) AS r(old, new)
+    WHERE o.near_dup_cluster = r.old
+""")
+
+
+def write_lsh_entries(conn, entries) -> int:
+    """COPY *entries* into empleo.ofertas_lsh, ignoring buckets already stored."""
+    if not entries:
+        return 0
+    conn.execute(text(
+        "CREATE TEMP TABLE IF NOT EXISTS _lsh_staging "
+        "(band SMALLINT, bucket BIGINT, dedup_hash TEXT) ON COMMIT DROP"
+    ))
+    copy_rows(conn.connection.cursor(), "_lsh_staging", ["band", "bucket", "dedup_hash"], entries)
+    result = conn.execute(text("""
+        INSERT INTO empleo.ofertas_lsh (band, bucket, dedup_hash)
+        SELECT band, bucket, dedup_hash FROM _lsh_staging
+        ON CONFLICT DO NOTHING
+    """))
+    conn.execute(text("TRUNCATE _lsh_staging"))
+    return result.rowcount
+
+
+class NearDupAssigner:
+    """
+    Inline stage of ETL 12: clusters a stream of staged offers.
+
+    Rows are handled in chunks of *chunk_rows*: one indexed query fetches
+    the stored offers sharing a bucket with the chunk, then the chunk is
+    clustered in memory (so duplicates inside the same sync are caught
+    too). The LSH entries are kept until ``write(inserted)``, called after
+    the offers themselves have been inserted with the dedup_hash of those
+    that actually were: rows skipped by the insert get no LSH entries, and a
+    cluster that was rooted at a skipped row is re-rooted at its first
+    inserted member.
+    """
+
+    def __init__(self, conn, chunk_rows: int = ASSIGN_CHUNK_ROWS):
+        for ddl in NEAR_DUP_DDL:
+            conn.execute(text(ddl))
+        self.conn = conn
+        self.chunk_rows = chunk_rows
+        self.index = LSHIndex()
+        self.entries = []
+        self.clusters = {}  # dedup_hash → cluster of the signed rows, in stream order
+
+    def stream(self, rows):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_rows:
+                yield from self._assign(chunk)
+                chunk = []
+        if chunk:
+            yield from self._assign(chunk)
+
+    def _assign(self, chunk):
+        signed = sign_rows(chunk)
+        load_candidates(self.conn, signed, self.index)
+        self.entries.extend(cluster_signed(signed, self.index))
+        for row, key, _, _ in signed:
+            self.clusters.setdefault(key, row["near_dup_cluster"])
+        return chunk
+
+    def orphan_roots(self, inserted: set, stored: set) -> dict:
+        """
+        ``{old_cluster: new_cluster}`` for the clusters of inserted rows
+        whose root is neither inserted nor in *stored* (already in the
+        table): the first inserted member becomes the new root.
+        """
+        roots = {}
+        for key, cluster in self.clusters.items():
+            if key in inserted and cluster not in inserted and cluster not in stored:
+                roots.setdefault(cluster, key)
+        return roots
+
+    def write(self, inserted: set, conn=None) -> int:
+        """Fix orphaned clusters and store the LSH entries of the *inserted* offers."""
+        conn = conn or self.conn
+        missing = list({c for k, c in self.clusters.items() if k in inserted and c not in inserted})
+        stored = set()
+        if missing:
+            stored = {r[0] for r in conn.execute(text(
+                "SELECT dedup_hash FROM empleo.ofertas_laborales WHERE dedup_hash = ANY(:h)"
+            ), {"h": missing})}
+        roots = self.orphan_roots(inserted, stored)
+        if roots:
+            conn.execute(REROOT_SQL, {"old": list(roots), "new": list(roots.values())})
+        written = write_lsh_entries(conn, [e for e in self.entries if e["dedup_hash"] in inserted])
+        self.entries = []
+        self.clusters = {}
+        return written
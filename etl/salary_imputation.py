@@ -0,0 +1,147 @@
+"""
+Vectorised salary imputation for ETL 16.
+
+Offers without salario_numerico get the median salary of the first level
+with at least MIN_SAMPLE salaried offers:
+
+  L1  sector + municipio + nivel_educativo + nivel_experiencia
+  L2  sector + municipio
+  L3  sector
+
+Medians come from one pandas groupby per level and are attached with a
+left merge, so the whole table is imputed without a Python loop. NULL is
+its own group at every level (as in SQL GROUP BY) and the median is the
+interpolated PERCENTILE_CONT(0.5), truncated to an integer.
+
+Every level includes the sector, so an offer's imputation depends only on
+the offers of its sector. A fingerprint of each sector's rows is stored in
+empleo.salario_imputacion_estado and only sectors whose fingerprint changed
+since the last run are recomputed and written.
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+LEVELS = [
+    ("L1", ["sector", "municipio", "nivel_educativo", "nivel_experiencia"]),
+    ("L2", ["sector", "municipio"]),
+    ("L3", ["sector"]),
+]
+MIN_SAMPLE = 3
+
+OFFER_COLUMNS = ["id", "sector", "municipio", "nivel_educativo", "nivel_experiencia", "salario_numerico"]
+OFFERS_SQL = f"SELECT {', '.join(OFFER_COLUMNS)} FROM empleo.ofertas_laborales"
+
+# Key of the NULL sector in the state table (sector is its primary key)
+NULL_SECTOR = "\x00null"
+
+STATE_DDL = """
+CREATE TABLE IF NOT EXISTS empleo.salario_imputacion_estado (
+    sector TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+
+
+def load_offers(conn) -> pd.DataFrame:
+    """Imputation inputs of every offer (one SELECT)."""
+    rows = conn.execute(text(OFFERS_SQL)).fetchall()
+    return pd.DataFrame(rows, columns=OFFER_COLUMNS)
+
+
+def sector_keys(offers: pd.DataFrame) -> pd.Series:
+    return offers["sector"].astype(object).where(offers["sector"].notna(), NULL_SECTOR)
+
+
+def sector_fingerprints(offers: pd.DataFrame) -> dict:
+    """``{sector: "rows:checksum"}``, order-independent over the imputation inputs."""
+    if offers.empty:
+        return {}
+    hashes = pd.util.hash_pandas_object(offers[OFFER_COLUMNS], index=False).to_numpy()
+    # 32-bit halves so the per-sector sum cannot overflow int64
+    low = (hashes & np.uint64(0xFFFFFFFF)).astype(np.int64)
+    grouped = pd.Series(low).groupby(sector_keys(offers).to_numpy()).agg(["size", "sum"])
+    return {sector: f"{size}:{total}" for sector, size, total in grouped.itertuples()}
+
+
+def load_state(conn) -> dict:
+    """Fingerprints stored by the previous run."""
+    conn.execute(text(STATE_DDL))
+    rows = conn.execute(text("SELECT sector, fingerprint FROM empleo.salario_imputacion_estado"))
+    return dict(rows.fetchall())
+
+
+def save_state(conn, fingerprints: dict, sectors) -> None:
+    """Store the fingerprints of *sectors*; sectors no longer present are dropped."""
+    conn.execute(text(STATE_DDL))
+    for sector in sectors:
+        if sector in fingerprints:
+            conn.execute(text("""
+                INSERT INTO empleo.salario_imputacion_estado (sector, fingerprint, updated_at)
+                VALUES (:s, :f, now())
+                ON CONFLICT (sector) DO UPDATE
+                SET fingerprint = EXCLUDED.fingerprint, updated_at = now()
+            """), {"s": sector, "f": fingerprints[sector]})
+        else:
+            conn.execute(text("DELETE FROM empleo.salario_imputacion_estado WHERE sector = :s"),
+                         {"s": sector})
+
+
+def changed_sectors(fingerprints: dict, previous: dict) -> set:
+    """Sectors added, modified or removed since *previous*."""
+    return {s for s in fingerprints.keys() | previous.keys() if fingerprints.get(s) != previous.get(s)}
+
+
+def reference_medians(offers: pd.DataFrame) -> dict:
+    """``{level: DataFrame(keys..., mediana)}`` of the groups with ≥ MIN_SAMPLE salaries."""
+    salaried = offers[offers["salario_numerico"].notna()]
+    refs = {}
+    for name, keys in LEVELS:
+        stats = salaried.groupby(keys, dropna=False)["salario_numerico"].agg(["median", "size"])
+        stats = stats[stats["size"] >= MIN_SAMPLE]
+        refs[name] = stats["median"].rename("mediana").reset_index()
+    return refs
+
+
+def impute(offers: pd.DataFrame) -> pd.DataFrame:
+    """
+    ``id, salario_imputado, nivel`` for every row of *offers*.
+
+    Offers without salary get the median of the first level that applies
+    (nivel L1/L2/L3) or None (nivel None); offers with salary get None, so
+    an imputation is cleared once the real salary is known.
+    """
+    refs = reference_medians(offers)
+    missing = offers["salario_numerico"].isna().to_numpy()
+    target = offers.loc[missing]
+    value = np.full(len(target), np.nan)
+    nivel = np.full(len(target), None, dtype=object)
+    for name, keys in LEVELS:
+        mediana = target[keys].merge(refs[name], on=keys, how="left")["mediana"].to_numpy(dtype=float)
+        hit = np.isnan(value) & ~np.isnan(mediana)
+        value[hit] = np.floor(mediana[hit])
+        nivel[hit] = name
+
+    salario = np.full(len(offers), None, dtype=object)
+    niveles = np.full(len(offers), None, dtype=object)
+    salario[missing] = [None if np.isnan(v) else int(v) for v in value]
+    niveles[missing] = nivel
+    return pd.DataFrame({"id": offers["id"].to_numpy(), "salario_imputado": salario, "nivel": niveles})
+
+
+def to_updates(result: pd.DataFrame) -> list[dict]:
+    """bulk_update rows (``{"id", "salario_imputado"}``) of an impute() result."""
+    return [
+        {"id": int(oid), "salario_imputado": None if pd.isna(sal) else int(sal)}
+        for oid, sal in zip(result["id"].to_numpy(), result["salario_imputado"].to_numpy())
+    ]
+
+
+def level_counts(result: pd.DataFrame, offers: pd.DataFrame) -> dict:
+    """Hits per level and misses among the offers without salary."""
+    missing = offers["salario_numerico"].isna().to_numpy()
+    niveles = result.loc[missing, "nivel"]
+    counts = {name: int((niveles == name).sum()) for name, _ in LEVELS}
+    counts["misses"] = int(niveles.isna().sum())
+    return counts
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Geometrías simplificadas precalculadas de las capas de límites
+===============================================================
+Crea cartografia.<tabla>_simplified con una copia de cada fila por nivel de
+detalle (columna ``lod`` = zoom de src/backend/spatial.LOD_ZOOMS), con la
+geometría simplificada a la tolerancia de ese zoom. El API las sirve cuando
+se pide ?zoom= en /api/geo/uraba y /api/layers/{id}/geojson.
+
+Los loaders 06 y 10 la reconstruyen al terminar; también se puede correr sola:
+  python etl/simplified_layers.py
+"""
+
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from config import DB_URL
+
+from src.backend.spatial import LOD_ZOOMS, tolerance_for_zoom  # noqa: E402
+
+# (schema, tabla, columna geométrica)
+BOUNDARY_LAYERS = [
+    ("cartografia", "limite_municipal", "geom"),
+    ("cartografia", "igac_uraba", "geometry"),
+    ("cartografia", "veredas_mgn", "geom"),
+]
+
+
+def build_simplified(conn, schema: str, table: str, geom_col: str = "geom"):
+    """(Re)create ``<schema>.<table>_simplified`` from the base table."""
+    target = f"{schema}.{table}_simplified"
+    levels = " UNION ALL ".join(
+        f"SELECT {z}::smallint AS lod, "
+        f"ST_SimplifyPreserveTopology({geom_col}, {tolerance_for_zoom(z)!r}) AS _simplified, t.* "
+        f"FROM {schema}.{table} t"
+        for z in LOD_ZOOMS
+    )
+    conn.execute(text(f"DROP TABLE IF EXISTS {target}"))
+    conn.execute(text(f"CREATE TABLE {target} AS {levels}"))
+    conn.execute(text(f'ALTER TABLE {target} DROP COLUMN "{geom_col}"'))
+    conn.execute(text(f'ALTER TABLE {target} RENAME COLUMN _simplified TO "{geom_col}"'))
+    conn.execute(text(f"CREATE INDEX ON {target} (lod)"))
+    conn.execute(text(f'CREATE INDEX ON {target} USING gist("{geom_col}")'))
+    sizes = conn.execute(text(
+        f'SELECT lod, SUM(ST_NPoints("{geom_col}")) FROM {target} GROUP BY lod ORDER BY lod'
+    )).fetchall()
+    base = conn.execute(text(f'SELECT SUM(ST_NPoints("{geom_col}")) FROM {schema}.{table}')).scalar()
+    detail = ", ".join(f"z{lod}: {n}" for lod, n in sizes)
+    print(f"  {target}: vértices base {base} → {detail}")
+
+
+def main():
+    engine = create_engine(DB_URL)
+    for schema, table, geom_col in BOUNDARY_LAYERS:
+        with engine.begin() as conn:
+            exists = conn.execute(text("SELECT to_regclass(:t) IS NOT NULL"),
+                                  {"t": f"{schema}.{table}"}).scalar()
+            if not exists:
+                print(f"  SKIP {schema}.{table}: no existe")
+                continue
+            build_simplified(conn, schema, table, geom_col)
+    print("\nDone!")
+
+
+if __name__ == "__main__":
+    main()
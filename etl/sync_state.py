@@ -0,0 +1,67 @@
+"""
+Watermarks of the incremental offer sync (ETL 12).
+
+For each scraper source (``fuente``) the sync remembers the highest SQLite
+``ofertas.id`` it has already shipped, and the matching fecha_scraping, in
+empleo.sync_watermarks. The next run only reads rows past those ids, so its
+cost follows the new data instead of the whole scrape history. Watermarks
+are written in the same transaction as the inserted offers: a failed sync
+leaves them untouched and the rows are read again.
+"""
+from sqlalchemy import text
+
+SYNC_WATERMARKS_DDL = """
+CREATE TABLE IF NOT EXISTS empleo.sync_watermarks (
+    source TEXT NOT NULL,
+    fuente TEXT NOT NULL,
+    last_id BIGINT NOT NULL,
+    last_fecha_scraping TEXT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (source, fuente)
+)
+"""
+
+
+def load_watermarks(conn, source: str) -> dict:
+    """``{fuente: last_id}`` already synced from *source* (empty on first run)."""
+    conn.execute(text(SYNC_WATERMARKS_DDL))
+    rows = conn.execute(
+        text("SELECT fuente, last_id FROM empleo.sync_watermarks WHERE source = :s"),
+        {"s": source},
+    ).fetchall()
+    return {fuente: last_id for fuente, last_id in rows}
+
+
+def save_watermarks(conn, source: str, marks: dict) -> None:
+    """Advance the watermarks of *source* to ``{fuente: (last_id, last_fecha_scraping)}``."""
+    for fuente, (last_id, last_fecha) in marks.items():
+        conn.execute(text("""
+            INSERT INTO empleo.sync_watermarks (source, fuente, last_id, last_fecha_scraping, updated_at)
+            VALUES (:s, :f, :id, :fecha, now())
+            ON CONFLICT (source, fuente) DO UPDATE
+            SET last_id = GREATEST(empleo.sync_watermarks.last_id, EXCLUDED.last_id),
+                last_fecha_scraping = EXCLUDED.last_fecha_scraping,
+                updated_at = now()
+        """), {"s": source, "f": fuente, "id": last_id, "fecha": last_fecha})
+
+
+def pending_rows_sql(marks: dict) -> tuple[str, list]:
+    """SQLite query (and params) for the ``ofertas`` rows past *marks*, in id order."""
+    if not marks:
+        return "SELECT * FROM ofertas ORDER BY id", []
+    past = " OR ".join("(fuente = ? AND id > ?)" for _ in marks)
+    unseen = f"fuente NOT IN ({', '.join('?' for _ in marks)})"
+    params = [v for fuente, last_id in marks.items() for v in (fuente, last_id)] + list(marks)
+    return f"SELECT * FROM ofertas WHERE {past} OR {unseen} ORDER BY id", params
+
+
+class WatermarkTracker:
+    """Highest (id, fecha_scraping) seen per fuente while streaming rows."""
+
+    def __init__(self):
+        self.marks: dict = {}
+
+    def see(self, row) -> None:
+        fuente = row["fuente"]
+        if fuente not in self.marks or row["id"] > self.marks[fuente][0]:
+            self.marks[fuente] = (row["id"], row["fecha_scraping"])
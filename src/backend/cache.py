@@ -0,0 +1,345 @@
+"""
+Cache tiers for endpoint results.
+
+- LRUCache: in-process, bounded LRU with per-entry TTL and an approximate byte
+  budget per worker, so free-text query parameters cannot grow memory.
+- Shared tier (optional): pre-serialized JSON bytes in a store that every
+  worker of the container reads — a local SQLite file or any client with the
+  Redis get/set(ex=)/delete interface. Configured with CACHE_SHARED_URL.
+"""
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+logger = logging.getLogger("observatorio.cache")
+
+MISSING = object()
+
+# Expired entries are swept at most this often (seconds) on writes
+PURGE_INTERVAL = 30.0
+
+
+def approx_size(obj, _depth: int = 0) -> int:
+    """Rough deep size in bytes of a cached value or key (dicts, lists, scalars, bytes, Responses)."""
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return len(obj) + 64
+    body = getattr(obj, "body", None)
+    if isinstance(body, (bytes, bytearray)):
+        # Starlette Response (e.g. GeoJSONResponse): the rendered body dominates
+        return sys.getsizeof(obj) + len(body) + approx_size(getattr(obj, "headers", None) or {}, _depth + 1)
+    size = sys.getsizeof(obj)
+    if _depth > 6:
+        return size
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += approx_size(k, _depth + 1) + approx_size(v, _depth + 1)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += approx_size(item, _depth + 1)
+    return size
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with TTL and a memory budget.
+
+    Args:
+        max_entries: Max number of keys kept per worker.
+        max_bytes: Approximate max total size of cached values per worker.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 128 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: OrderedDict = OrderedDict()  # key -> (fresh_until, stale_until, size, value)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._last_purge = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return the fresh cached value for *key*, or MISSING if absent or expired."""
+        value, fresh = self.lookup(key)
+        return value if fresh else MISSING
+
+    def lookup(self, key):
+        """Return ``(value, fresh)``.
+
+        *value* is MISSING when the key is absent or past its stale window;
+        *fresh* is False when the value is only servable as stale.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING, False
+            fresh_until, stale_until, _, value = entry
+            if stale_until <= now:
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return MISSING, False
+            self._data.move_to_end(key)
+            if fresh_until <= now:
+                self.stale_hits += 1
+                return value, False
+            self.hits += 1
+            return value, True
+
+    def set(self, key, value, ttl: float, stale_ttl: float = 0):
+        """Store *value* under *key* for *ttl* seconds, evicting LRU entries as needed.
+
+        The entry stays servable as stale for *stale_ttl* more seconds.
+        """
+        size = approx_size(key) + approx_size(value)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (now + ttl, now + ttl + stale_ttl, size, value)
+            self._bytes += size
+            if now - self._last_purge >= PURGE_INTERVAL:
+                self._purge_expired(now)
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def purge_expired(self) -> int:
+        """Remove every expired entry; returns how many were dropped."""
+        with self._lock:
+            return self._purge_expired(time.time())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def peek(self, key):
+        """Like get() but without touching LRU order or hit/miss counters."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.time():
+                return MISSING
+            return entry[3]
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def _drop(self, key):
+        size = self._data.pop(key)[2]
+        self._bytes -= size
+
+    def _purge_expired(self, now: float) -> int:
+        expired = [k for k, entry in self._data.items() if entry[1] <= now]
+        for k in expired:
+            self._drop(k)
+        self.expirations += len(expired)
+        self._last_purge = now
+        return len(expired)
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key: the first caller (leader)
+    runs the function, the rest wait and share its result or exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def is_running(self, key) -> bool:
+        with self._lock:
+            return key in self._calls
+
+
+class SQLiteCacheBackend:
+    """
+    Shared cache tier on the container disk. Uses a SQLite file in WAL mode
+    so all uvicorn workers read what any of them computed. Exposes the
+    subset of the Redis client API used by the cache (get/set/delete/flushdb).
+    """
+
+    PURGE_EVERY = 200  # sets between sweeps of expired rows
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._sets = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, name: str):
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (name, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, name: str, value: bytes, ex: int = None):
+        expires_at = time.time() + ex if ex else float("inf")
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (name, sqlite3.Binary(value), expires_at),
+        )
+        self._sets += 1
+        if self._sets % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        conn.commit()
+        return True
+
+    def delete(self, *names: str) -> int:
+        conn = self._conn()
+        deleted = 0
+        for name in names:
+            deleted += conn.execute("DELETE FROM cache WHERE key = ?", (name,)).rowcount
+        conn.commit()
+        return deleted
+
+    def flushdb(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM cache")
+        conn.commit()
+        return True
+
+
+def shared_backend_from_env():
+    """
+    Build the shared tier from CACHE_SHARED_URL, or None when unset.
+
+    - ``sqlite:////tmp/observatorio-cache.sqlite3`` → SQLiteCacheBackend
+    - ``redis://host:6379/0`` → redis.Redis (requires the redis package)
+    """
+    url = os.getenv("CACHE_SHARED_URL", "")
+    if not url:
+        return None
+    try:
+        if url.startswith("sqlite:///"):
+            return SQLiteCacheBackend(url[len("sqlite:///"):])
+        if url.startswith(("redis://", "rediss://", "unix://")):
+            import redis
+            return redis.Redis.from_url(url, socket_timeout=1)
+        logger.warning("Unsupported CACHE_SHARED_URL scheme: %s", url.split(":", 1)[0])
+    except ImportError:
+        logger.warning("redis not installed. Run: pip install redis")
+    except Exception as e:
+        logger.error("Failed to initialize shared cache: %s", e)
+    return None
+
+
+def _json_default(obj):
+    """Encode values the way FastAPI's jsonable_encoder would."""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def encode_entry(value, fresh_until: float) -> bytes:
+    """Serialize a shared-tier entry: ``<fresh_until>\n<json>``."""
+    payload = json.dumps(value, default=_json_default, ensure_ascii=False, separators=(",", ":"))
+    return f"{fresh_until:.3f}\n".encode() + payload.encode("utf-8")
+
+
+def decode_entry(raw: bytes):
+    """Inverse of encode_entry: returns ``(value, fresh_until)``."""
+    header, _, payload = bytes(raw).partition(b"\n")
+    return json.loads(payload), float(header)
+
+
+def cache_from_env() -> LRUCache:
+    """Build the per-worker cache using CACHE_MAX_ENTRIES / CACHE_MAX_MB."""
+    return LRUCache(
+        max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "1024")),
+        max_bytes=int(float(os.getenv("CACHE_MAX_MB", "128")) * 1024 * 1024),
+    )
@@ -15,3 +15,6 @@ if ".neon.tech" in DATABASE_URL and "sslmode" not in DATABASE_URL:
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
 DANE_CODE = os.getenv("DANE_CODE", "05045")
 MUNICIPALITY_NAME = os.getenv("MUNICIPALITY_NAME", "Apartadó")
+
+# Vector tile cache for static cartography layers (disabled when empty)
+TILE_CACHE_PATH = os.getenv("TILE_CACHE_PATH", "")
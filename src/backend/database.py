@@ -1,11 +1,17 @@
-import json
-import time
+import hashlib
+import logging
 import sqlite3
 import os
+import threading
+import time
 from functools import wraps
+from fastapi.responses import Response
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from .config import DATABASE_URL
+from .cache import MISSING, SingleFlight, cache_from_env, shared_backend_from_env, encode_entry, decode_entry
+
+logger = logging.getLogger("observatorio.database")
 
 # Database Engine — supports both PostgreSQL (production) and SQLite (testing)
 _engine_kwargs = {"pool_pre_ping": True}
@@ -28,24 +34,127 @@ def get_sqlite_conn():
     conn.row_factory = sqlite3.Row
     return conn
 
-_cache = {}
+# Bounded per-worker cache (LRU + TTL + byte budget), see cache.py
+_cache = cache_from_env()
+# Optional second tier shared by all workers (SQLite file or Redis)
+_shared = shared_backend_from_env()
+_shared_counters = {"hits": 0, "errors": 0}
+# Updated from request threads and _revalidate background threads
+_shared_counters_lock = threading.Lock()
+# Concurrent misses on the same key share a single computation
+_inflight = SingleFlight()
+
+def cached(ttl_seconds: int = 600, stale_ttl: int = 0):
+    """In-memory TTL cache decorator for endpoint functions.
+
+    Entries live in the bounded LRU ``_cache``; least recently used keys are
+    evicted once CACHE_MAX_ENTRIES or CACHE_MAX_MB is exceeded. Concurrent
+    misses for the same key are coalesced so only one query runs.
+
+    With *stale_ttl* > 0 (stale-while-revalidate), an expired value is still
+    returned for up to *stale_ttl* extra seconds while a background thread
+    recomputes it; after that hard limit callers wait for a fresh value.
 
-def cached(ttl_seconds: int = 600):
-    """Simple in-memory TTL cache decorator for endpoint functions."""
+    When CACHE_SHARED_URL is set, misses in this worker first look in the
+    shared tier, and fresh results are written there as JSON bytes. Values
+    read back from it went through that JSON round trip (cache.encode_entry):
+    tuples, sets and frozensets come back as lists, Decimal as int/float and
+    dates as ISO strings, so callers must not rely on the exact type.
+    """
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
             # Create a cache key from function name and arguments
             key = (fn.__name__, args, tuple(sorted(kwargs.items())))
-            entry = _cache.get(key)
-            if entry and time.time() - entry[0] < ttl_seconds:
-                return entry[1]
-            result = fn(*args, **kwargs)
-            _cache[key] = (time.time(), result)
+
+            def compute():
+                # Another leader may have filled the key while we queued
+                value = _cache.peek(key)
+                if value is not MISSING:
+                    return value
+                value = _shared_get(key, stale_ttl)
+                if value is not MISSING:
+                    return value
+                value = fn(*args, **kwargs)
+                _cache.set(key, value, ttl_seconds, stale_ttl)
+                _shared_set(key, value, ttl_seconds, stale_ttl)
+                return value
+
+            result, fresh = _cache.lookup(key)
+            if result is MISSING:
+                return _inflight.do(key, compute)
+            if not fresh and not _inflight.is_running(key):
+                threading.Thread(target=_revalidate, args=(key, compute), daemon=True).start()
             return result
         return wrapper
     return decorator
 
+
+def _shared_key(key) -> str:
+    return "observatorio:" + hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+def _count_shared(name: str):
+    with _shared_counters_lock:
+        _shared_counters[name] += 1
+
+
+def _shared_get(key, stale_ttl):
+    """Fetch a still-fresh value from the shared tier into this worker's LRU."""
+    if _shared is None:
+        return MISSING
+    try:
+        raw = _shared.get(_shared_key(key))
+        if raw is None:
+            return MISSING
+        value, fresh_until = decode_entry(raw)
+    except Exception as e:
+        _count_shared("errors")
+        logger.warning("Shared cache read failed: %s", e)
+        return MISSING
+    remaining = fresh_until - time.time()
+    if remaining <= 0:
+        return MISSING
+    _count_shared("hits")
+    _cache.set(key, value, remaining, stale_ttl)
+    return value
+
+
+def _shared_set(key, value, ttl_seconds, stale_ttl):
+    if _shared is None:
+        return
+    try:
+        raw = encode_entry(value, time.time() + ttl_seconds)
+    except (TypeError, ValueError):
+        return  # not JSON-serializable (e.g. raw Response); keep it local
+    try:
+        _shared.set(_shared_key(key), raw, ex=max(1, int(ttl_seconds + stale_ttl)))
+    except Exception as e:
+        _count_shared("errors")
+        logger.warning("Shared cache write failed: %s", e)
+
+
+def _revalidate(key, compute):
+    """Refresh a stale entry in the background; keep serving stale on failure."""
+    try:
+        _inflight.do(key, compute)
+    except Exception as e:
+        logger.warning("Background cache refresh failed for %s: %s", key[0], e)
+
+
+def cache_stats() -> dict:
+    """Counters of the per-worker endpoint cache."""
+    with _shared_counters_lock:
+        shared = dict(_shared_counters)
+    return {
+        **_cache.stats(),
+        "coalesced": _inflight.coalesced,
+        "in_flight": _inflight.in_flight(),
+        "shared_backend": type(_shared).__name__ if _shared is not None else None,
+        "shared_hits": shared["hits"],
+        "shared_errors": shared["errors"],
+    }
+
 SessionLocal = sessionmaker(bind=engine)
 
 def get_db():
@@ -65,7 +174,49 @@ def query_dicts(sql: str, params: dict = None) -> list[dict]:
         return []
 
 
-def query_dicts_batch(queries: list[tuple[str, dict | None]]) -> list[list[dict]]:
+def table_version(table: str) -> str | None:
+    """Cheap change marker of *table* (``schema.name``), or None when unavailable.
+
+    Combines the relation identity (oid, relfilenode) with its insert/update/
+    delete counters in pg_stat_user_tables: any write changes the counters,
+    and a DROP + CREATE or TRUNCATE, which start a new set of counters,
+    changes the identity. Counters are reported at commit, so a write shows
+    up here within about a second.
+    """
+    try:
+        with engine.connect() as conn:
+            row = conn.execute(text("""
+                SELECT c.oid, c.relfilenode, s.n_tup_ins, s.n_tup_upd, s.n_tup_del
+                FROM pg_class c JOIN pg_stat_user_tables s ON s.relid = c.oid
+                WHERE c.oid = to_regclass(:t)
+            """), {"t": table}).fetchone()
+    except Exception as e:
+        logger.warning("No version for %s: %s", table, e)
+        return None
+    return ".".join(str(v) for v in row) if row else None
+
+
+STREAM_BATCH_ROWS = 1000
+
+
+def stream_query(sql: str, params: dict = None, batch_rows: int = STREAM_BATCH_ROWS):
+    """Run SQL with a server-side cursor and yield its rows in batches.
+
+    The first item yielded is the list of column names; each following item
+    is a list of up to *batch_rows* row tuples. Only one batch is held in
+    memory at a time and the connection stays checked out until the
+    generator is exhausted or closed (e.g. the client disconnects).
+    """
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_rows).execute(
+            text(sql), params or {}
+        )
+        yield list(result.keys())
+        for batch in result.partitions(batch_rows):
+            yield [tuple(row) for row in batch]
+
+
+def query_dicts_batch(queries: list[tuple[str, dict | None]], strict: bool = False) -> list[list[dict]]:
     """Execute multiple SQL queries on a single connection, returning a list of results.
 
     Each item in *queries* is a (sql, params) tuple.
@@ -73,7 +224,8 @@ def query_dicts_batch(queries: list[tuple[str, dict | None]]) -> list[list[dict]
     This avoids opening multiple connections from the pool, which can
     exhaust Vercel serverless connection limits.
     Uses SAVEPOINTs so a failed query doesn't abort the transaction for
-    subsequent queries.
+    subsequent queries; its result is ``[]``, or with ``strict=True`` the
+    error is raised so callers can tell it apart from an empty result.
     """
     results: list[list[dict]] = []
     with engine.connect() as conn:
@@ -88,6 +240,8 @@ def query_dicts_batch(queries: list[tuple[str, dict | None]]) -> list[list[dict]
                     results.append([])
                 conn.execute(text(f"RELEASE SAVEPOINT sp_{i}"))
             except Exception:
+                if strict:
+                    raise
                 results.append([])
                 try:
                     conn.execute(text(f"ROLLBACK TO SAVEPOINT sp_{i}"))
@@ -95,22 +249,44 @@ def query_dicts_batch(queries: list[tuple[str, dict | None]]) -> list[list[dict]
                     pass
     return results
 
-def query_geojson(sql: str, params: dict = None, geom_col: str = "geom") -> dict:
+EMPTY_FEATURE_COLLECTION = b'{"type": "FeatureCollection", "features": []}'
+
+
+class GeoJSONResponse(Response):
+    """Response carrying a FeatureCollection already serialized by PostGIS."""
+    media_type = "application/geo+json"
+
+
+def query_geojson(sql: str, params: dict = None, geom_col: str = "geom",
+                  tolerance: float = None, max_digits: int = 15,
+                  exclude: tuple[str, ...] = ()) -> GeoJSONResponse:
     """Execute SQL and return a GeoJSON FeatureCollection built server-side
-    by PostGIS. *geom_col* must match the geometry column name in the query."""
+    by PostGIS. *geom_col* must match the geometry column name in the query.
+
+    *tolerance* (degrees) applies ST_SimplifyPreserveTopology and
+    *max_digits* limits the coordinate decimals written by ST_AsGeoJSON;
+    see spatial.geometry_detail() to derive both from a map zoom. Columns in
+    *exclude* are left out of the feature properties.
+
+    The aggregate is fetched as text and passed through untouched, so the
+    features are never parsed into Python objects nor re-encoded."""
+    geom = f"sub.{geom_col}"
+    if tolerance:
+        geom = f"ST_SimplifyPreserveTopology({geom}, {float(tolerance)!r})"
+    properties = "".join(f" - '{c}'" for c in (geom_col, *exclude))
     wrapped = f"""
         SELECT json_build_object(
             'type', 'FeatureCollection',
             'features', COALESCE(json_agg(
                 json_build_object(
                     'type', 'Feature',
-                    'geometry', ST_AsGeoJSON(sub.{geom_col})::json,
-                    'properties', to_jsonb(sub) - '{geom_col}'
+                    'geometry', ST_AsGeoJSON({geom}, {int(max_digits)})::json,
+                    'properties', to_jsonb(sub){properties}
                 )
             ), '[]'::json)
-        ) AS fc
+        )::text AS fc
         FROM ({sql}) sub
     """
     with engine.connect() as conn:
         row = conn.execute(text(wrapped), params or {}).fetchone()
-    return row[0] if row and row[0] else {"type": "FeatureCollection", "features": []}
+    return GeoJSONResponse(content=row[0] if row and row[0] else EMPTY_FEATURE_COLLECTION)
@@ -8,7 +8,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from sqlalchemy.exc import SQLAlchemyError
-from .routers import layers, geo, indicators, crossvar, stats, empleo, analytics
+from .routers import layers, geo, indicators, crossvar, stats, empleo, analytics, export
 from .middleware.rate_limit import RateLimitMiddleware
 from .monitoring import setup_logging, init_sentry
 
@@ -24,6 +24,7 @@ TAGS_METADATA = [
     {"name": "Estadísticas", "description": "Resumen ejecutivo y catálogo de datos"},
     {"name": "Empleo", "description": "Mercado laboral y vacantes (Uraba Empleos)"},
     {"name": "Analytics", "description": "Inteligencia territorial, gaps y rankings regionales"},
+    {"name": "Exportación", "description": "Descarga masiva de datos: NDJSON y CSV en streaming, Parquet y Arrow"},
 ]
 
 app = FastAPI(
@@ -97,6 +98,7 @@ app.include_router(crossvar.router)
 app.include_router(stats.router)
 app.include_router(empleo.router)
 app.include_router(analytics.router)
+app.include_router(export.router)
 
 
 @app.exception_handler(SQLAlchemyError)
@@ -128,5 +130,6 @@ def root():
             "indicators": "/api/indicators",
             "empleo": "/api/empleo/ofertas",
             "analytics": "/api/analytics/ranking",
+            "export": "/api/export/ofertas.ndjson",
         },
     }
@@ -0,0 +1,128 @@
+"""
+Keyset (cursor) pagination for the listing endpoints.
+
+``LIMIT n OFFSET k`` makes PostgreSQL read and discard k rows, so deep pages
+get linearly slower. A cursor instead carries the sort key of the last row
+served and the next page starts with the row-value comparison
+``WHERE (sort_key, id) < (:cur_v, :cur_id)`` (``>`` ascending): an index
+matching the ORDER BY starts its range scan at the cursor, so a page costs
+the same at any depth. Rows with a NULL sort key (NULLS LAST) are a second
+phase, ``sort_key IS NULL AND id < :cur_id``, started by keyset_fetch() once
+the non-NULL keys run out.
+
+Cursors are opaque to clients: urlsafe base64 of a small JSON document that
+also records the ordering it was produced for, so a cursor cannot be
+replayed against a different ``sort_by``/``sort_order``.
+"""
+import base64
+import datetime
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from .database import engine, query_dicts
+
+TOTAL_MODES = ("exact", "estimate", "none")
+
+
+def encode_cursor(order: str, values: list) -> str:
+    """Opaque token for the row whose sort key is *values* under *order*."""
+    values = [v.isoformat() if isinstance(v, (datetime.date, datetime.datetime)) else v
+              for v in values]
+    raw = json.dumps({"o": order, "v": values}, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str) -> list:
+    """Sort key stored in *cursor*; 400 if malformed or produced for another order."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        doc = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = doc["v"]
+        produced_for = doc["o"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="cursor inválido")
+    if produced_for != order or not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="cursor no corresponde al orden solicitado")
+    return values
+
+
+def keyset_condition(sort_col: str, tiebreak_col: str, descending: bool, values: list,
+                     params: dict, cast: str = None) -> str:
+    """
+    Predicate selecting the rows after *values* under
+    ``ORDER BY sort_col {dir} NULLS LAST, tiebreak_col {dir}`` within the
+    current phase: the non-NULL sort keys or, once the cursor is in the
+    NULLS LAST tail, the NULL ones. keyset_fetch() moves between them.
+
+    *tiebreak_col* must be unique and NOT NULL; *cast* is the SQL type the
+    cursor value of *sort_col* is converted to (JSON only carries strings
+    and numbers).
+    """
+    value, last_id = values
+    op = "<" if descending else ">"
+    params["cur_id"] = last_id
+    if value is None:
+        # Already inside the NULLS LAST tail: only the tiebreaker advances
+        return f"({sort_col} IS NULL AND {tiebreak_col} {op} :cur_id)"
+    params["cur_v"] = value
+    bound = f"CAST(:cur_v AS {cast})" if cast else ":cur_v"
+    # NULL keys never satisfy the row comparison: they are the next phase
+    return f"(({sort_col}, {tiebreak_col}) {op} ({bound}, :cur_id))"
+
+
+def keyset_fetch(fetch, where: str, params: dict, sort_col: str, tiebreak_col: str,
+                 descending: bool, values: list, cast: str = None) -> list:
+    """
+    Up to ``params["lim"]`` rows after the cursor *values*.
+
+    ``fetch(where, params)`` runs the listing query (``LIMIT :lim OFFSET
+    :off``) for a WHERE clause. When the non-NULL sort keys run out before
+    the page is full, the rest of the page comes from the NULLS LAST tail,
+    so every query stays a single index range.
+    """
+    params = dict(params, off=0)
+    condition = keyset_condition(sort_col, tiebreak_col, descending, values, params, cast=cast)
+    rows = fetch(f"{where} AND {condition}", params)
+    missing = params["lim"] - len(rows)
+    if values[0] is not None and missing > 0:
+        rows += fetch(f"{where} AND {sort_col} IS NULL", dict(params, lim=missing))
+    return rows
+
+
+def estimate_count(from_where: str, params: dict) -> int:
+    """Planner row estimate for ``SELECT ... <from_where>`` (no table scan)."""
+    try:
+        with engine.connect() as conn:
+            plan = conn.execute(
+                text(f"EXPLAIN (FORMAT JSON) SELECT 1 {from_where}"), params
+            ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception:
+        return 0
+
+
+def count_total(mode: str, from_where: str, params: dict) -> int | None:
+    """Total rows of the listing: exact COUNT(*), planner estimate or None."""
+    if mode == "none":
+        return None
+    if mode == "estimate":
+        return estimate_count(from_where, params)
+    rows = query_dicts(f"SELECT COUNT(*) as total {from_where}", params)
+    return rows[0]["total"] if rows else 0
+
+
+def page_response(items: list, page_size: int, page: int, total: int | None,
+                  total_mode: str, next_cursor: str | None) -> dict:
+    return {
+        "items": items,
+        "total": total,
+        "total_mode": total_mode,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": max(1, -(-total // page_size)) if total is not None else None,
+        "next_cursor": next_cursor,
+    }
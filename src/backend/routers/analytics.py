@@ -1,10 +1,38 @@
 """
 Módulo de Analítica Avanzada — Inteligencia Territorial y Laboral para Urabá
 """
+import logging
+
 from fastapi import APIRouter, Query, HTTPException
 from ..database import cached, query_dicts, query_dicts_batch
+from ..services.empleo_cube import UNICAS_CONDITION, get_cube
 
 router = APIRouter(prefix="/api/analytics", tags=["Analytics"])
+logger = logging.getLogger("observatorio.analytics")
+
+# Vistas materializadas del schema analytics (etl/18_analytics_views.sql),
+# refrescadas por etl/analytics_refresh.py al final de los ETL de empleo.
+# Cuentan una oferta por vacante (UNICAS_CONDITION), igual que las consultas
+# de respaldo y todos los agregados de ofertas de este módulo.
+ANALYTICS_READY_SQL = "SELECT to_regclass('analytics.salario_cobertura') IS NOT NULL AS ready"
+
+
+def _analytics_batch(queries):
+    """Run *queries* against the analytics views in one batch.
+
+    Returns None while the views do not exist yet or when any query fails
+    (a view dropped mid-refresh, permissions...), so the caller recomputes
+    the aggregates from empleo.ofertas_laborales instead of caching an
+    error as empty data.
+    """
+    try:
+        results = query_dicts_batch([(ANALYTICS_READY_SQL, None), *queries], strict=True)
+    except Exception as e:
+        logger.warning("analytics views unavailable, using raw SQL: %s", e)
+        return None
+    if results and results[0] == [{"ready": True}]:
+        return results[1:]
+    return None
 
 
 @router.get("/gaps")
@@ -74,7 +102,7 @@ def get_ranking(
 @cached(ttl_seconds=1800)
 def get_termometro_laboral():
     """Termómetro Laboral: Intensidad de ofertas recientes por municipio."""
-    sql = """
+    sql = f"""
         SELECT
             municipio,
             COUNT(CASE WHEN fecha_publicacion >= CURRENT_DATE - INTERVAL '7 days' THEN 1 END) as ultimos_7_dias,
@@ -83,6 +111,7 @@ def get_termometro_laboral():
             COUNT(CASE WHEN fecha_publicacion >= CURRENT_DATE - INTERVAL '30 days' THEN 1 END) as ultimos_30_dias,
             COUNT(*) as total
         FROM empleo.ofertas_laborales
+        WHERE {UNICAS_CONDITION}
         GROUP BY municipio
         ORDER BY total DESC
     """
@@ -98,10 +127,10 @@ def get_termometro_laboral():
 def get_oferta_demanda():
     """Oferta laboral vs demanda potencial (población)."""
     ofertas, poblacion = query_dicts_batch([
-        ("""
+        (f"""
             SELECT municipio, dane_code, COUNT(*) as vacantes
             FROM empleo.ofertas_laborales
-            WHERE dane_code IS NOT NULL
+            WHERE dane_code IS NOT NULL AND {UNICAS_CONDITION}
             GROUP BY municipio, dane_code
             ORDER BY vacantes DESC
         """, None),
@@ -135,7 +164,7 @@ def get_oferta_demanda():
 @cached(ttl_seconds=3600)
 def get_brecha_skills(dane_code: str = Query(None)):
     """Brecha de habilidades: skills demandadas vs formación disponible en la región."""
-    conditions = ["1=1"]
+    conditions = [UNICAS_CONDITION]
     params = {}
     if dane_code:
         conditions.append("dane_code = :dane")
@@ -220,7 +249,7 @@ def _generate_skill_insights(skills, sectores):
 @cached(ttl_seconds=3600)
 def get_dinamismo_laboral():
     """Índice de dinamismo laboral: velocidad de publicación de nuevas ofertas."""
-    sql = """
+    sql = f"""
         WITH monthly AS (
             SELECT
                 TO_CHAR(fecha_publicacion, 'YYYY-MM') as mes,
@@ -229,7 +258,7 @@ def get_dinamismo_laboral():
                 COUNT(DISTINCT municipio) as municipios,
                 COUNT(DISTINCT sector) as sectores
             FROM empleo.ofertas_laborales
-            WHERE fecha_publicacion IS NOT NULL
+            WHERE fecha_publicacion IS NOT NULL AND {UNICAS_CONDITION}
             GROUP BY TO_CHAR(fecha_publicacion, 'YYYY-MM')
             ORDER BY mes
         ),
@@ -260,37 +289,50 @@ def get_dinamismo_laboral():
 
 
 @router.get("/laboral/concentracion")
-@cached(ttl_seconds=3600)
+@cached(ttl_seconds=3600, stale_ttl=1800)
 def get_concentracion_laboral():
     """Concentración laboral: distribución geográfica de la actividad económica."""
-    sql = """
-        WITH muni_stats AS (
-            SELECT
-                o.municipio,
-                o.dane_code,
-                COUNT(*) as ofertas,
-                COUNT(DISTINCT o.empresa) as empresas,
-                COUNT(DISTINCT o.sector) as sectores,
-                ROUND(AVG(o.salario_numerico)) as salario_promedio,
-                STRING_AGG(DISTINCT o.sector, ', ' ORDER BY o.sector) as sectores_presentes
-            FROM empleo.ofertas_laborales o
-            WHERE o.dane_code IS NOT NULL
-            GROUP BY o.municipio, o.dane_code
-        ),
-        total AS (
-            SELECT SUM(ofertas) as total_ofertas FROM muni_stats
-        )
+    views = _analytics_batch([("""
         SELECT
             m.*,
-            ROUND((m.ofertas::numeric / t.total_ofertas) * 100, 1) as pct_ofertas,
+            ROUND((m.ofertas::numeric / SUM(m.ofertas) OVER ()) * 100, 1) as pct_ofertas,
             ST_Y(ST_Centroid(lm.geom)) as lat,
             ST_X(ST_Centroid(lm.geom)) as lon
-        FROM muni_stats m
-        CROSS JOIN total t
+        FROM analytics.concentracion_municipio m
         LEFT JOIN cartografia.limite_municipal lm ON m.dane_code = lm.dane_code
         ORDER BY ofertas DESC
-    """
-    rows = query_dicts(sql)
+    """, None)])
+    if views is not None:
+        rows = views[0]
+    else:
+        sql = f"""
+            WITH muni_stats AS (
+                SELECT
+                    o.municipio,
+                    o.dane_code,
+                    COUNT(*) as ofertas,
+                    COUNT(DISTINCT o.empresa) as empresas,
+                    COUNT(DISTINCT o.sector) as sectores,
+                    ROUND(AVG(o.salario_numerico)) as salario_promedio,
+                    STRING_AGG(DISTINCT o.sector, ', ' ORDER BY o.sector) as sectores_presentes
+                FROM empleo.ofertas_laborales o
+                WHERE o.dane_code IS NOT NULL AND {UNICAS_CONDITION}
+                GROUP BY o.municipio, o.dane_code
+            ),
+            total AS (
+                SELECT SUM(ofertas) as total_ofertas FROM muni_stats
+            )
+            SELECT
+                m.*,
+                ROUND((m.ofertas::numeric / t.total_ofertas) * 100, 1) as pct_ofertas,
+                ST_Y(ST_Centroid(lm.geom)) as lat,
+                ST_X(ST_Centroid(lm.geom)) as lon
+            FROM muni_stats m
+            CROSS JOIN total t
+            LEFT JOIN cartografia.limite_municipal lm ON m.dane_code = lm.dane_code
+            ORDER BY ofertas DESC
+        """
+        rows = query_dicts(sql)
     for r in rows:
         if r.get("salario_promedio"):
             r["salario_promedio"] = int(r["salario_promedio"])
@@ -298,17 +340,25 @@ def get_concentracion_laboral():
 
 
 @router.get("/laboral/sector-municipio")
-@cached(ttl_seconds=3600)
+@cached(ttl_seconds=3600, stale_ttl=1800)
 def get_sector_municipio_matrix():
     """Matriz sector × municipio: cuántas ofertas hay por sector en cada municipio."""
-    sql = """
-        SELECT sector, municipio, COUNT(*) as ofertas
-        FROM empleo.ofertas_laborales
-        WHERE sector != 'Otro'
-        GROUP BY sector, municipio
-        ORDER BY sector, ofertas DESC
-    """
-    rows = query_dicts(sql)
+    cube = get_cube()
+    if cube is not None:
+        m = cube.exclude(cube.mask(), "sector", "Otro")
+        rows = [
+            {"sector": sector, "municipio": municipio, "ofertas": n}
+            for sector, municipio, n in cube.crosstab("sector", "municipio", m)
+        ]
+    else:
+        sql = f"""
+            SELECT sector, municipio, COUNT(*) as ofertas
+            FROM empleo.ofertas_laborales
+            WHERE sector != 'Otro' AND {UNICAS_CONDITION}
+            GROUP BY sector, municipio
+            ORDER BY sector, ofertas DESC
+        """
+        rows = query_dicts(sql)
 
     # Pivot to matrix format
     sectors = {}
@@ -323,7 +373,7 @@ def get_sector_municipio_matrix():
 
 
 @router.get("/laboral/cadenas-productivas")
-@cached(ttl_seconds=3600)
+@cached(ttl_seconds=3600, stale_ttl=1800)
 def get_cadenas_productivas():
     """Análisis por cadenas productivas de Urabá: ofertas, empresas y salario por cadena."""
     CADENAS = {
@@ -362,20 +412,26 @@ def get_cadenas_productivas():
         },
     }
 
+    views = _analytics_batch([
+        ("SELECT sector, municipio, ofertas, empresas, salario_promedio "
+         "FROM analytics.sector_municipio", None),
+        ("SELECT sector, skill, demanda FROM analytics.sector_skill "
+         "ORDER BY sector, demanda DESC", None),
+    ])
     # Fetch both queries on a single connection
-    sector_data, skills_data = query_dicts_batch([
-        ("""
+    sector_data, skills_data = views or query_dicts_batch([
+        (f"""
             SELECT sector, municipio, COUNT(*) as ofertas,
                    COUNT(DISTINCT empresa) as empresas,
                    ROUND(AVG(salario_numerico)) as salario_promedio
             FROM empleo.ofertas_laborales
-            WHERE sector IS NOT NULL
+            WHERE sector IS NOT NULL AND {UNICAS_CONDITION}
             GROUP BY sector, municipio
         """, None),
-        ("""
+        (f"""
             SELECT sector, skill, COUNT(*) as demanda
             FROM empleo.ofertas_laborales, UNNEST(skills) AS skill
-            WHERE sector IS NOT NULL
+            WHERE sector IS NOT NULL AND {UNICAS_CONDITION}
             GROUP BY sector, skill
             ORDER BY sector, demanda DESC
         """, None),
@@ -443,26 +499,41 @@ def get_cadenas_productivas():
 
 
 @router.get("/laboral/estacionalidad")
-@cached(ttl_seconds=3600)
+@cached(ttl_seconds=3600, stale_ttl=1800)
 def get_estacionalidad_laboral():
     """Perfil estacional: ofertas y salario promedio por mes del año (1-12) y sector."""
-    # Run both queries on a single connection
-    rows, general = query_dicts_batch([
+    views = _analytics_batch([
         ("""
+            SELECT mes, sector, ofertas,
+                   ROUND(salario_suma::numeric / NULLIF(salario_n, 0)) as salario_promedio
+            FROM analytics.estacionalidad_mes_sector
+            ORDER BY mes, ofertas DESC
+        """, None),
+        ("""
+            SELECT mes, SUM(ofertas)::bigint as ofertas,
+                   ROUND(SUM(salario_suma)::numeric / NULLIF(SUM(salario_n), 0)) as salario_promedio
+            FROM analytics.estacionalidad_mes_sector
+            GROUP BY mes
+            ORDER BY mes
+        """, None),
+    ])
+    # Run both queries on a single connection
+    rows, general = views or query_dicts_batch([
+        (f"""
             SELECT EXTRACT(MONTH FROM fecha_publicacion)::int as mes,
                    sector, COUNT(*) as ofertas,
                    ROUND(AVG(salario_numerico)) as salario_promedio
             FROM empleo.ofertas_laborales
-            WHERE fecha_publicacion IS NOT NULL
+            WHERE fecha_publicacion IS NOT NULL AND {UNICAS_CONDITION}
             GROUP BY mes, sector
             ORDER BY mes, ofertas DESC
         """, None),
-        ("""
+        (f"""
             SELECT EXTRACT(MONTH FROM fecha_publicacion)::int as mes,
                    COUNT(*) as ofertas,
                    ROUND(AVG(salario_numerico)) as salario_promedio
             FROM empleo.ofertas_laborales
-            WHERE fecha_publicacion IS NOT NULL
+            WHERE fecha_publicacion IS NOT NULL AND {UNICAS_CONDITION}
             GROUP BY mes
             ORDER BY mes
         """, None),
@@ -520,35 +591,43 @@ def get_estacionalidad_laboral():
 
 
 @router.get("/laboral/informalidad")
-@cached(ttl_seconds=3600)
+@cached(ttl_seconds=3600, stale_ttl=1800)
 def get_informalidad_laboral():
     """Indicador de informalidad laboral por municipio combinando IPM, ofertas y TerriData."""
+    # 1. IPM: empleo_informal
+    ipm_query = ("""
+        SELECT municipio, dane_code, empleo_informal as tasa_ipm
+        FROM socioeconomico.ipm
+        WHERE empleo_informal IS NOT NULL
+        ORDER BY empleo_informal DESC
+    """, None)
+    # 3. Pobreza monetaria from TerriData
+    pobreza_query = ("""
+        SELECT DISTINCT ON (dane_code) dane_code, dato_numerico as pobreza_monetaria, anio
+        FROM socioeconomico.terridata
+        WHERE indicador = 'Incidencia de la pobreza monetaria'
+        ORDER BY dane_code, anio DESC
+    """, None)
+    # 2. Proxy from ofertas: % contratos no-indefinidos
+    views = _analytics_batch([
+        ipm_query,
+        ("SELECT municipio, dane_code, total_ofertas, no_indefinido, indefinido "
+         "FROM analytics.contratos_municipio", None),
+        pobreza_query,
+    ])
     # Run all 3 queries on a single DB connection to avoid pool exhaustion on Vercel
-    ipm_data, proxy_data, pobreza_data = query_dicts_batch([
-        # 1. IPM: empleo_informal
-        ("""
-            SELECT municipio, dane_code, empleo_informal as tasa_ipm
-            FROM socioeconomico.ipm
-            WHERE empleo_informal IS NOT NULL
-            ORDER BY empleo_informal DESC
-        """, None),
-        # 2. Proxy from ofertas: % contratos no-indefinidos
-        ("""
+    ipm_data, proxy_data, pobreza_data = views or query_dicts_batch([
+        ipm_query,
+        (f"""
             SELECT municipio, dane_code,
                    COUNT(*) as total_ofertas,
                    COUNT(CASE WHEN tipo_contrato IN ('Prestacion de servicios', 'Obra o labor') THEN 1 END) as no_indefinido,
                    COUNT(CASE WHEN tipo_contrato = 'Indefinido' THEN 1 END) as indefinido
             FROM empleo.ofertas_laborales
-            WHERE tipo_contrato IS NOT NULL AND dane_code IS NOT NULL
+            WHERE tipo_contrato IS NOT NULL AND dane_code IS NOT NULL AND {UNICAS_CONDITION}
             GROUP BY municipio, dane_code
         """, None),
-        # 3. Pobreza monetaria from TerriData
-        ("""
-            SELECT DISTINCT ON (dane_code) dane_code, dato_numerico as pobreza_monetaria, anio
-            FROM socioeconomico.terridata
-            WHERE indicador = 'Incidencia de la pobreza monetaria'
-            ORDER BY dane_code, anio DESC
-        """, None),
+        pobreza_query,
     ])
 
     # Build lookups
@@ -602,28 +681,37 @@ def get_informalidad_laboral():
 
 
 @router.get("/laboral/salario-imputado")
-@cached(ttl_seconds=3600)
+@cached(ttl_seconds=3600, stale_ttl=1800)
 def get_salario_imputado():
     """Tabla de referencia salarial y estadísticas de imputación."""
+    views = _analytics_batch([
+        ("""
+            SELECT sector, municipio, nivel_educativo, nivel_experiencia,
+                   salario_estimado, muestra, mediana
+            FROM analytics.salario_referencia
+        """, None),
+        ("SELECT total, con_salario, con_imputado FROM analytics.salario_cobertura", None),
+    ])
     # Run both queries on a single DB connection to avoid pool exhaustion on Vercel.
     # Use a safe cobertura query that handles missing salario_imputado column gracefully.
-    referencia, cobertura = query_dicts_batch([
-        ("""
+    referencia, cobertura = views or query_dicts_batch([
+        (f"""
             SELECT sector, municipio, nivel_educativo, nivel_experiencia,
                    ROUND(AVG(salario_numerico)) as salario_estimado,
                    COUNT(*) as muestra,
                    PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY salario_numerico) as mediana
             FROM empleo.ofertas_laborales
-            WHERE salario_numerico IS NOT NULL
+            WHERE salario_numerico IS NOT NULL AND {UNICAS_CONDITION}
             GROUP BY sector, municipio, nivel_educativo, nivel_experiencia
             HAVING COUNT(*) >= 3
         """, None),
-        ("""
+        (f"""
             SELECT
                 COUNT(*) as total,
                 COUNT(CASE WHEN salario_numerico IS NOT NULL THEN 1 END) as con_salario,
                 COUNT(CASE WHEN salario_imputado IS NOT NULL THEN 1 END) as con_imputado
             FROM empleo.ofertas_laborales
+            WHERE {UNICAS_CONDITION}
         """, None),
     ])
 
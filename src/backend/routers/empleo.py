@@ -3,13 +3,22 @@ Router para el mercado laboral y ofertas de empleo en Urabá
 ============================================================
 Fuente: empleo.ofertas_laborales (PostgreSQL / Supabase)
 Fallback: SQLite ~/uraba_empleos/empleos_uraba.db
+
+Los agregados cuentan una oferta por vacante (UNICAS_CONDITION); /ofertas
+devuelve todas salvo con ``unicas=true``.
 """
 from fastapi import APIRouter, Query
 from ..database import engine, cached, query_dicts
+from ..pagination import count_total, decode_cursor, encode_cursor, keyset_fetch, page_response
+from ..search import ofertas_search
+from ..services.empleo_cube import UNICAS_CONDITION, get_cube
 from sqlalchemy import text
 
 router = APIRouter(prefix="/api/empleo", tags=["Empleo"])
 
+OFERTAS_ORDER = "fecha_publicacion:desc"
+RELEVANCIA_ORDER = "relevancia:desc"
+
 
 def _table_exists():
     """Check if the PG table exists."""
@@ -21,20 +30,9 @@ def _table_exists():
         return False
 
 
-@router.get("/ofertas")
-@cached(ttl_seconds=3600)
-def get_ofertas(
-    municipio: str = Query(None, description="Filtrar por municipio"),
-    fuente: str = Query(None, description="Filtrar por fuente"),
-    sector: str = Query(None, description="Filtrar por sector"),
-    dane_code: str = Query(None, description="Filtrar por código DANE"),
-    busqueda: str = Query(None, description="Buscar en título o descripción"),
-    tipo_contrato: str = Query(None, description="Filtrar por tipo de contrato"),
-    modalidad: str = Query(None, description="Filtrar por modalidad"),
-    page: int = Query(1, ge=1),
-    page_size: int = Query(25, le=100),
-):
-    """Listado de ofertas laborales con paginación."""
+def ofertas_filters(municipio=None, fuente=None, sector=None, dane_code=None, busqueda=None,
+                    tipo_contrato=None, modalidad=None, unicas=False):
+    """``(conditions, params, rank)`` de los filtros de /ofertas (también usados por /api/export)."""
     conditions = ["1=1"]
     params = {}
     if municipio:
@@ -49,116 +47,183 @@ def get_ofertas(
     if dane_code:
         conditions.append("dane_code = :dane")
         params["dane"] = dane_code
+    rank = None
     if busqueda:
-        conditions.append("(titulo ILIKE :q OR descripcion ILIKE :q)")
-        params["q"] = f"%{busqueda}%"
+        condition, rank = ofertas_search(busqueda, params)
+        conditions.append(condition)
     if tipo_contrato:
         conditions.append("tipo_contrato = :tipo_contrato")
         params["tipo_contrato"] = tipo_contrato
     if modalidad:
         conditions.append("modalidad = :modalidad")
         params["modalidad"] = modalidad
+    if unicas:
+        conditions.append(UNICAS_CONDITION)
+    return conditions, params, rank
 
-    where = " AND ".join(conditions)
-    offset = (page - 1) * page_size
-    params["lim"] = page_size
-    params["off"] = offset
 
-    count_rows = query_dicts(
-        f"SELECT COUNT(*) as total FROM empleo.ofertas_laborales WHERE {where}", params
-    )
-    total = count_rows[0]["total"] if count_rows else 0
-    total_pages = max(1, -(-total // page_size))
+@router.get("/ofertas")
+@cached(ttl_seconds=3600)
+def get_ofertas(
+    municipio: str = Query(None, description="Filtrar por municipio"),
+    fuente: str = Query(None, description="Filtrar por fuente"),
+    sector: str = Query(None, description="Filtrar por sector"),
+    dane_code: str = Query(None, description="Filtrar por código DANE"),
+    busqueda: str = Query(None, description="Buscar en título, empresa o descripción (texto completo)"),
+    tipo_contrato: str = Query(None, description="Filtrar por tipo de contrato"),
+    modalidad: str = Query(None, description="Filtrar por modalidad"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(25, le=100),
+    cursor: str = Query(None, description="next_cursor de la página anterior (ignora page)"),
+    total: str = Query(None, pattern="^(exact|estimate|none)$",
+                       description="Conteo total: exact, estimate o none (por defecto exact sin cursor, none con cursor)"),
+    orden: str = Query("fecha", pattern="^(fecha|relevancia)$",
+                       description="fecha (más recientes primero) o relevancia (requiere busqueda)"),
+    unicas: bool = Query(False, description="Solo una oferta por vacante (omite casi-duplicados entre portales)"),
+):
+    """
+    Listado de ofertas laborales con paginación.
 
-    sql = f"""
-        SELECT id, titulo, empresa, salario_texto, salario_numerico,
-               descripcion, municipio, dane_code, fuente, sector, skills,
-               fecha_publicacion, enlace,
-               nivel_experiencia, tipo_contrato, nivel_educativo, modalidad
-        FROM empleo.ofertas_laborales
-        WHERE {where}
-        ORDER BY fecha_publicacion DESC NULLS LAST
-        LIMIT :lim OFFSET :off
+    Ordenado por fecha_publicacion DESC NULLS LAST, id DESC, o por
+    relevancia de la búsqueda con ``orden=relevancia``. Con ``cursor`` la
+    página se lee por keyset (sin recorrer las filas anteriores);
+    ``page`` sigue funcionando con OFFSET para las primeras páginas.
+    ``unicas=true`` deja una oferta por cluster de casi-duplicados.
     """
-    items = query_dicts(sql, params)
-    return {
-        "items": items,
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": total_pages,
-    }
+    conditions, params, rank = ofertas_filters(
+        municipio, fuente, sector, dane_code, busqueda, tipo_contrato, modalidad, unicas
+    )
+    where = " AND ".join(conditions)
+    total_mode = total or ("none" if cursor else "exact")
+    total_count = count_total(total_mode, f"FROM empleo.ofertas_laborales WHERE {where}", dict(params))
+
+    if orden == "relevancia" and rank:
+        sort_key, sort_field, cursor_order, cast = rank, "relevancia", RELEVANCIA_ORDER, None
+    else:
+        sort_key, sort_field, cursor_order, cast = "fecha_publicacion", "fecha_publicacion", OFERTAS_ORDER, "date"
+
+    rank_col = f",\n                   {rank} AS relevancia" if rank else ""
+
+    def fetch(where, params):
+        return query_dicts(f"""
+            SELECT id, titulo, empresa, salario_texto, salario_numerico,
+                   descripcion, municipio, dane_code, fuente, sector, skills,
+                   fecha_publicacion, enlace,
+                   nivel_experiencia, tipo_contrato, nivel_educativo, modalidad{rank_col}
+            FROM empleo.ofertas_laborales
+            WHERE {where}
+            ORDER BY {sort_key} DESC NULLS LAST, id DESC
+            LIMIT :lim OFFSET :off
+        """, params)
+
+    params["lim"] = page_size + 1
+    if cursor:
+        values = decode_cursor(cursor, cursor_order)
+        items = keyset_fetch(fetch, where, params, sort_key, "id", True, values, cast=cast)
+    else:
+        params["off"] = (page - 1) * page_size
+        items = fetch(where, params)
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(cursor_order, [last[sort_field], last["id"]])
+    return page_response(items, page_size, page, total_count, total_mode, next_cursor)
 
 
 @router.get("/stats")
-@cached(ttl_seconds=3600)
-def get_empleo_stats(dane_code: str = Query(None)):
+@cached(ttl_seconds=3600, stale_ttl=1800)
+def get_empleo_stats(
+    dane_code: str = Query(None),
+):
     """Estadísticas generales del mercado laboral."""
-    conditions = ["1=1"]
+    cube = get_cube()
+    if cube is not None:
+        return _stats_from_cube(cube, dane_code)
+
+    conditions = [UNICAS_CONDITION]
     params = {}
     if dane_code:
         conditions.append("dane_code = :dane")
         params["dane"] = dane_code
     where = " AND ".join(conditions)
 
-    total_rows = query_dicts(
-        f"SELECT COUNT(*) as total FROM empleo.ofertas_laborales WHERE {where}", params
-    )
-    total = total_rows[0]["total"] if total_rows else 0
-
-    por_municipio = query_dicts(f"""
-        SELECT municipio, COUNT(*) as total
-        FROM empleo.ofertas_laborales WHERE {where}
-        GROUP BY municipio ORDER BY total DESC
-    """, params)
-
-    por_fuente = query_dicts(f"""
-        SELECT fuente, COUNT(*) as total
-        FROM empleo.ofertas_laborales WHERE {where}
-        GROUP BY fuente ORDER BY total DESC
-    """, params)
-
-    por_sector = query_dicts(f"""
-        SELECT sector, COUNT(*) as total
-        FROM empleo.ofertas_laborales WHERE {where}
-        GROUP BY sector ORDER BY total DESC
+    # Todas las facetas en una sola sentencia: un escaneo de la tabla (base),
+    # GROUPING SETS para los conteos por dimensión y una fila de totales.
+    rows = query_dicts(f"""
+        WITH base AS MATERIALIZED (
+            SELECT municipio, fuente, sector, empresa, salario_numerico
+            FROM empleo.ofertas_laborales WHERE {where}
+        ),
+        facetas AS (
+            SELECT CASE WHEN GROUPING(municipio) = 0 THEN 'municipio'
+                        WHEN GROUPING(fuente) = 0 THEN 'fuente'
+                        ELSE 'sector' END AS faceta,
+                   COALESCE(municipio, fuente, sector) AS clave,
+                   COUNT(*) AS total
+            FROM base
+            GROUP BY GROUPING SETS ((municipio), (fuente), (sector))
+        ),
+        empresas AS (
+            SELECT 'empresa' AS faceta, empresa AS clave, COUNT(*) AS total
+            FROM base
+            WHERE empresa IS NOT NULL AND empresa != 'No especificada'
+            GROUP BY empresa ORDER BY total DESC LIMIT 15
+        ),
+        totales AS (
+            SELECT 'total' AS faceta, NULL::text AS clave, COUNT(*) AS total,
+                   COUNT(salario_numerico) AS con_salario,
+                   ROUND(AVG(salario_numerico)) AS promedio,
+                   MIN(salario_numerico) AS minimo,
+                   MAX(salario_numerico) AS maximo,
+                   PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY salario_numerico) AS mediana
+            FROM base
+        )
+        SELECT faceta, clave, total, NULL AS con_salario, NULL AS promedio,
+               NULL AS minimo, NULL AS maximo, NULL AS mediana
+        FROM (SELECT * FROM facetas UNION ALL SELECT * FROM empresas) f
+        UNION ALL
+        SELECT * FROM totales
+        ORDER BY faceta, total DESC
     """, params)
 
-    emp_cond = f"{where} AND empresa IS NOT NULL AND empresa != 'No especificada'"
-    top_empresas = query_dicts(f"""
-        SELECT empresa, COUNT(*) as total
-        FROM empleo.ofertas_laborales WHERE {emp_cond}
-        GROUP BY empresa ORDER BY total DESC LIMIT 15
-    """, params)
-
-    sal_cond = f"{where} AND salario_numerico IS NOT NULL"
-    con_sal_rows = query_dicts(
-        f"SELECT COUNT(*) as total FROM empleo.ofertas_laborales WHERE {sal_cond}", params
-    )
-    con_salario = con_sal_rows[0]["total"] if con_sal_rows else 0
-
-    sal_rows = query_dicts(f"""
-        SELECT
-            ROUND(AVG(salario_numerico)) as promedio,
-            MIN(salario_numerico) as minimo,
-            MAX(salario_numerico) as maximo,
-            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY salario_numerico) as mediana
-        FROM empleo.ofertas_laborales
-        WHERE {sal_cond}
-    """, params)
-    ss = sal_rows[0] if sal_rows else {}
+    facets = {"municipio": [], "fuente": [], "sector": [], "empresa": []}
+    ss = {}
+    for r in rows:
+        if r["faceta"] == "total":
+            ss = r
+        else:
+            facets[r["faceta"]].append({r["faceta"]: r["clave"], "total": r["total"]})
 
     return {
-        "total_ofertas": total,
-        "con_salario": con_salario,
+        "total_ofertas": ss.get("total", 0),
+        "con_salario": ss.get("con_salario") or 0,
         "salario_promedio": int(ss["promedio"]) if ss.get("promedio") else None,
         "salario_minimo": int(ss["minimo"]) if ss.get("minimo") else None,
         "salario_maximo": int(ss["maximo"]) if ss.get("maximo") else None,
         "salario_mediana": int(ss["mediana"]) if ss.get("mediana") else None,
-        "por_municipio": por_municipio,
-        "por_fuente": por_fuente,
-        "por_sector": por_sector,
-        "top_empresas": top_empresas,
+        "por_municipio": facets["municipio"],
+        "por_fuente": facets["fuente"],
+        "por_sector": facets["sector"],
+        "top_empresas": facets["empresa"],
+    }
+
+
+def _stats_from_cube(cube, dane_code):
+    m = cube.mask(dane_code)
+    sal = cube.salary(m)
+    empresas = cube.group("empresa", cube.exclude(m, "empresa", "No especificada"))[:15]
+    return {
+        "total_ofertas": cube.count(m),
+        "con_salario": sal["count"],
+        "salario_promedio": sal["avg"] or None,
+        "salario_minimo": sal["min"] or None,
+        "salario_maximo": sal["max"] or None,
+        "salario_mediana": int(sal["median"]) if sal["median"] else None,
+        "por_municipio": [{"municipio": g["key"], "total": g["count"]} for g in cube.group("municipio", m)],
+        "por_fuente": [{"fuente": g["key"], "total": g["count"]} for g in cube.group("fuente", m)],
+        "por_sector": [{"sector": g["key"], "total": g["count"]} for g in cube.group("sector", m)],
+        "top_empresas": [{"empresa": g["key"], "total": g["count"]} for g in empresas],
     }
 
 
@@ -169,7 +234,16 @@ def get_empleo_serie_temporal(
     municipio: str = Query(None),
 ):
     """Serie temporal de ofertas agrupadas por mes."""
-    conditions = ["fecha_publicacion IS NOT NULL"]
+    cube = get_cube() if not municipio else None
+    if cube is not None:
+        groups = cube.group("periodo", cube.mask(dane_code, periodo=True), distinct=("empresa",))
+        return [
+            {"periodo": g["key"], "ofertas": g["count"], "empresas": g["distinct_empresa"],
+             "salario_promedio": g["salary_avg"]}
+            for g in sorted(groups, key=lambda g: g["key"])
+        ]
+
+    conditions = ["fecha_publicacion IS NOT NULL", UNICAS_CONDITION]
     params = {}
     if dane_code:
         conditions.append("dane_code = :dane")
@@ -205,7 +279,7 @@ def get_skills_demand(
     limit: int = Query(25, le=50),
 ):
     """Top habilidades demandadas (extraídas de ofertas)."""
-    conditions = ["1=1"]
+    conditions = [UNICAS_CONDITION]
     params = {"lim": limit}
     if dane_code:
         conditions.append("dane_code = :dane")
@@ -232,7 +306,7 @@ def get_salary_analysis(
     dane_code: str = Query(None),
 ):
     """Análisis de salarios por sector y municipio."""
-    conditions = ["salario_numerico IS NOT NULL"]
+    conditions = ["salario_numerico IS NOT NULL", UNICAS_CONDITION]
     params = {}
     if dane_code:
         conditions.append("dane_code = :dane")
@@ -301,7 +375,17 @@ def get_sectores_detalle(
     dane_code: str = Query(None),
 ):
     """Desglose detallado por sector económico."""
-    conditions = ["1=1"]
+    cube = get_cube()
+    if cube is not None:
+        groups = cube.group("sector", cube.mask(dane_code), distinct=("empresa", "municipio"))
+        return [
+            {"sector": g["key"], "ofertas": g["count"], "empresas": g["distinct_empresa"],
+             "municipios": g["distinct_municipio"], "salario_promedio": g["salary_avg"],
+             "con_salario": g["salary_count"]}
+            for g in groups
+        ]
+
+    conditions = [UNICAS_CONDITION]
     params = {}
     if dane_code:
         conditions.append("dane_code = :dane")
@@ -335,7 +419,7 @@ def get_empresas_ranking(
     limit: int = Query(20, le=50),
 ):
     """Ranking de empresas que más contratan."""
-    conditions = ["empresa IS NOT NULL", "empresa != 'No especificada'"]
+    conditions = ["empresa IS NOT NULL", "empresa != 'No especificada'", UNICAS_CONDITION]
     params = {"lim": limit}
     if dane_code:
         conditions.append("dane_code = :dane")
@@ -366,7 +450,7 @@ def get_empresas_ranking(
 @cached(ttl_seconds=3600)
 def get_empleo_heatmap():
     """Datos para mapa de calor de ofertas por municipio (usando centroides)."""
-    sql = """
+    sql = f"""
         SELECT
             o.municipio,
             o.dane_code,
@@ -375,7 +459,7 @@ def get_empleo_heatmap():
             ST_X(ST_Centroid(lm.geom)) as lon
         FROM empleo.ofertas_laborales o
         JOIN cartografia.limite_municipal lm ON o.dane_code = lm.dane_code
-        WHERE o.dane_code IS NOT NULL
+        WHERE o.dane_code IS NOT NULL AND {UNICAS_CONDITION}
         GROUP BY o.municipio, o.dane_code, lm.geom
         ORDER BY ofertas DESC
     """
@@ -394,10 +478,26 @@ def list_fuentes():
 
 
 @router.get("/kpis")
-@cached(ttl_seconds=3600)
-def get_empleo_kpis(dane_code: str = Query(None)):
+@cached(ttl_seconds=3600, stale_ttl=1800)
+def get_empleo_kpis(
+    dane_code: str = Query(None),
+):
     """KPIs principales del mercado laboral para el dashboard."""
-    conditions = ["1=1"]
+    cube = get_cube()
+    if cube is not None:
+        m = cube.mask(dane_code)
+        sectores = cube.group("sector", m)
+        empresas = cube.group("empresa", cube.exclude(m, "empresa", "No especificada"))
+        return {
+            "total_ofertas": cube.count(m),
+            "total_empresas": cube.distinct("empresa", m),
+            "total_sectores": cube.distinct("sector", m),
+            "salario_promedio": cube.salary(m)["avg"] or None,
+            "sector_top": sectores[0]["key"] if sectores else None,
+            "empresa_top": empresas[0]["key"] if empresas else None,
+        }
+
+    conditions = [UNICAS_CONDITION]
     params = {}
     if dane_code:
         conditions.append("dane_code = :dane")
@@ -430,11 +530,20 @@ def get_empleo_kpis(dane_code: str = Query(None)):
     }
 
 
+def _distribution_from_cube(cube, dim, key, dane_code):
+    groups = cube.group(dim, cube.mask(dane_code, **{dim: True}))
+    return [{key: g["key"], "total": g["count"]} for g in groups]
+
+
 @router.get("/experiencia")
 @cached(ttl_seconds=3600)
 def get_experiencia_dist(dane_code: str = Query(None)):
     """Distribución por nivel de experiencia requerida."""
-    conditions = ["nivel_experiencia IS NOT NULL"]
+    cube = get_cube()
+    if cube is not None:
+        return _distribution_from_cube(cube, "nivel_experiencia", "nivel", dane_code)
+
+    conditions = ["nivel_experiencia IS NOT NULL", UNICAS_CONDITION]
     params = {}
     if dane_code:
         conditions.append("dane_code = :dane")
@@ -450,7 +559,11 @@ def get_experiencia_dist(dane_code: str = Query(None)):
 @cached(ttl_seconds=3600)
 def get_contratos_dist(dane_code: str = Query(None)):
     """Distribución por tipo de contrato."""
-    conditions = ["tipo_contrato IS NOT NULL"]
+    cube = get_cube()
+    if cube is not None:
+        return _distribution_from_cube(cube, "tipo_contrato", "tipo", dane_code)
+
+    conditions = ["tipo_contrato IS NOT NULL", UNICAS_CONDITION]
     params = {}
     if dane_code:
         conditions.append("dane_code = :dane")
@@ -466,7 +579,11 @@ def get_contratos_dist(dane_code: str = Query(None)):
 @cached(ttl_seconds=3600)
 def get_educacion_dist(dane_code: str = Query(None)):
     """Distribución por nivel educativo requerido."""
-    conditions = ["nivel_educativo IS NOT NULL"]
+    cube = get_cube()
+    if cube is not None:
+        return _distribution_from_cube(cube, "nivel_educativo", "nivel", dane_code)
+
+    conditions = ["nivel_educativo IS NOT NULL", UNICAS_CONDITION]
     params = {}
     if dane_code:
         conditions.append("dane_code = :dane")
@@ -482,7 +599,11 @@ def get_educacion_dist(dane_code: str = Query(None)):
 @cached(ttl_seconds=3600)
 def get_modalidad_dist(dane_code: str = Query(None)):
     """Distribución por modalidad de trabajo."""
-    conditions = ["modalidad IS NOT NULL"]
+    cube = get_cube()
+    if cube is not None:
+        return _distribution_from_cube(cube, "modalidad", "modalidad", dane_code)
+
+    conditions = ["modalidad IS NOT NULL", UNICAS_CONDITION]
     params = {}
     if dane_code:
         conditions.append("dane_code = :dane")
@@ -540,7 +661,7 @@ def get_skills_categorized(
     limit: int = Query(50, le=100),
 ):
     """Skills agrupadas por categoría (Tecnológica, Agroindustrial, Blanda, etc.)."""
-    conditions = ["1=1"]
+    conditions = [UNICAS_CONDITION]
     params = {"lim": limit}
     if dane_code:
         conditions.append("dane_code = :dane")
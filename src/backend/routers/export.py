@@ -0,0 +1,167 @@
+"""
+Exportación masiva de datos
+============================
+* NDJSON / CSV en streaming: las filas se leen con un cursor del lado del
+  servidor (stream_query) y se envían por lotes a medida que llegan, así que
+  la memoria por petición es constante sin importar el tamaño del resultado.
+  Los filtros son los mismos de /api/empleo/ofertas y /api/indicators/terridata.
+* Parquet / Arrow IPC de tablas completas: archivos generados una vez por
+  versión de los datos y servidos desde disco con soporte de Range
+  (services/columnar_export). Requieren pyarrow; sin él responden 501.
+"""
+import csv
+import datetime
+import decimal
+import io
+import json
+import os
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+from ..database import stream_query
+from ..services import columnar_export
+from .empleo import ofertas_filters
+from .indicators import TABLES, TERRIDATA_COLUMNS, terridata_sql
+
+router = APIRouter(prefix="/api/export", tags=["Exportación"])
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+}
+
+OFERTAS_EXPORT_COLUMNS = (
+    "id, titulo, empresa, salario_texto, salario_numerico, salario_imputado, descripcion, "
+    "municipio, dane_code, fuente, sector, skills, fecha_publicacion, enlace, "
+    "nivel_experiencia, tipo_contrato, nivel_educativo, modalidad"
+)
+
+# dataset → (tabla, columnas exportadas o None para todas)
+COLUMNAR_DATASETS = {
+    "ofertas": ("empleo.ofertas_laborales", [c.strip() for c in OFERTAS_EXPORT_COLUMNS.split(",")]),
+    "terridata": (TABLES["terridata"], None),
+    "icfes": (TABLES["icfes"], None),
+    "homicidios": (TABLES["homicidios"], None),
+    "hurtos": (TABLES["hurtos"], None),
+    "vif": (TABLES["vif"], None),
+    "delitos_sexuales": (TABLES["delitos_sexuales"], None),
+    "victimas": (TABLES["victimas"], None),
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return str(value)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return "|".join(str(v) for v in value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def ndjson_chunks(columns, batches):
+    """One JSON object per line; one chunk per batch of rows."""
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=_json_default) + "\n"
+            for row in batch
+        )
+
+
+def csv_chunks(columns, batches):
+    """Header line, then one CSV chunk per batch of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(v) for v in row] for row in batch)
+        yield buffer.getvalue()
+
+
+def _export(fmt: str, name: str, sql: str, params: dict) -> StreamingResponse:
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status_code=404, detail=f"Formato no soportado: {fmt}")
+    chunks = ndjson_chunks if fmt == "ndjson" else csv_chunks
+    # The query starts before the response does, so a DB error is still a 503
+    stream = stream_query(sql, params)
+    columns = next(stream)
+    return StreamingResponse(
+        chunks(columns, stream),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+def _columnar(dataset: str, fmt: str) -> FileResponse:
+    if dataset not in COLUMNAR_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset}' no encontrado")
+    if not columnar_export.pyarrow_available():
+        raise HTTPException(status_code=501, detail="Exportación columnar no disponible: instale pyarrow")
+    table, columns = COLUMNAR_DATASETS[dataset]
+    path, cached = columnar_export.export_path(dataset, table, fmt, columns)
+    return FileResponse(
+        path,
+        media_type=columnar_export.FORMATS[fmt],
+        filename=f"{dataset}.{fmt}",
+        background=None if cached else BackgroundTask(os.remove, path),
+    )
+
+
+# Registradas antes de /ofertas.{fmt} para que /ofertas.parquet llegue aquí
+@router.get("/{dataset}.parquet")
+def export_parquet(dataset: str):
+    """Tabla completa del dataset en Parquet (zstd). Soporta peticiones Range."""
+    return _columnar(dataset, "parquet")
+
+
+@router.get("/{dataset}.arrow")
+def export_arrow(dataset: str):
+    """Tabla completa del dataset en formato Arrow IPC (archivo). Soporta peticiones Range."""
+    return _columnar(dataset, "arrow")
+
+
+@router.get("/ofertas.{fmt}")
+def export_ofertas(
+    fmt: str,
+    municipio: str = Query(None, description="Filtrar por municipio"),
+    fuente: str = Query(None, description="Filtrar por fuente"),
+    sector: str = Query(None, description="Filtrar por sector"),
+    dane_code: str = Query(None, description="Filtrar por código DANE"),
+    busqueda: str = Query(None, description="Buscar en título, empresa o descripción (texto completo)"),
+    tipo_contrato: str = Query(None, description="Filtrar por tipo de contrato"),
+    modalidad: str = Query(None, description="Filtrar por modalidad"),
+    unicas: bool = Query(False, description="Solo una oferta por vacante (omite casi-duplicados entre portales)"),
+):
+    """Todas las ofertas que cumplen los filtros, en NDJSON (``.ndjson``) o CSV (``.csv``), ordenadas por id."""
+    conditions, params, _ = ofertas_filters(
+        municipio, fuente, sector, dane_code, busqueda, tipo_contrato, modalidad, unicas
+    )
+    sql = (
+        f"SELECT {OFERTAS_EXPORT_COLUMNS} FROM empleo.ofertas_laborales "
+        f"WHERE {' AND '.join(conditions)} ORDER BY id"
+    )
+    return _export(fmt, "ofertas", sql, params)
+
+
+@router.get("/terridata.{fmt}")
+def export_terridata(
+    fmt: str,
+    dane_code: str = Query(None),
+    dimension: str = Query(None),
+):
+    """Indicadores TerriData filtrados, en NDJSON (``.ndjson``) o CSV (``.csv``)."""
+    sql, params = terridata_sql(dane_code, dimension, columns="dane_code, entidad, " + TERRIDATA_COLUMNS)
+    return _export(fmt, "terridata", sql, params)
@@ -1,20 +1,26 @@
 """
 Endpoints geoespaciales — manzanas con datos, heatmaps, filtros espaciales
 """
-import math
 from fastapi import APIRouter, HTTPException, Query
-from ..database import engine, query_dicts, query_geojson
+from ..database import engine, cached, query_dicts, query_geojson, GeoJSONResponse, EMPTY_FEATURE_COLLECTION
+from ..pagination import count_total, decode_cursor, encode_cursor, keyset_fetch, page_response
+from ..search import places_search
+from ..spatial import HEATMAP_MAX_ZOOM, MAX_ZOOM, geometry_detail, heatmap_cell_size, lod_source, bbox_condition, count_response
 from sqlalchemy import text
 
 router = APIRouter(prefix="/api/geo", tags=["Geoespacial"])
 
 
-@router.get("/manzanas")
+@router.get("/manzanas", response_class=GeoJSONResponse)
 def get_manzanas(
     dane_code: str = Query(None, description="Filtrar por código DANE del municipio (ej: 05045)"),
     min_pop: int = Query(0, description="Población mínima"),
     max_pop: int = Query(999999, description="Población máxima"),
     limit: int = Query(5000, le=10000),
+    zoom: int = Query(None, ge=0, le=MAX_ZOOM, description="Zoom del mapa: simplifica geometrías y limita decimales"),
+    tolerance: float = Query(None, ge=0, description="Tolerancia de simplificación en grados (prevalece sobre zoom)"),
+    bbox: str = Query(None, description="Viewport minx,miny,maxx,maxy (WGS84)"),
+    count_only: bool = Query(False, description="Solo devolver el conteo de features"),
 ):
     """Manzanas censales con datos de población, filtrables por municipio."""
     conditions = ["total_personas ~ '^[0-9]+$'"]
@@ -23,28 +29,42 @@ def get_manzanas(
     if dane_code:
         conditions.append("cod_dane_municipio = :dane")
         params["dane"] = dane_code
-        
+
+    bbox_cond = bbox_condition(bbox, params)
+    if bbox_cond:
+        conditions.append(bbox_cond)
+
     where = " AND ".join(conditions)
-    sql = f"""
-        SELECT geom, cod_dane_manzana, cod_dane_municipio,
-               CAST(total_personas AS INT) as total_personas
+    from_where = f"""
         FROM cartografia.manzanas_censales
         WHERE {where}
           AND CAST(total_personas AS INT) >= :min_pop
           AND CAST(total_personas AS INT) <= :max_pop
+    """
+    sql = f"""
+        SELECT geom, cod_dane_manzana, cod_dane_municipio,
+               CAST(total_personas AS INT) as total_personas
+        {from_where}
         LIMIT :lim
     """
+    if count_only:
+        return count_response(from_where, params)
+    tol, digits = geometry_detail(zoom, tolerance)
     try:
-        return query_geojson(sql, params)
+        return query_geojson(sql, params, tolerance=tol, max_digits=digits)
     except Exception:
-        return {"type": "FeatureCollection", "features": []}
+        return GeoJSONResponse(EMPTY_FEATURE_COLLECTION)
 
 
-@router.get("/edificaciones")
+@router.get("/edificaciones", response_class=GeoJSONResponse)
 def get_edificaciones(
     dane_code: str = Query(None, description="Filtrar por código DANE"),
     building_type: str = Query(None, description="Filtro tipo edificación"),
     limit: int = Query(5000, le=10000),
+    zoom: int = Query(None, ge=0, le=MAX_ZOOM, description="Zoom del mapa: simplifica geometrías y limita decimales"),
+    tolerance: float = Query(None, ge=0, description="Tolerancia de simplificación en grados (prevalece sobre zoom)"),
+    bbox: str = Query(None, description="Viewport minx,miny,maxx,maxy (WGS84)"),
+    count_only: bool = Query(False, description="Solo devolver el conteo de features"),
 ):
     """Edificaciones OSM filtradas por municipio."""
     conditions = ["1=1"]
@@ -58,16 +78,27 @@ def get_edificaciones(
         conditions.append("building = :bt")
         params["bt"] = building_type
         
+    bbox_cond = bbox_condition(bbox, params)
+    if bbox_cond:
+        conditions.append(bbox_cond)
+
     where = "WHERE " + " AND ".join(conditions)
+    if count_only:
+        return count_response(f"FROM cartografia.osm_edificaciones {where}", params)
     sql = f"SELECT geom, id, building, name, amenity FROM cartografia.osm_edificaciones {where} LIMIT :lim"
-    return query_geojson(sql, params)
+    tol, digits = geometry_detail(zoom, tolerance)
+    return query_geojson(sql, params, tolerance=tol, max_digits=digits)
 
 
-@router.get("/vias")
+@router.get("/vias", response_class=GeoJSONResponse)
 def get_vias(
     dane_code: str = Query(None, description="Filtrar por código DANE"),
     highway_type: str = Query(None, description="Tipo de vía (primary, secondary, residential, etc)"),
     limit: int = Query(5000, le=10000),
+    zoom: int = Query(None, ge=0, le=MAX_ZOOM, description="Zoom del mapa: simplifica geometrías y limita decimales"),
+    tolerance: float = Query(None, ge=0, description="Tolerancia de simplificación en grados (prevalece sobre zoom)"),
+    bbox: str = Query(None, description="Viewport minx,miny,maxx,maxy (WGS84)"),
+    count_only: bool = Query(False, description="Solo devolver el conteo de features"),
 ):
     """Red vial OSM con filtro por tipo."""
     conditions = ["1=1"]
@@ -81,15 +112,26 @@ def get_vias(
         conditions.append("highway = :ht")
         params["ht"] = highway_type
 
+    bbox_cond = bbox_condition(bbox, params)
+    if bbox_cond:
+        conditions.append(bbox_cond)
+
     where = "WHERE " + " AND ".join(conditions)
+    if count_only:
+        return count_response(f"FROM cartografia.osm_vias {where}", params)
     sql = f"SELECT geom, id, highway, name, surface, lanes FROM cartografia.osm_vias {where} LIMIT :lim"
-    return query_geojson(sql, params)
+    tol, digits = geometry_detail(zoom, tolerance)
+    return query_geojson(sql, params, tolerance=tol, max_digits=digits)
 
 
-@router.get("/amenidades")
+@router.get("/amenidades", response_class=GeoJSONResponse)
 def get_amenidades(
     dane_code: str = Query(None, description="Filtrar por código DANE"),
     amenity_type: str = Query(None, description="Tipo de amenidad (school, hospital, etc)"),
+    zoom: int = Query(None, ge=0, le=MAX_ZOOM, description="Zoom del mapa: simplifica geometrías y limita decimales"),
+    tolerance: float = Query(None, ge=0, description="Tolerancia de simplificación en grados (prevalece sobre zoom)"),
+    bbox: str = Query(None, description="Viewport minx,miny,maxx,maxy (WGS84)"),
+    count_only: bool = Query(False, description="Solo devolver el conteo de features"),
 ):
     """Amenidades OSM."""
     conditions = ["1=1"]
@@ -103,17 +145,28 @@ def get_amenidades(
         conditions.append("amenity = :at")
         params["at"] = amenity_type
 
+    bbox_cond = bbox_condition(bbox, params)
+    if bbox_cond:
+        conditions.append(bbox_cond)
+
     where = "WHERE " + " AND ".join(conditions)
+    if count_only:
+        return count_response(f"FROM cartografia.osm_amenidades {where}", params)
     sql = f"SELECT geom, id, amenity, name, phone, website FROM cartografia.osm_amenidades {where} LIMIT 2000"
-    return query_geojson(sql, params)
+    _, digits = geometry_detail(zoom, tolerance)  # puntos: solo se reducen decimales
+    return query_geojson(sql, params, max_digits=digits)
 
 
-@router.get("/places")
+@router.get("/places", response_class=GeoJSONResponse)
 def get_google_places(
     dane_code: str = Query(None, description="Filtrar por código DANE"),
     category: str = Query(None, description="Categoría (Restaurantes, Bancos, etc)"),
     min_rating: float = Query(0, description="Rating mínimo"),
     limit: int = Query(1000, le=5000),
+    zoom: int = Query(None, ge=0, le=MAX_ZOOM, description="Zoom del mapa: simplifica geometrías y limita decimales"),
+    tolerance: float = Query(None, ge=0, description="Tolerancia de simplificación en grados (prevalece sobre zoom)"),
+    bbox: str = Query(None, description="Viewport minx,miny,maxx,maxy (WGS84)"),
+    count_only: bool = Query(False, description="Solo devolver el conteo de features"),
 ):
     """Establecimientos comerciales de Google Places."""
     conditions = ["1=1"]
@@ -130,7 +183,13 @@ def get_google_places(
         conditions.append("COALESCE(rating, 0) >= :mr")
         params["mr"] = min_rating
 
+    bbox_cond = bbox_condition(bbox, params)
+    if bbox_cond:
+        conditions.append(bbox_cond)
+
     where = " AND ".join(conditions)
+    if count_only:
+        return count_response(f"FROM servicios.google_places_regional WHERE {where}", params)
     sql = f"""
         SELECT geom, place_id, name, category, address, rating,
                user_ratings_total, lat, lon
@@ -138,7 +197,8 @@ def get_google_places(
         WHERE {where}
         LIMIT :lim
     """
-    return query_geojson(sql, params)
+    _, digits = geometry_detail(zoom, tolerance)  # puntos: solo se reducen decimales
+    return query_geojson(sql, params, max_digits=digits)
 
 
 @router.get("/places/directory")
@@ -151,8 +211,11 @@ def get_places_directory(
     sort_order: str = Query("asc", description="asc o desc"),
     page: int = Query(1, ge=1),
     page_size: int = Query(25, ge=1, le=100),
+    cursor: str = Query(None, description="next_cursor de la página anterior (ignora page)"),
+    total: str = Query(None, pattern="^(exact|estimate|none)$",
+                       description="Conteo total: exact, estimate o none (por defecto exact sin cursor, none con cursor)"),
 ):
-    """Directorio paginado de negocios para el dashboard."""
+    """Directorio paginado de negocios para el dashboard (OFFSET por page o keyset por cursor)."""
     conditions = ["1=1"]
     params = {}
 
@@ -163,45 +226,46 @@ def get_places_directory(
         conditions.append("category = :cat")
         params["cat"] = category
     if search:
-        conditions.append("(name ILIKE :q OR address ILIKE :q)")
-        params["q"] = f"%{search}%"
+        conditions.append(places_search(search, params))
     if min_rating > 0:
         conditions.append("COALESCE(rating, 0) >= :mr")
         params["mr"] = min_rating
 
     where = " AND ".join(conditions)
+    total_mode = total or ("none" if cursor else "exact")
+    total_count = count_total(total_mode, f"FROM servicios.google_places_regional WHERE {where}", dict(params))
 
-    # Count total
-    count_sql = f"SELECT COUNT(*) as total FROM servicios.google_places_regional WHERE {where}"
-    count_row = query_dicts(count_sql, params)
-    total = count_row[0]["total"] if count_row else 0
-
-    # Sorting
+    # Sorting; place_id breaks ties so every row has a unique position for the cursor
     allowed_sort = {"name": "name", "category": "category", "rating": "rating", "user_ratings_total": "user_ratings_total"}
     sort_col = allowed_sort.get(sort_by, "name")
-    order = "DESC" if sort_order.lower() == "desc" else "ASC"
-
-    offset = (page - 1) * page_size
-    params["lim"] = page_size
-    params["off"] = offset
-
-    sql = f"""
-        SELECT place_id, name, category, address, rating,
-               user_ratings_total, lat, lon
-        FROM servicios.google_places_regional
-        WHERE {where}
-        ORDER BY {sort_col} {order} NULLS LAST
-        LIMIT :lim OFFSET :off
-    """
-    items = query_dicts(sql, params)
-
-    return {
-        "items": items,
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": math.ceil(total / page_size) if page_size else 0,
-    }
+    descending = sort_order.lower() == "desc"
+    order = "DESC" if descending else "ASC"
+    cursor_order = f"{sort_col}:{order.lower()}"
+
+    def fetch(where, params):
+        return query_dicts(f"""
+            SELECT place_id, name, category, address, rating,
+                   user_ratings_total, lat, lon
+            FROM servicios.google_places_regional
+            WHERE {where}
+            ORDER BY {sort_col} {order} NULLS LAST, place_id {order}
+            LIMIT :lim OFFSET :off
+        """, params)
+
+    params["lim"] = page_size + 1
+    if cursor:
+        values = decode_cursor(cursor, cursor_order)
+        items = keyset_fetch(fetch, where, params, sort_col, "place_id", descending, values)
+    else:
+        params["off"] = (page - 1) * page_size
+        items = fetch(where, params)
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(cursor_order, [last[sort_col], last["place_id"]])
+
+    return page_response(items, page_size, page, total_count, total_mode, next_cursor)
 
 
 @router.get("/places/categories")
@@ -216,9 +280,16 @@ def get_places_categories():
 @router.get("/places/heatmap")
 def get_places_heatmap(
     dane_code: str = Query(None),
-    category: str = Query(None)
+    category: str = Query(None),
+    mode: str = Query("points", pattern="^(points|grid|hex)$",
+                      description="points: un punto por negocio; grid/hex: pesos agregados por celda"),
+    zoom: int = Query(10, ge=0, le=MAX_ZOOM, description="Zoom del mapa (define el tamaño de celda en grid/hex)"),
 ):
     """Datos para heatmap de establecimientos (lat, lon, weight)."""
+    if mode != "points":
+        # Zooms above the cap share the same bins (and cache entry)
+        return _heatmap_bins(mode, min(zoom, HEATMAP_MAX_ZOOM), dane_code, category)
+
     conditions = ["1=1"]
     params = {}
     
@@ -241,15 +312,86 @@ def get_places_heatmap(
     return [{"lat": float(r[0]), "lon": float(r[1]), "weight": int(r[2])} for r in rows]
 
 
-@router.get("/uraba")
-def get_uraba_region():
+@cached(ttl_seconds=3600, stale_ttl=1800)
+def _heatmap_bins(mode: str, zoom: int, dane_code: str = None, category: str = None):
+    """Weights of Google Places aggregated in PostGIS per square or hexagonal cell.
+
+    The payload size depends on the zoom (cell size), not on how many
+    establishments are loaded; one entry per non-empty cell, at its center.
+    """
+    conditions = ["geom IS NOT NULL"]
+    params = {"cell": heatmap_cell_size(zoom)}
+    if category:
+        conditions.append("category = :cat")
+        params["cat"] = category
+    if dane_code:
+        conditions.append("dane_code = :dane")
+        params["dane"] = dane_code
+    where = " AND ".join(conditions)
+
+    if mode == "grid":
+        sql = f"""
+            SELECT ST_Y(cell) AS lat, ST_X(cell) AS lon,
+                   SUM(COALESCE(user_ratings_total, 1)) AS weight, COUNT(*) AS count
+            FROM (
+                SELECT ST_SnapToGrid(geom, :cell) AS cell, user_ratings_total
+                FROM servicios.google_places_regional
+                WHERE {where}
+            ) pts
+            GROUP BY cell
+        """
+    else:
+        sql = f"""
+            WITH pts AS (
+                SELECT place_id, geom, COALESCE(user_ratings_total, 1) AS w
+                FROM servicios.google_places_regional
+                WHERE {where}
+            ),
+            assigned AS (
+                -- Hexágono de cada punto: la malla sobre el punto mismo tiene
+                -- uno a tres hexágonos, así que el costo es lineal en los puntos
+                -- (no se genera la malla de toda la extensión).
+                -- Un punto sobre el borde de dos hexágonos cuenta solo en uno.
+                SELECT DISTINCT ON (p.place_id) hx.i, hx.j, hx.geom AS hex, p.w
+                FROM pts p
+                CROSS JOIN LATERAL ST_HexagonGrid(:cell, p.geom) hx
+                WHERE ST_Intersects(hx.geom, p.geom)
+                ORDER BY p.place_id, hx.i, hx.j
+            )
+            SELECT ST_Y(ST_Centroid(hex)) AS lat, ST_X(ST_Centroid(hex)) AS lon,
+                   SUM(w) AS weight, COUNT(*) AS count
+            FROM assigned
+            GROUP BY i, j, hex
+        """
+    with engine.connect() as conn:
+        rows = conn.execute(text(sql), params).fetchall()
+    return [
+        {"lat": round(float(r[0]), 6), "lon": round(float(r[1]), 6),
+         "weight": int(r[2]), "count": int(r[3])}
+        for r in rows
+    ]
+
+
+@router.get("/uraba", response_class=GeoJSONResponse)
+def get_uraba_region(
+    zoom: int = Query(None, ge=0, le=MAX_ZOOM, description="Zoom del mapa: simplifica geometrías y limita decimales"),
+    tolerance: float = Query(None, ge=0, description="Tolerancia de simplificación en grados (prevalece sobre zoom)"),
+):
     """Municipios de la región de Urabá para contexto regional."""
-    sql = """
+    params = {}
+    tol, digits = geometry_detail(zoom, tolerance)
+    source, lod_cond = "cartografia.igac_uraba", None
+    if tolerance is None:
+        source, lod_cond = lod_source("cartografia", "igac_uraba", zoom, params)
+    if lod_cond:
+        tol = None  # geometrías ya simplificadas por el ETL
+    sql = f"""
         SELECT geometry, "MpCodigo" as codigo, "MpNombre" as nombre,
                "MpArea" as area_km2, "Depto" as departamento
-        FROM cartografia.igac_uraba
+        FROM {source}
+        {"WHERE " + lod_cond if lod_cond else ""}
     """
-    return query_geojson(sql, geom_col="geometry")
+    return query_geojson(sql, params, geom_col="geometry", tolerance=tol, max_digits=digits)
 
 
 @router.get("/municipios/centroids")
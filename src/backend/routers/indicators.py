@@ -30,13 +30,19 @@ def get_icfes(dane_code: str = Query(None), aggregate: str = Query("colegio")):
         sql = f"SELECT cole_nombre as colegio, periodo, AVG(punt_global) as prom_global FROM {TABLES['icfes']} WHERE {where} GROUP BY cole_nombre, periodo ORDER BY prom_global DESC"
     return query_dicts(sql, {"dane": dane_code})
 
-@router.get("/terridata")
-def get_terridata(dane_code: str = Query(None), dimension: str = Query(None)):
+TERRIDATA_COLUMNS = "dimension, indicador, dato_numerico, anio, unidad_de_medida"
+
+def terridata_sql(dane_code: str = None, dimension: str = None, columns: str = TERRIDATA_COLUMNS):
+    """SELECT de /terridata (también usado por /api/export/terridata)."""
     cond = ["1=1"]
     if dane_code: cond.append("dane_code = :dane")
     if dimension: cond.append("dimension = :dim")
-    sql = f"SELECT dimension, indicador, dato_numerico, anio, unidad_de_medida FROM {TABLES['terridata']} WHERE {' AND '.join(cond)} ORDER BY anio DESC"
-    return query_dicts(sql, {"dane": dane_code, "dim": dimension})
+    sql = f"SELECT {columns} FROM {TABLES['terridata']} WHERE {' AND '.join(cond)} ORDER BY anio DESC"
+    return sql, {"dane": dane_code, "dim": dimension}
+
+@router.get("/terridata")
+def get_terridata(dane_code: str = Query(None), dimension: str = Query(None)):
+    return query_dicts(*terridata_sql(dane_code, dimension))
 
 @router.get("/seguridad/serie")
 def get_seguridad_serie(tipo: str = "homicidios", dane_code: str = Query(None)):
@@ -1,10 +1,17 @@
 """
 Gestión de capas — catálogo de todas las capas disponibles
 """
+import logging
 from fastapi import APIRouter, HTTPException, Query
-from ..database import engine, cached, query_geojson
+from fastapi.responses import Response
+from ..config import TILE_CACHE_PATH
+from ..database import engine, cached, query_geojson, GeoJSONResponse
+from ..spatial import MAX_ZOOM, geometry_detail, lod_source, bbox_condition, count_response
+from ..tile_cache import TileCache
 from sqlalchemy import text
 
+logger = logging.getLogger("observatorio.layers")
+
 router = APIRouter(prefix="/api/layers", tags=["Capas"])
 
 # Registro de capas disponibles
@@ -17,6 +24,7 @@ LAYERS_CATALOG = [
         "description": "Polígonos de los 11 municipios de la subregión de Urabá (fuente DAGRAN)",
         "geometry_type": "Polygon",
         "category": "cartografia",
+        "simplified": True,
     },
     {
         "id": "veredas_mgn",
@@ -26,6 +34,7 @@ LAYERS_CATALOG = [
         "description": "Límites de veredas y secciones rurales de Urabá",
         "geometry_type": "MultiPolygon",
         "category": "cartografia",
+        "simplified": True,
     },
     {
         "id": "manzanas_censales",
@@ -45,6 +54,7 @@ LAYERS_CATALOG = [
         "geometry_type": "Polygon",
         "category": "cartografia",
         "geom_col": "geometry",
+        "simplified": True,
     },
     {
         "id": "google_places",
@@ -102,42 +112,215 @@ def list_layers():
     return [{**layer, "record_count": counts.get(layer["id"], 0)} for layer in LAYERS_CATALOG]
 
 
-@router.get("/{layer_id}/geojson")
+# Columna con el código DANE del municipio en cada capa (las demás no se filtran)
+DANE_COLUMNS = {
+    "manzanas_censales": "cod_dane_municipio",
+    "veredas_mgn": "dane_code",
+    "osm_vias": "dane_code",
+    "osm_edificaciones": "dane_code",
+    "osm_amenidades": "dane_code",
+    "google_places": "dane_code",
+}
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+MAX_TILE_ZOOM = 22
+
+# Capas que solo cambian al re-ejecutar su loader ETL: sus tiles se guardan en disco
+STATIC_TILE_LAYERS = ("limite_municipal", "igac_uraba", "veredas_mgn", "manzanas_censales")
+
+
+def _open_tile_cache():
+    if not TILE_CACHE_PATH:
+        return None
+    try:
+        return TileCache(TILE_CACHE_PATH)
+    except Exception as e:
+        logger.error("Failed to open tile cache %s: %s", TILE_CACHE_PATH, e)
+        return None
+
+
+_tile_cache = _open_tile_cache()
+
+
+def _get_layer(layer_id: str) -> dict:
+    layer = next((l for l in LAYERS_CATALOG if l["id"] == layer_id), None)
+    if not layer:
+        raise HTTPException(status_code=404, detail=f"Capa '{layer_id}' no encontrada")
+    return layer
+
+
+def _dane_condition(layer_id: str, dane_code: str, params: dict, alias: str = "") -> str | None:
+    """SQL condition filtering *layer_id* by municipality, or None if not applicable."""
+    col = DANE_COLUMNS.get(layer_id)
+    if not dane_code or not col:
+        return None
+    params["dane"] = dane_code
+    return f"{alias}{col} = :dane"
+
+
+@cached(ttl_seconds=3600)
+def _layer_attributes(layer_id: str) -> list[str]:
+    """Non-geometry column names of a layer table, in table order."""
+    layer = _get_layer(layer_id)
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_schema = :s AND table_name = :t AND udt_name <> 'geometry' "
+                "ORDER BY ordinal_position"
+            ),
+            {"s": layer["schema"], "t": layer["table"]},
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+@cached(ttl_seconds=60)
+def _layer_version(layer_id: str) -> str:
+    """Data version of a layer, bumped by its ETL loader ("0" if never recorded)."""
+    try:
+        with engine.connect() as conn:
+            version = conn.execute(
+                text("SELECT version FROM cartografia.layer_versions WHERE layer_id = :l"),
+                {"l": layer_id},
+            ).scalar()
+    except Exception:
+        return "0"
+    return str(version) if version is not None else "0"
+
+
+def cached_tile(layer_id: str, z: int, x: int, y: int) -> bytes:
+    """Full-attribute tile of a static layer, read from / written to the tile cache."""
+    version = _layer_version(layer_id)
+    tile = _tile_cache.get(layer_id, version, z, x, y)
+    if tile is None:
+        tile = render_tile(layer_id, z, x, y, _layer_attributes(layer_id))
+        _tile_cache.put(layer_id, version, z, x, y, tile)
+    return tile
+
+
+def _tile_fields(layer_id: str, fields: str | None) -> list[str]:
+    """Validate the requested attribute list against the layer's columns."""
+    available = _layer_attributes(layer_id)
+    if not fields:
+        return available
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in available]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Atributos no disponibles en '{layer_id}': {', '.join(unknown)}",
+        )
+    return requested
+
+
+def render_tile(layer_id: str, z: int, x: int, y: int,
+                fields: list[str], dane_code: str = None) -> bytes:
+    """Render one Mapbox Vector Tile with ST_AsMVT; returns b"" for empty tiles."""
+    layer = _get_layer(layer_id)
+    gc = layer.get("geom_col", "geom")
+    params = {"z": z, "x": x, "y": y, "name": layer_id}
+    # Filter on the envelope grown by the MVT buffer so features that only
+    # touch the buffer are kept and geometries continue across tile seams
+    conditions = [f"t.{gc} && ST_Transform(bounds.query_env, 4326)"]
+    dane_cond = _dane_condition(layer_id, dane_code, params, alias="t.")
+    if dane_cond:
+        conditions.append(dane_cond)
+    attrs = "".join(f', t."{f}"' for f in fields)
+
+    sql = f"""
+        WITH bounds AS (
+            SELECT ST_TileEnvelope(:z, :x, :y) AS env,
+                   ST_TileEnvelope(:z, :x, :y, margin => {MVT_BUFFER / MVT_EXTENT}) AS query_env
+        ),
+        mvtgeom AS (
+            SELECT ST_AsMVTGeom(ST_Transform(t.{gc}, 3857), bounds.env,
+                                {MVT_EXTENT}, {MVT_BUFFER}, true) AS mvt_geom{attrs}
+            FROM {layer['schema']}.{layer['table']} t, bounds
+            WHERE {" AND ".join(conditions)}
+        )
+        SELECT ST_AsMVT(mvtgeom.*, :name, {MVT_EXTENT}, 'mvt_geom') FROM mvtgeom
+    """
+    with engine.connect() as conn:
+        tile = conn.execute(text(sql), params).scalar()
+    return bytes(tile) if tile else b""
+
+
+@router.get("/{layer_id}/geojson", response_class=GeoJSONResponse)
 def get_layer_geojson(
     layer_id: str,
     dane_code: str = Query(None, description="Filtrar por código DANE"),
-    limit: int = 5000
+    limit: int = 5000,
+    zoom: int = Query(None, ge=0, le=MAX_ZOOM, description="Zoom del mapa: simplifica geometrías y limita decimales"),
+    tolerance: float = Query(None, ge=0, description="Tolerancia de simplificación en grados (prevalece sobre zoom)"),
+    bbox: str = Query(None, description="Viewport minx,miny,maxx,maxy (WGS84)"),
+    count_only: bool = Query(False, description="Solo devolver el conteo de features"),
 ):
     """Obtener GeoJSON completo de una capa."""
-    layer = next((l for l in LAYERS_CATALOG if l["id"] == layer_id), None)
-    if not layer:
-        raise HTTPException(status_code=404, detail=f"Capa '{layer_id}' no encontrada")
+    layer = _get_layer(layer_id)
 
     gc = layer.get("geom_col", "geom")
     conditions = ["1=1"]
     params = {"lim": limit}
-    
-    # Try to filter by dane_code if the table likely has it
-    if dane_code:
-        if layer_id == "manzanas_censales":
-            conditions.append("cod_dane_municipio = :dane")
-            params["dane"] = dane_code
-        elif layer_id in ["veredas_mgn", "osm_vias", "osm_edificaciones",
-                          "osm_amenidades", "google_places"]:
-            conditions.append("dane_code = :dane")
-            params["dane"] = dane_code
-    
+    tol, digits = geometry_detail(zoom, tolerance)
+    if layer["geometry_type"] == "Point":
+        tol = None
+
+    source, exclude = f"{layer['schema']}.{layer['table']}", ()
+    if layer.get("simplified") and tolerance is None:
+        source, lod_cond = lod_source(layer["schema"], layer["table"], zoom, params)
+        if lod_cond:
+            conditions.append(lod_cond)
+            tol = None  # geometrías ya simplificadas por el ETL
+            exclude = ("lod",)  # columna propia de la tabla simplificada
+
+    dane_cond = _dane_condition(layer_id, dane_code, params)
+    if dane_cond:
+        conditions.append(dane_cond)
+    bbox_cond = bbox_condition(bbox, params, geom_col=f'"{gc}"')
+    if bbox_cond:
+        conditions.append(bbox_cond)
+
     where = "WHERE " + " AND ".join(conditions)
-    sql = f"SELECT * FROM {layer['schema']}.{layer['table']} {where} LIMIT :lim"
-    return query_geojson(sql, params, geom_col=gc)
+    if count_only:
+        return count_response(f"FROM {source} {where}", params)
+    sql = f"SELECT * FROM {source} {where} LIMIT :lim"
+    return query_geojson(sql, params, geom_col=gc, tolerance=tol, max_digits=digits, exclude=exclude)
+
+
+@router.get(
+    "/{layer_id}/tiles/{z}/{x}/{y}.mvt",
+    response_class=Response,
+    responses={200: {"content": {MVT_MEDIA_TYPE: {}}}, 204: {"description": "Tile vacío"}},
+)
+def get_layer_tile(
+    layer_id: str,
+    z: int,
+    x: int,
+    y: int,
+    dane_code: str = Query(None, description="Filtrar por código DANE"),
+    fields: str = Query(None, description="Atributos a incluir, separados por coma (por defecto todos)"),
+):
+    """Vector tile (MVT) de una capa en coordenadas z/x/y (Web Mercator)."""
+    _get_layer(layer_id)
+    if not 0 <= z <= MAX_TILE_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=400, detail=f"Tile fuera de rango: {z}/{x}/{y}")
+
+    if _tile_cache is not None and layer_id in STATIC_TILE_LAYERS and not dane_code and not fields:
+        tile = cached_tile(layer_id, z, x, y)
+    else:
+        tile = render_tile(layer_id, z, x, y, _tile_fields(layer_id, fields), dane_code)
+    if not tile:
+        return Response(status_code=204)
+    return Response(content=tile, media_type=MVT_MEDIA_TYPE,
+                    headers={"Cache-Control": "public, max-age=3600"})
 
 
 @router.get("/{layer_id}/stats")
 def get_layer_stats(layer_id: str):
     """Estadísticas básicas de una capa (bbox, conteo, columnas)."""
-    layer = next((l for l in LAYERS_CATALOG if l["id"] == layer_id), None)
-    if not layer:
-        raise HTTPException(status_code=404, detail=f"Capa '{layer_id}' no encontrada")
+    layer = _get_layer(layer_id)
 
     gc = layer.get("geom_col", "geom")
     with engine.connect() as conn:
@@ -3,7 +3,7 @@ Resumen ejecutivo regional y por municipio
 """
 import logging
 from fastapi import APIRouter, Query
-from ..database import engine, cached, query_dicts
+from ..database import engine, cached, query_dicts, cache_stats
 from sqlalchemy import text
 
 logger = logging.getLogger("observatorio.stats")
@@ -18,16 +18,6 @@ MUNICIPIOS = {
 }
 
 
-def _safe_scalar(conn, sql, params, default=0):
-    """Execute a scalar query, returning default on error."""
-    try:
-        val = conn.execute(text(sql), params).scalar()
-        return int(val) if val else default
-    except Exception as e:
-        logger.warning("Query failed: %s — %s", sql[:80], e)
-        return default
-
-
 def _safe_row(conn, sql, params):
     """Execute and return first row, or None on error."""
     try:
@@ -44,8 +34,134 @@ def _terridata_value(conn, indicador, params, where):
     return (row[0], row[1]) if row and row[0] is not None else (None, None)
 
 
-@router.get("/summary")
+# (clave, tabla, agregado, columna con el código DANE)
+SUMMARY_AGGREGATES = [
+    ("manzanas_censales", "cartografia.manzanas_censales", "COUNT(*)", "cod_dane_municipio"),
+    ("establecimientos_comerciales", "servicios.google_places_regional", "COUNT(*)", "dane_code"),
+    ("establecimientos_educativos", "socioeconomico.establecimientos_educativos", "COUNT(*)", "dane_code"),
+    ("matricula_total", "socioeconomico.establecimientos_educativos", "SUM(total_matricula)", "dane_code"),
+    ("ips_salud", "socioeconomico.ips_salud", "COUNT(*)", "dane_code"),
+    ("prestadores_servicios", "socioeconomico.prestadores_servicios", "COUNT(*)", "dane_code"),
+    ("homicidios", "seguridad.homicidios", "SUM(cantidad)", "dane_code"),
+    ("hurtos", "seguridad.hurtos", "SUM(cantidad)", "dane_code"),
+    ("vif", "seguridad.violencia_intrafamiliar", "SUM(cantidad)", "dane_code"),
+    ("victimas", "seguridad.victimas_conflicto", "SUM(personas)", "dane_code"),
+    ("icfes", "socioeconomico.icfes", "AVG(punt_global)", "dane_code"),
+]
+
+TD_POBLACION = "Población total"
+TD_SEDES = "Número de sedes educativas en el sector oficial"
+TD_COBERTURA = "Cobertura neta en educación"
+TD_HOMICIDIOS = "Tasa de homicidios por cada 100.000 habitantes"
+TD_HURTOS = "Tasa de hurto común por cada 100.000 habitantes"
+TD_VIF = "Tasa de violencia intrafamiliar por cada 100.000 habitantes"
+TD_SABER_MAT = "Puntaje promedio Pruebas Saber 11 - Matemáticas"
+TD_SABER_LEC = "Puntaje promedio Pruebas Saber 11 - Lectura crítica"
+TERRIDATA_INDICATORS = [
+    TD_POBLACION, TD_SEDES, TD_COBERTURA, TD_HOMICIDIOS, TD_HURTOS, TD_VIF, TD_SABER_MAT, TD_SABER_LEC,
+]
+
+HECHOS_TABLE = "seguridad.victimas_conflicto"
+TERRIDATA_TABLE = "socioeconomico.terridata"
+
+
 @cached(ttl_seconds=600)
+def _existing_tables() -> frozenset:
+    """Tables of the summary that exist in this database."""
+    tables = sorted({t for _, t, _, _ in SUMMARY_AGGREGATES} | {TERRIDATA_TABLE})
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT t FROM unnest(CAST(:tables AS text[])) AS t WHERE to_regclass(t) IS NOT NULL"),
+            {"tables": tables},
+        ).fetchall()
+    return frozenset(r[0] for r in rows)
+
+
+def _fetch_summary_single(conn, dane):
+    """All summary inputs in one statement.
+
+    Returns ``(values, terridata, hechos)``: raw aggregate per key (None for
+    missing tables), ``{indicador: (valor, anio)}`` with the latest row of
+    each indicator, and the top-5 ``(hecho, personas)``.
+    """
+    existing = _existing_tables()
+    params = {"dane": dane} if dane else {}
+    columns = []
+    for key, table, agg, dane_col in SUMMARY_AGGREGATES:
+        if table in existing:
+            where = f"WHERE {dane_col} = :dane" if dane else ""
+            columns.append(f"(SELECT {agg} FROM {table} {where}) AS {key}")
+        else:
+            columns.append(f"NULL AS {key}")
+
+    ctes = []
+    where = "WHERE dane_code = :dane" if dane else "WHERE 1=1"
+    if TERRIDATA_TABLE in existing:
+        params["indicadores"] = TERRIDATA_INDICATORS
+        ctes.append(f"""td AS (
+            SELECT DISTINCT ON (indicador) indicador, dato_numerico, anio
+            FROM {TERRIDATA_TABLE} {where} AND indicador = ANY(CAST(:indicadores AS text[]))
+            ORDER BY indicador, anio DESC
+        )""")
+        columns.append("(SELECT json_agg(json_build_array(indicador, dato_numerico, anio)) FROM td) AS terridata")
+    else:
+        columns.append("NULL AS terridata")
+    if HECHOS_TABLE in existing:
+        ctes.append(f"""hechos AS (
+            SELECT hecho, SUM(personas) AS personas
+            FROM {HECHOS_TABLE} {where}
+            GROUP BY hecho ORDER BY personas DESC LIMIT 5
+        )""")
+        columns.append("(SELECT json_agg(json_build_array(hecho, personas)) FROM hechos) AS hechos")
+    else:
+        columns.append("NULL AS hechos")
+
+    sql = (f"WITH {', '.join(ctes)} " if ctes else "") + "SELECT " + ",\n       ".join(columns)
+    row = conn.execute(text(sql), params).mappings().fetchone()
+    values = {key: row[key] for key, _, _, _ in SUMMARY_AGGREGATES}
+    terridata = {
+        ind: (val, anio) for ind, val, anio in (row["terridata"] or []) if val is not None
+    }
+    return values, terridata, [tuple(h) for h in row["hechos"] or []]
+
+
+def _fetch_summary_sequential(conn, dane):
+    """Same as _fetch_summary_single, one query at a time (each may fail alone)."""
+    params = {"dane": dane} if dane else {}
+    values = {}
+    for key, table, agg, dane_col in SUMMARY_AGGREGATES:
+        where = f"WHERE {dane_col} = :dane" if dane else ""
+        row = _safe_row(conn, f"SELECT {agg} FROM {table} {where}", params)
+        values[key] = row[0] if row else None
+
+    where = "WHERE dane_code = :dane" if dane else "WHERE 1=1"
+    terridata = {}
+    for ind in TERRIDATA_INDICATORS:
+        val, anio = _terridata_value(conn, ind, params, where)
+        if val is not None:
+            terridata[ind] = (val, anio)
+
+    try:
+        hechos = conn.execute(text(f"""
+            SELECT hecho, SUM(personas) as personas
+            FROM {HECHOS_TABLE} {where}
+            GROUP BY hecho ORDER BY personas DESC LIMIT 5
+        """), params).fetchall()
+    except Exception:
+        hechos = []
+    return values, terridata, [tuple(h) for h in hechos]
+
+
+def _as_int(val, default=0):
+    return int(val) if val else default
+
+
+def _per_100k(tasa, pop):
+    return int(tasa * pop / 100000) if tasa and pop else 0
+
+
+@router.get("/summary")
+@cached(ttl_seconds=600, stale_ttl=600)
 def get_summary(dane_code: str = Query(None)):
     dane = dane_code.zfill(5) if dane_code and dane_code.isdigit() else dane_code
 
@@ -56,111 +172,67 @@ def get_summary(dane_code: str = Query(None)):
         "divipola": dane or "REGIONAL",
     }
 
-    params = {"dane": dane} if dane else {}
-    where = "WHERE dane_code = :dane" if dane else "WHERE 1=1"
-
     with engine.connect() as conn:
-        # 1. Población total (TerriData)
-        pop, pop_year = _terridata_value(conn, "Población total", params, where)
-        stats["poblacion_total"] = int(pop) if pop else None
-        stats["poblacion_anio"] = pop_year
-
-        # 2. Manzanas censales
-        stats["manzanas_censales"] = _safe_scalar(
-            conn, f"SELECT COUNT(*) FROM cartografia.manzanas_censales WHERE cod_dane_municipio = :dane",
-            params) if dane else _safe_scalar(
-            conn, "SELECT COUNT(*) FROM cartografia.manzanas_censales", {})
-
-        # 3. Establecimientos comerciales (Google Places)
-        stats["establecimientos_comerciales"] = _safe_scalar(
-            conn, f"SELECT COUNT(*) FROM servicios.google_places_regional {where}", params)
-
-        # 4. Establecimientos educativos
-        val = _safe_scalar(conn, f"SELECT COUNT(*) FROM socioeconomico.establecimientos_educativos {where}", params)
-        if not val:
-            # Fallback: TerriData "Número de sedes educativas" or similar
-            td_val, _ = _terridata_value(conn, "Número de sedes educativas en el sector oficial", params, where)
-            val = int(td_val) if td_val else 0
-        stats["establecimientos_educativos"] = val
-
-        # 5. Matrícula total
-        val = _safe_scalar(
-            conn, f"SELECT SUM(total_matricula) FROM socioeconomico.establecimientos_educativos {where}", params)
-        if not val:
-            td_val, _ = _terridata_value(conn, "Cobertura neta en educación", params, where)
-            stats["matricula_total"] = int(td_val) if td_val else 0
-        else:
-            stats["matricula_total"] = val
-
-        # 6. IPS de salud
-        stats["ips_salud"] = _safe_scalar(
-            conn, f"SELECT COUNT(*) FROM socioeconomico.ips_salud {where}", params)
-
-        # 7. Prestadores de servicios
-        stats["prestadores_servicios"] = _safe_scalar(
-            conn, f"SELECT COUNT(*) FROM socioeconomico.prestadores_servicios {where}", params)
-
-        # 8. Homicidios (tabla seguridad → fallback TerriData tasa)
-        h_val = _safe_scalar(conn, f"SELECT SUM(cantidad) FROM seguridad.homicidios {where}", params, default=None)
-        if not h_val:
-            td_val, _ = _terridata_value(conn, "Tasa de homicidios por cada 100.000 habitantes", params, where)
-            if td_val and pop:
-                h_val = int(td_val * pop / 100000)
-            else:
-                h_val = 0
-        stats["total_homicidios"] = h_val
-
-        # 9. Hurtos (tabla seguridad → fallback TerriData tasa)
-        hu_val = _safe_scalar(conn, f"SELECT SUM(cantidad) FROM seguridad.hurtos {where}", params, default=None)
-        if not hu_val:
-            td_val, _ = _terridata_value(conn, "Tasa de hurto común por cada 100.000 habitantes", params, where)
-            if td_val and pop:
-                hu_val = int(td_val * pop / 100000)
-            else:
-                hu_val = 0
-        stats["total_hurtos"] = hu_val
-
-        # 10. Violencia intrafamiliar
-        vif_val = _safe_scalar(conn, f"SELECT SUM(cantidad) FROM seguridad.violencia_intrafamiliar {where}", params, default=None)
-        if not vif_val:
-            td_val, _ = _terridata_value(conn, "Tasa de violencia intrafamiliar por cada 100.000 habitantes", params, where)
-            if td_val and pop:
-                vif_val = int(td_val * pop / 100000)
-            else:
-                vif_val = 0
-        stats["total_vif"] = vif_val
-
-        # 11. Víctimas del conflicto
-        stats["total_victimas_conflicto"] = _safe_scalar(
-            conn, f"SELECT SUM(personas) FROM seguridad.victimas_conflicto {where}", params)
-
-        # 12. ICFES promedio
-        icfes_row = _safe_row(
-            conn, f"SELECT AVG(punt_global) FROM socioeconomico.icfes {where}", params)
-        icfes_avg = round(icfes_row[0], 1) if icfes_row and icfes_row[0] else None
-        if not icfes_avg:
-            # Fallback: TerriData Saber 11 scores
-            td_mat, _ = _terridata_value(conn, "Puntaje promedio Pruebas Saber 11 - Matemáticas", params, where)
-            td_lec, _ = _terridata_value(conn, "Puntaje promedio Pruebas Saber 11 - Lectura crítica", params, where)
-            if td_mat and td_lec:
-                icfes_avg = round((td_mat + td_lec) / 2, 1)
-        stats["icfes"] = {"promedio_global": icfes_avg} if icfes_avg else None
-
-        # 13. Principales hechos victimizantes
         try:
-            hechos = conn.execute(text(f"""
-                SELECT hecho, SUM(personas) as personas
-                FROM seguridad.victimas_conflicto {where}
-                GROUP BY hecho ORDER BY personas DESC LIMIT 5
-            """), params).fetchall()
-            stats["principales_hechos_victimizantes"] = [
-                {"hecho": h[0], "personas": int(h[1])} for h in hechos
-            ] if hechos else []
-        except Exception:
-            stats["principales_hechos_victimizantes"] = []
+            values, td, hechos = _fetch_summary_single(conn, dane)
+        except Exception as e:
+            # p. ej. una columna faltante: se recupera consulta por consulta
+            logger.warning("Single-statement summary failed, using sequential queries: %s", e)
+            conn.rollback()
+            values, td, hechos = _fetch_summary_sequential(conn, dane)
+
+    # 1. Población total (TerriData)
+    pop, pop_year = td.get(TD_POBLACION, (None, None))
+    stats["poblacion_total"] = int(pop) if pop else None
+    stats["poblacion_anio"] = pop_year
+
+    # 2-3. Manzanas censales, establecimientos comerciales (Google Places)
+    stats["manzanas_censales"] = _as_int(values["manzanas_censales"])
+    stats["establecimientos_comerciales"] = _as_int(values["establecimientos_comerciales"])
+
+    # 4-5. Establecimientos educativos y matrícula → fallback TerriData
+    stats["establecimientos_educativos"] = (
+        _as_int(values["establecimientos_educativos"]) or _as_int(td.get(TD_SEDES, (None,))[0])
+    )
+    stats["matricula_total"] = (
+        _as_int(values["matricula_total"]) or _as_int(td.get(TD_COBERTURA, (None,))[0])
+    )
+
+    # 6-7. IPS de salud, prestadores de servicios
+    stats["ips_salud"] = _as_int(values["ips_salud"])
+    stats["prestadores_servicios"] = _as_int(values["prestadores_servicios"])
+
+    # 8-10. Seguridad (tablas → fallback tasa TerriData × población)
+    stats["total_homicidios"] = (
+        _as_int(values["homicidios"], None) or _per_100k(td.get(TD_HOMICIDIOS, (None,))[0], pop)
+    )
+    stats["total_hurtos"] = (
+        _as_int(values["hurtos"], None) or _per_100k(td.get(TD_HURTOS, (None,))[0], pop)
+    )
+    stats["total_vif"] = (
+        _as_int(values["vif"], None) or _per_100k(td.get(TD_VIF, (None,))[0], pop)
+    )
+
+    # 11. Víctimas del conflicto
+    stats["total_victimas_conflicto"] = _as_int(values["victimas"])
+
+    # 12. ICFES promedio → fallback TerriData Saber 11
+    icfes_avg = round(values["icfes"], 1) if values["icfes"] else None
+    if not icfes_avg:
+        td_mat = td.get(TD_SABER_MAT, (None,))[0]
+        td_lec = td.get(TD_SABER_LEC, (None,))[0]
+        if td_mat and td_lec:
+            icfes_avg = round((td_mat + td_lec) / 2, 1)
+    stats["icfes"] = {"promedio_global": icfes_avg} if icfes_avg else None
+
+    # 13. Principales hechos victimizantes
+    stats["principales_hechos_victimizantes"] = [
+        {"hecho": h[0], "personas": int(h[1])} for h in hechos
+    ]
 
     return stats
 
+
 @router.get("/catalog-summary")
 @cached(ttl_seconds=3600)
 def get_catalog_summary():
@@ -178,3 +250,9 @@ def get_catalog_summary():
     except Exception as e: 
         print(f"Catalog summary error: {e}")
         return {"tables": 0, "records": 0}
+
+
+@router.get("/cache")
+def get_cache_stats():
+    """Contadores del caché en memoria de este worker (hits, misses, evictions)."""
+    return cache_stats()
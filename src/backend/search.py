@@ -0,0 +1,82 @@
+"""
+Full-text search over job offers and places.
+
+Offers carry a weighted ``search_tsv`` (título A, empresa B, descripción C)
+and an ``empresa_norm`` column with a trigram index, both written by the
+sync ETL from accent-folded text (etl_sync._normalize). The query text is
+folded the same way here, so "educacion" finds "Educación" and the Spanish
+stemmer sees identical tokens on both sides. Places are matched with the
+trigram indexes on ``f_unaccent(lower(name/address))``. Both are created by
+etl/20_search_index.sql; until it has run the endpoints fall back to ILIKE.
+"""
+import unicodedata
+
+from sqlalchemy import text
+
+from .database import engine, cached
+
+TS_CONFIG = "spanish"
+# pg_trgm similarity above which a company name counts as a fuzzy match
+EMPRESA_SIMILARITY = 0.4
+
+
+def fold(value: str) -> str:
+    """Lowercase and strip accents; must match etl_sync._normalize."""
+    if not value:
+        return ""
+    value = value.lower().strip()
+    nfkd = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in nfkd if not unicodedata.combining(c))
+
+
+@cached(ttl_seconds=600)
+def search_available() -> bool:
+    """Whether the search columns, indexes and f_unaccent() exist (ETL 20)."""
+    try:
+        with engine.connect() as conn:
+            return bool(conn.execute(text("""
+                SELECT to_regprocedure('public.f_unaccent(text)') IS NOT NULL
+                   AND EXISTS (
+                       SELECT 1 FROM information_schema.columns
+                       WHERE table_schema = 'empleo' AND table_name = 'ofertas_laborales'
+                         AND column_name = 'search_tsv'
+                   )
+            """)).scalar())
+    except Exception:
+        return False
+
+
+def ofertas_search(q: str, params: dict) -> tuple[str, str | None]:
+    """
+    ``(condition, rank_expression)`` for the ``busqueda`` of /api/empleo/ofertas.
+
+    Words are combined with websearch syntax ("quoted phrases", -exclusion,
+    OR). The rank adds ts_rank_cd of the document to the trigram similarity
+    of the company name, so a misspelt employer still ranks its offers
+    first. Without the search columns the rank is None and the condition is
+    the legacy ILIKE.
+    """
+    if not search_available():
+        params["q"] = f"%{q}%"
+        return "(titulo ILIKE :q OR descripcion ILIKE :q)", None
+    params["q_fold"] = fold(q)
+    params["empresa_sim"] = EMPRESA_SIMILARITY
+    tsquery = f"websearch_to_tsquery('{TS_CONFIG}', :q_fold)"
+    condition = (
+        f"(search_tsv @@ {tsquery} "
+        "OR (empresa_norm % :q_fold AND similarity(empresa_norm, :q_fold) >= :empresa_sim))"
+    )
+    rank = (
+        f"(ts_rank_cd(search_tsv, {tsquery}) "
+        "+ COALESCE(similarity(empresa_norm, :q_fold), 0))::float8"
+    )
+    return condition, rank
+
+
+def places_search(q: str, params: dict) -> str:
+    """Accent-insensitive substring match on name/address of a place."""
+    if not search_available():
+        params["q"] = f"%{q}%"
+        return "(name ILIKE :q OR address ILIKE :q)"
+    params["q"] = f"%{fold(q)}%"
+    return "(f_unaccent(lower(name)) LIKE :q OR f_unaccent(lower(address)) LIKE :q)"
@@ -0,0 +1,186 @@
+"""
+Columnar (Parquet / Arrow IPC) snapshots of the observatory datasets.
+
+Each dataset is one table. Its file is written once per data version into
+EXPORT_CACHE_DIR and then served from disk (with Range support) until the
+table changes. The data version is database.table_version(): relation
+identity plus insert/update/delete counters, so a manual fix or a loader
+that recreates the table (DROP, or to_sql(if_exists="replace"), which
+resets the counters but gives a new oid) yields a new file name. It is
+checked at most once a minute, and older versions of the dataset are
+removed once the new one is in place.
+
+Files are built from a server-side cursor one batch at a time, with the
+Arrow schema derived from the column types in information_schema, so
+memory stays bounded by the batch size rather than the table size. pyarrow
+is listed in requirements.txt; an install without it still starts, but
+``pyarrow_available()`` is False and the router answers 501.
+"""
+import glob
+import logging
+import os
+import tempfile
+import threading
+
+from sqlalchemy import text
+
+from ..database import cached, engine, stream_query, table_version
+
+logger = logging.getLogger("observatorio.columnar_export")
+
+EXPORT_CACHE_DIR = os.getenv(
+    "EXPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "observatorio_export")
+)
+EXPORT_BATCH_ROWS = 10000
+
+FORMATS = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+_locks: dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def pyarrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@cached(ttl_seconds=60)
+def data_version(table: str) -> str | None:
+    """database.table_version() of *table*, or None when unavailable."""
+    return table_version(table)
+
+
+def _column_types(table: str) -> list[tuple]:
+    """``(column, data_type, numeric_precision, numeric_scale)`` of *table* in table order."""
+    schema, name = table.split(".", 1)
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT column_name, data_type, numeric_precision, numeric_scale
+            FROM information_schema.columns
+            WHERE table_schema = :s AND table_name = :t
+            ORDER BY ordinal_position
+        """), {"s": schema, "t": name}).fetchall()
+    return [tuple(r) for r in rows]
+
+
+def arrow_type(data_type: str, precision: int = None, scale: int = None):
+    """Arrow type for a PostgreSQL information_schema data_type (text by default).
+
+    ``numeric(p, s)`` keeps its exact value as decimal128(p, s); unconstrained
+    numeric (no precision) and precisions above 38 digits are exported as
+    text rather than rounded through float64.
+    """
+    import pyarrow as pa
+
+    if data_type == "numeric":
+        if precision and precision <= 38:
+            return pa.decimal128(precision, scale or 0)
+        return pa.string()
+
+    mapping = {
+        "smallint": pa.int16(),
+        "integer": pa.int32(),
+        "bigint": pa.int64(),
+        "real": pa.float32(),
+        "double precision": pa.float64(),
+        "boolean": pa.bool_(),
+        "date": pa.date32(),
+        "timestamp without time zone": pa.timestamp("us"),
+        "timestamp with time zone": pa.timestamp("us", tz="UTC"),
+        "ARRAY": pa.list_(pa.string()),
+    }
+    return mapping.get(data_type, pa.string())
+
+
+def _arrow_values(values: list, pa_type):
+    import pyarrow as pa
+
+    if pa.types.is_floating(pa_type):
+        return [None if v is None else float(v) for v in values]
+    if pa.types.is_string(pa_type):
+        return [v if v is None or isinstance(v, str) else str(v) for v in values]
+    if pa.types.is_list(pa_type):
+        return [None if v is None else [None if x is None else str(x) for x in v] for v in values]
+    return values
+
+
+def _write(path: str, fmt: str, table: str, columns: list[str] | None) -> int:
+    """Write *table* (all columns, or *columns*) to *path*; returns the row count."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = _column_types(table)
+    if columns:
+        known = {t[0]: t for t in types}
+        types = [known.get(c, (c, "text", None, None)) for c in columns]
+    schema = pa.schema([(c, arrow_type(t, p, s)) for c, t, p, s in types])
+    select = ", ".join(f'"{t[0]}"' for t in types)
+
+    stream = stream_query(f"SELECT {select} FROM {table}", batch_rows=EXPORT_BATCH_ROWS)
+    next(stream)  # column names, already known from the schema
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(path, schema)
+    rows = 0
+    try:
+        for batch in stream:
+            arrays = [
+                pa.array(_arrow_values([row[i] for row in batch], field.type), type=field.type)
+                for i, field in enumerate(schema)
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            rows += len(batch)
+    finally:
+        writer.close()
+    return rows
+
+
+def _lock(key: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def export_path(dataset: str, table: str, fmt: str, columns: list[str] = None) -> tuple[str, bool]:
+    """
+    ``(path, cached)`` of the *fmt* file of *dataset* for the current data
+    version, generating it if needed. Without a data version the file is
+    rebuilt under a one-off name and ``cached`` is False: the caller deletes
+    it after serving.
+    """
+    version = data_version(table)
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    if version is None:
+        fd, path = tempfile.mkstemp(prefix=f"{dataset}.", suffix=f".{fmt}", dir=EXPORT_CACHE_DIR)
+        os.close(fd)
+        _write(path, fmt, table, columns)
+        return path, False
+
+    path = os.path.join(EXPORT_CACHE_DIR, f"{dataset}-{version}.{fmt}")
+    if os.path.exists(path):
+        return path, True
+    with _lock(f"{dataset}.{fmt}"):
+        if os.path.exists(path):
+            return path, True
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            rows = _write(tmp, fmt, table, columns)
+            os.replace(tmp, path)  # atomic: other workers never see a partial file
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        logger.info("export %s.%s v%s written: %d rows", dataset, fmt, version, rows)
+        for old in glob.glob(os.path.join(EXPORT_CACHE_DIR, f"{dataset}-*.{fmt}")):
+            if old != path:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+    return path, True
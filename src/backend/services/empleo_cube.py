@@ -0,0 +1,258 @@
+"""
+In-memory columnar cube of empleo.ofertas_laborales.
+
+Each offer is one position in a set of NumPy arrays: an int32 code per
+dimension (municipio, sector, fuente, periodo, ...) plus the numeric salary.
+Like every aggregate endpoint it holds one offer per vacancy (UNICAS_CONDITION).
+The distribution endpoints of routers/empleo.py and the sector × municipio
+matrix of routers/analytics.py are answered by masking and ``np.bincount``
+instead of a GROUP BY round trip to PostgreSQL.
+
+The cube is loaded lazily with one SELECT and rebuilt in the background as
+soon as the table changes: at most every EMPLEO_CUBE_CHECK seconds a
+background thread compares database.table_version() (relation identity plus
+pg_stat write counters, so any writer is noticed) with the version the cube
+was built from. EMPLEO_CUBE_TTL is only a backstop for when the version is
+unavailable. Set EMPLEO_CUBE_ENABLED=0 to always query SQL.
+Aggregates follow the SQL they replace: NULL is its own group, COUNT
+DISTINCT ignores NULL, averages are rounded half up and the median is the
+linearly interpolated PERCENTILE_CONT(0.5).
+"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from ..database import engine, table_version
+
+logger = logging.getLogger("observatorio.empleo_cube")
+
+CUBE_ENABLED = os.getenv("EMPLEO_CUBE_ENABLED", "1").lower() not in ("0", "false", "no")
+CUBE_TTL = float(os.getenv("EMPLEO_CUBE_TTL", "900"))
+CUBE_CHECK = float(os.getenv("EMPLEO_CUBE_CHECK", "30"))
+
+CUBE_TABLE = "empleo.ofertas_laborales"
+
+DIMENSIONS = (
+    "dane_code", "municipio", "fuente", "sector", "empresa", "periodo",
+    "tipo_contrato", "nivel_educativo", "nivel_experiencia", "modalidad",
+)
+
+# One offer per vacancy: representatives of the near-duplicate clusters
+# (etl/near_dup.py) and offers not clustered yet. Aggregates (empleo and
+# analytics routers, analytics views) always apply it; listings and exports
+# only with ``unicas=true``.
+UNICAS_CONDITION = "(near_dup_cluster IS NULL OR near_dup_cluster = dedup_hash)"
+
+CUBE_SQL = f"""
+    SELECT dane_code, municipio, fuente, sector, empresa,
+           TO_CHAR(fecha_publicacion, 'YYYY-MM') AS periodo,
+           tipo_contrato, nivel_educativo, nivel_experiencia, modalidad,
+           salario_numerico
+    FROM empleo.ofertas_laborales
+    WHERE {UNICAS_CONDITION}
+"""
+SALARY = len(DIMENSIONS)  # row position
+
+NULL = 0  # code of the NULL label in every dimension
+
+
+def _round_half_up(x: float) -> int:
+    """ROUND() of PostgreSQL numeric for the (positive) salary averages."""
+    return int(np.floor(x + 0.5))
+
+
+class EmpleoCube:
+    """Dimension codes and salaries of every offer, sliceable by mask."""
+
+    def __init__(self, rows, version: str = None):
+        self.built_at = time.time()
+        self.version = version
+        self.n = len(rows)
+        self.labels: dict[str, list] = {}
+        self.codes: dict[str, np.ndarray] = {}
+        for i, dim in enumerate(DIMENSIONS):
+            labels = [None]
+            index = {None: NULL}
+            codes = np.empty(self.n, dtype=np.int32)
+            for j, row in enumerate(rows):
+                value = row[i]
+                code = index.get(value)
+                if code is None:
+                    code = index[value] = len(labels)
+                    labels.append(value)
+                codes[j] = code
+            self.labels[dim] = labels
+            self.codes[dim] = codes
+        self.salario = np.array(
+            [np.nan if r[SALARY] is None else float(r[SALARY]) for r in rows], dtype=np.float64
+        )
+
+    # -- slicing -----------------------------------------------------------
+
+    def mask(self, dane_code: str = None, **not_null) -> np.ndarray:
+        """Rows matching ``dane_code`` (if given) with the named dims not NULL.
+
+        ``cube.mask("05045", sector=True)`` ≙ ``WHERE dane_code = '05045' AND sector IS NOT NULL``.
+        """
+        m = np.ones(self.n, dtype=bool)
+        if dane_code:
+            code = self._code("dane_code", dane_code)
+            m &= self.codes["dane_code"] == code
+        for dim, required in not_null.items():
+            if required:
+                m &= self.codes[dim] != NULL
+        return m
+
+    def exclude(self, mask: np.ndarray, dim: str, *values) -> np.ndarray:
+        """``mask AND dim IS NOT NULL AND dim NOT IN values`` (SQL ``!=`` semantics)."""
+        m = mask & (self.codes[dim] != NULL)
+        for value in values:
+            m &= self.codes[dim] != self._code(dim, value)
+        return m
+
+    def _code(self, dim: str, value) -> int:
+        try:
+            return self.labels[dim].index(value)
+        except ValueError:
+            return -1
+
+    # -- aggregates --------------------------------------------------------
+
+    def count(self, mask: np.ndarray) -> int:
+        return int(mask.sum())
+
+    def distinct(self, dim: str, mask: np.ndarray) -> int:
+        """COUNT(DISTINCT dim)."""
+        codes = np.unique(self.codes[dim][mask])
+        return int((codes != NULL).sum())
+
+    def group(self, dim: str, mask: np.ndarray, distinct: tuple = ()) -> list[dict]:
+        """
+        GROUP BY *dim* over *mask*, ordered by count desc.
+
+        Each item has ``key``, ``count``, ``salary_count``, ``salary_avg``
+        (None without salaries) and ``distinct_<d>`` for each dim in *distinct*.
+        """
+        codes = self.codes[dim][mask]
+        k = len(self.labels[dim])
+        counts = np.bincount(codes, minlength=k)
+        sal = self.salario[mask]
+        has_sal = ~np.isnan(sal)
+        sal_count = np.bincount(codes[has_sal], minlength=k)
+        sal_sum = np.bincount(codes[has_sal], weights=sal[has_sal], minlength=k)
+        distinct_counts = {d: self._distinct_per_group(codes, self.codes[d][mask], k) for d in distinct}
+
+        present = np.flatnonzero(counts)
+        order = sorted(present, key=lambda c: (-counts[c], str(self.labels[dim][c])))
+        out = []
+        for c in order:
+            item = {
+                "key": self.labels[dim][c],
+                "count": int(counts[c]),
+                "salary_count": int(sal_count[c]),
+                "salary_avg": _round_half_up(sal_sum[c] / sal_count[c]) if sal_count[c] else None,
+            }
+            for d, per_group in distinct_counts.items():
+                item[f"distinct_{d}"] = int(per_group[c])
+            out.append(item)
+        return out
+
+    def _distinct_per_group(self, codes: np.ndarray, other: np.ndarray, k: int) -> np.ndarray:
+        keep = other != NULL
+        width = int(other.max()) + 1 if other.size else 1
+        pairs = np.unique(codes[keep].astype(np.int64) * width + other[keep])
+        return np.bincount(pairs // width, minlength=k)
+
+    def crosstab(self, dim_a: str, dim_b: str, mask: np.ndarray) -> list[tuple]:
+        """``(a, b, count)`` for every non-empty cell of GROUP BY a, b."""
+        a = self.codes[dim_a][mask].astype(np.int64)
+        b = self.codes[dim_b][mask]
+        width = len(self.labels[dim_b])
+        cells, counts = np.unique(a * width + b, return_counts=True)
+        return [
+            (self.labels[dim_a][cell // width], self.labels[dim_b][cell % width], int(n))
+            for cell, n in zip(cells, counts)
+        ]
+
+    def salary(self, mask: np.ndarray) -> dict:
+        """Salary summary over *mask* (rows with salario_numerico only)."""
+        sal = self.salario[mask]
+        sal = sal[~np.isnan(sal)]
+        if not sal.size:
+            return {"count": 0, "avg": None, "min": None, "max": None, "median": None}
+        return {
+            "count": int(sal.size),
+            "avg": _round_half_up(sal.mean()),
+            "min": int(sal.min()),
+            "max": int(sal.max()),
+            "median": float(np.median(sal)),
+        }
+
+
+_cube: EmpleoCube | None = None
+_failed_at = 0.0  # last failed build; SQL is used until CUBE_TTL has passed
+_checked_at = 0.0  # last version check of the current cube
+_lock = threading.Lock()
+_refreshing = threading.Event()
+
+
+def build_cube() -> EmpleoCube:
+    t0 = time.time()
+    # Read before the rows: a write in between only causes one extra rebuild
+    version = table_version(CUBE_TABLE)
+    with engine.connect() as conn:
+        rows = conn.execute(text(CUBE_SQL)).fetchall()
+    cube = EmpleoCube(rows, version)
+    logger.info("empleo cube built: %d offers in %.2fs", cube.n, time.time() - t0)
+    return cube
+
+
+def is_stale(cube: EmpleoCube) -> bool:
+    """Whether *cube* no longer matches the table (or outlived CUBE_TTL)."""
+    if time.time() - cube.built_at > CUBE_TTL:
+        return True
+    version = table_version(CUBE_TABLE)
+    return version is not None and version != cube.version
+
+
+def _refresh():
+    global _cube
+    try:
+        if is_stale(_cube):
+            _cube = build_cube()
+    except Exception as e:
+        logger.warning("empleo cube refresh failed: %s", e)
+    finally:
+        _refreshing.clear()
+
+
+def get_cube() -> EmpleoCube | None:
+    """The current cube, or None when disabled or unavailable (callers use SQL).
+
+    The first call builds it synchronously; afterwards the cube keeps being
+    served while one background thread checks its version (at most every
+    CUBE_CHECK seconds) and rebuilds it when the table changed.
+    """
+    global _cube, _failed_at, _checked_at
+    if not CUBE_ENABLED:
+        return None
+    if _cube is None:
+        if time.time() - _failed_at < CUBE_TTL:
+            return None
+        with _lock:
+            if _cube is None:
+                try:
+                    _cube = build_cube()
+                except Exception as e:
+                    _failed_at = time.time()
+                    logger.warning("empleo cube unavailable, using SQL: %s", e)
+                    return None
+    elif time.time() - _checked_at > CUBE_CHECK and not _refreshing.is_set():
+        _checked_at = time.time()
+        _refreshing.set()
+        threading.Thread(target=_refresh, daemon=True).start()
+    return _cube
@@ -0,0 +1,141 @@
+"""
+Geometry level-of-detail and viewport helpers for the GeoJSON endpoints.
+
+A web map at zoom z shows 256 * 2^z pixels across 360 degrees, so detail
+finer than one pixel (vertices or coordinate digits) is invisible on screen
+and only inflates the response.
+"""
+import math
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from .database import engine, cached
+
+MAX_ZOOM = 22
+# ST_AsGeoJSON default when no zoom/tolerance is requested
+FULL_PRECISION = 15
+MIN_DIGITS = 2
+MAX_DIGITS = 8
+
+# Heatmap bins are about this many screen pixels wide at the requested zoom
+HEATMAP_CELL_PX = 24
+# Beyond this zoom cells (~60 m) hold about one establishment each: bins are
+# computed at this zoom instead
+HEATMAP_MAX_ZOOM = 16
+
+# Zooms with precomputed simplified geometries (cartografia.<tabla>_simplified)
+LOD_ZOOMS = (6, 9, 12)
+
+
+def degrees_per_pixel(zoom: int) -> float:
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def tolerance_for_zoom(zoom: int) -> float:
+    """Simplification tolerance (degrees) that stays below one screen pixel."""
+    return degrees_per_pixel(zoom) / 2
+
+
+def digits_for_zoom(zoom: int) -> int:
+    """Decimal digits needed to keep rounding error under a tenth of a pixel."""
+    digits = math.ceil(-math.log10(degrees_per_pixel(zoom) / 10))
+    return max(MIN_DIGITS, min(MAX_DIGITS, digits))
+
+
+def digits_for_tolerance(tolerance: float) -> int:
+    if tolerance <= 0:
+        return FULL_PRECISION
+    digits = math.ceil(-math.log10(tolerance / 10))
+    return max(MIN_DIGITS, min(MAX_DIGITS, digits))
+
+
+def geometry_detail(zoom: int = None, tolerance: float = None) -> tuple[float | None, int]:
+    """
+    Resolve the ``zoom`` / ``tolerance`` query parameters into
+    ``(simplify_tolerance, max_decimal_digits)``.
+
+    An explicit tolerance wins over the zoom; with neither, geometries are
+    returned untouched at full precision.
+    """
+    if tolerance is not None:
+        return (tolerance or None), digits_for_tolerance(tolerance)
+    if zoom is not None:
+        return tolerance_for_zoom(zoom), digits_for_zoom(zoom)
+    return None, FULL_PRECISION
+
+
+def heatmap_cell_size(zoom: int) -> float:
+    """Heatmap bin size in degrees for *zoom* (capped at HEATMAP_MAX_ZOOM)."""
+    return degrees_per_pixel(min(zoom, HEATMAP_MAX_ZOOM)) * HEATMAP_CELL_PX
+
+
+def lod_for_zoom(zoom: int = None) -> int | None:
+    """Coarsest precomputed level that is still detailed enough for *zoom*."""
+    if zoom is None:
+        return None
+    return next((lod for lod in LOD_ZOOMS if lod >= zoom), None)
+
+
+@cached(ttl_seconds=600)
+def has_simplified(schema: str, table: str) -> bool:
+    """Whether the precomputed ``<table>_simplified`` table exists (built by ETL)."""
+    try:
+        with engine.connect() as conn:
+            return bool(conn.execute(
+                text("SELECT to_regclass(:t) IS NOT NULL"),
+                {"t": f"{schema}.{table}_simplified"},
+            ).scalar())
+    except Exception:
+        return False
+
+
+def lod_source(schema: str, table: str, zoom: int, params: dict) -> tuple[str, str | None]:
+    """
+    Pick the relation to read a boundary layer from.
+
+    Returns ``(relation, condition)``: the precomputed simplified table
+    filtered to one level of detail when one fits *zoom*, else the base table
+    and None. Rows of the simplified table need no further simplification.
+    """
+    lod = lod_for_zoom(zoom)
+    if lod is not None and has_simplified(schema, table):
+        params["lod"] = lod
+        return f"{schema}.{table}_simplified", "lod = :lod"
+    return f"{schema}.{table}", None
+
+
+def parse_bbox(bbox: str = None) -> tuple[float, float, float, float] | None:
+    """Parse ``minx,miny,maxx,maxy`` (WGS84); 400 on malformed input."""
+    if not bbox:
+        return None
+    try:
+        minx, miny, maxx, maxy = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox debe ser minx,miny,maxx,maxy")
+    if not (-180 <= minx < maxx <= 180 and -90 <= miny < maxy <= 90):
+        raise HTTPException(status_code=400, detail=f"bbox fuera de rango: {bbox}")
+    return minx, miny, maxx, maxy
+
+
+def bbox_condition(bbox: str, params: dict, geom_col: str = "geom") -> str | None:
+    """
+    SQL predicate restricting *geom_col* to the viewport, or None without bbox.
+
+    ST_Intersects carries an implicit ``&&`` so the GiST index on the
+    geometry column prunes candidates before the exact test.
+    """
+    box = parse_bbox(bbox)
+    if box is None:
+        return None
+    params.update(bbox_minx=box[0], bbox_miny=box[1], bbox_maxx=box[2], bbox_maxy=box[3])
+    return (
+        f"ST_Intersects({geom_col}, "
+        "ST_MakeEnvelope(:bbox_minx, :bbox_miny, :bbox_maxx, :bbox_maxy, 4326))"
+    )
+
+
+def count_response(from_where: str, params: dict) -> JSONResponse:
+    """Count-only preflight: ``{"count": n}`` for ``SELECT COUNT(*) <from_where>``."""
+    with engine.connect() as conn:
+        count = conn.execute(text(f"SELECT COUNT(*) {from_where}"), params).scalar()
+    return JSONResponse({"count": int(count or 0)})
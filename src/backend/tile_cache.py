@@ -0,0 +1,122 @@
+"""
+On-disk vector tile cache (MBTiles-style SQLite file).
+
+Tiles of layers that only change when an ETL loader reruns are stored once,
+keyed by layer, data version and z/x/y. The data version of each layer lives
+in ``cartografia.layer_versions`` and is bumped by the loaders (see
+etl/layer_versions.py), so a reload makes old tiles unreachable without
+touching the API containers. Empty tiles are stored as zero-length blobs so
+they are not re-rendered either.
+"""
+import math
+import sqlite3
+import threading
+
+# Row numbering in MBTiles is TMS (y grows northwards)
+MBTILES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (
+    layer TEXT NOT NULL,
+    version TEXT NOT NULL,
+    zoom_level INTEGER NOT NULL,
+    tile_column INTEGER NOT NULL,
+    tile_row INTEGER NOT NULL,
+    tile_data BLOB NOT NULL,
+    PRIMARY KEY (layer, version, zoom_level, tile_column, tile_row)
+);
+"""
+
+
+def tms_row(z: int, y: int) -> int:
+    """Convert an XYZ row to the TMS row used by MBTiles."""
+    return (1 << z) - 1 - y
+
+
+def lonlat_to_tile(lon: float, lat: float, z: int) -> tuple[int, int]:
+    """XYZ tile containing a WGS84 point at zoom *z*."""
+    n = 1 << z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_for_bbox(bbox, z: int):
+    """Yield every (x, y) at zoom *z* covering ``[minx, miny, maxx, maxy]``."""
+    minx, miny, maxx, maxy = bbox
+    x0, y0 = lonlat_to_tile(minx, maxy, z)
+    x1, y1 = lonlat_to_tile(maxx, miny, z)
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            yield x, y
+
+
+class TileCache:
+    """
+    Tile store backed by one SQLite file, shared by every worker.
+
+    Args:
+        path: Location of the .mbtiles file (created if missing).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._pruned: dict = {}  # layer -> last version whose older tiles were removed
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(MBTILES_SCHEMA)
+        conn.execute(
+            "INSERT OR IGNORE INTO metadata (name, value) VALUES ('format', 'pbf'), "
+            "('name', 'observatorio-uraba')"
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, layer: str, version: str, z: int, x: int, y: int):
+        """Cached tile bytes (b"" for a known-empty tile), or None if not cached."""
+        row = self._conn().execute(
+            "SELECT tile_data FROM tiles WHERE layer = ? AND version = ? "
+            "AND zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (layer, version, z, x, tms_row(z, y)),
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def put(self, layer: str, version: str, z: int, x: int, y: int, data: bytes):
+        conn = self._conn()
+        if self._pruned.get(layer) != version:
+            self.prune(layer, version)
+        conn.execute(
+            "INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?, ?)",
+            (layer, version, z, x, tms_row(z, y), sqlite3.Binary(data)),
+        )
+        conn.commit()
+
+    def prune(self, layer: str, keep_version: str) -> int:
+        """Delete tiles of *layer* from versions older than *keep_version*.
+
+        Newer versions are left alone: a worker whose cached layer version is
+        still the previous one must not wipe tiles just seeded for the new one.
+        """
+        conn = self._conn()
+        deleted = conn.execute(
+            "DELETE FROM tiles WHERE layer = ? AND CAST(version AS INTEGER) < CAST(? AS INTEGER)",
+            (layer, keep_version),
+        ).rowcount
+        conn.commit()
+        self._pruned[layer] = keep_version
+        return deleted
+
+    def count(self, layer: str = None) -> int:
+        if layer is None:
+            return self._conn().execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM tiles WHERE layer = ?", (layer,)
+        ).fetchone()[0]
@@ -12,6 +12,7 @@ os.environ["DATABASE_URL"] = "sqlite://"
 os.environ["SENTRY_DSN"] = ""
 os.environ["RATE_LIMIT_RPM"] = "10000"  # Effectively disable rate limiting in tests
 os.environ["RATE_LIMIT_BPS"] = "10000"
+os.environ["EMPLEO_CUBE_ENABLED"] = "0"  # Endpoints query the (mocked) database
 
 
 @pytest.fixture()
@@ -20,6 +21,8 @@ def mock_query_dicts():
     with patch("src.backend.database.query_dicts") as db_mock, \
          patch("src.backend.routers.empleo.query_dicts", db_mock), \
          patch("src.backend.routers.analytics.query_dicts", db_mock), \
+         patch("src.backend.routers.geo.query_dicts", db_mock), \
+         patch("src.backend.pagination.query_dicts", db_mock), \
          patch("src.backend.database.query_dicts_batch") as batch_mock, \
          patch("src.backend.routers.analytics.query_dicts_batch", batch_mock):
         # Expose both mocks via the fixture; tests that only need query_dicts
@@ -237,3 +237,57 @@ class TestSalarioImputado:
         assert data["cobertura"]["total_ofertas"] == 200
         assert data["cobertura"]["pct_salario_real"] == 40.0
         assert data["cobertura"]["pct_cobertura_total"] == 70.0
+
+
+class TestAnalyticsViews:
+    def test_salario_imputado_reads_views_when_ready(self, client, mock_query_dicts):
+        mock_query_dicts.batch.return_value = [
+            [{"ready": True}],
+            [{"sector": "Salud", "municipio": "Turbo", "nivel_educativo": None,
+              "nivel_experiencia": None, "salario_estimado": 2000000.0,
+              "muestra": 4, "mediana": 1900000.0}],
+            [{"total": 100, "con_salario": 50, "con_imputado": 25}],
+        ]
+        resp = client.get("/api/analytics/laboral/salario-imputado")
+        assert resp.status_code == 200
+        assert mock_query_dicts.batch.call_count == 1
+        queries = [sql for sql, _ in mock_query_dicts.batch.call_args[0][0]]
+        assert "analytics.salario_referencia" in queries[1]
+        data = resp.json()
+        assert data["tabla_referencia"][0]["mediana"] == 1900000
+        assert data["cobertura"]["pct_cobertura_total"] == 75.0
+
+    def test_falls_back_to_raw_queries_without_views(self, client, mock_query_dicts):
+        mock_query_dicts.batch.side_effect = [[[{"ready": False}], [], []], [[], []]]
+        resp = client.get("/api/analytics/laboral/estacionalidad")
+        assert resp.status_code == 200
+        assert mock_query_dicts.batch.call_count == 2
+        raw = [sql for sql, _ in mock_query_dicts.batch.call_args[0][0]]
+        assert all("empleo.ofertas_laborales" in sql for sql in raw)
+        # Same one-offer-per-vacancy filter as the views
+        assert all("near_dup_cluster = dedup_hash" in sql for sql in raw)
+
+    def test_view_error_falls_back_instead_of_empty_data(self, client, mock_query_dicts):
+        raw = [[{"mes": 1, "ofertas": 30, "salario_promedio": 1600000, "sector": "Salud"}],
+               [{"mes": 1, "ofertas": 30, "salario_promedio": 1600000}]]
+        mock_query_dicts.batch.side_effect = [Exception("relation does not exist"), raw]
+        resp = client.get("/api/analytics/laboral/estacionalidad")
+        assert resp.status_code == 200
+        assert len(resp.json()["perfil_general"]) == 1
+        first, fallback = mock_query_dicts.batch.call_args_list
+        assert first.kwargs == {"strict": True}
+        assert fallback.kwargs == {}
+
+    def test_informalidad_proxy_from_view(self, client, mock_query_dicts):
+        mock_query_dicts.batch.return_value = [
+            [{"ready": True}],
+            [],
+            [{"municipio": "Turbo", "dane_code": "05837", "total_ofertas": 10,
+              "no_indefinido": 5, "indefinido": 5}],
+            [],
+        ]
+        resp = client.get("/api/analytics/laboral/informalidad")
+        assert resp.status_code == 200
+        assert resp.json()[0]["proxy_informal_pct"] == 50.0
+        queries = [sql for sql, _ in mock_query_dicts.batch.call_args[0][0]]
+        assert "analytics.contratos_municipio" in queries[2]
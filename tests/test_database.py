@@ -1,5 +1,9 @@
 """Tests for database utility functions: cache decorator, query helpers."""
 import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
 from src.backend.database import cached, _cache
 
 
@@ -54,3 +58,300 @@ class TestCacheDecorator:
         with_kwargs(name="b")
         with_kwargs(name="a")  # should hit cache
         assert call_count == 2
+
+
+class TestLRUCache:
+    def test_evicts_least_recently_used(self):
+        from src.backend.cache import LRUCache, MISSING
+
+        cache = LRUCache(max_entries=2)
+        cache.set("a", 1, 60)
+        cache.set("b", 2, 60)
+        assert cache.get("a") == 1  # "b" becomes least recently used
+        cache.set("c", 3, 60)
+        assert cache.get("b") is MISSING
+        assert cache.get("a") == 1
+        assert cache.stats()["evictions"] == 1
+
+    def test_respects_byte_budget(self):
+        from src.backend.cache import LRUCache
+
+        cache = LRUCache(max_entries=100, max_bytes=4096)
+        for i in range(20):
+            cache.set(i, "x" * 1000, 60)
+        stats = cache.stats()
+        assert stats["bytes"] <= 4096
+        assert stats["entries"] < 20
+        assert stats["evictions"] > 0
+
+    def test_oversized_value_not_cached(self):
+        from src.backend.cache import LRUCache, MISSING
+
+        cache = LRUCache(max_bytes=100)
+        cache.set("big", "x" * 1000, 60)
+        assert cache.get("big") is MISSING
+
+    def test_key_and_response_body_count_toward_budget(self):
+        from fastapi.responses import Response
+        from src.backend.cache import LRUCache, approx_size
+
+        body = b"x" * 50_000
+        assert approx_size(Response(content=body)) > len(body)
+        assert approx_size(body) >= len(body)
+
+        cache = LRUCache(max_bytes=10_000)
+        key = ("get_ofertas", (), (("busqueda", "y" * 20_000),))
+        cache.set(key, 1, 60)  # small value, oversized free-text key
+        assert len(cache) == 0
+
+    def test_purge_expired(self):
+        from src.backend.cache import LRUCache
+
+        cache = LRUCache()
+        cache.set("old", 1, 0.05)
+        cache.set("new", 2, 60)
+        time.sleep(0.1)
+        assert cache.purge_expired() == 1
+        assert len(cache) == 1
+
+    def test_counts_hits_and_misses(self):
+        @cached(ttl_seconds=60)
+        def fn(x):
+            return x
+
+        fn(1)
+        fn(1)
+        fn(2)
+        stats = _cache.stats()
+        assert stats["hits"] >= 1
+        assert stats["misses"] >= 2
+
+    def test_cache_stats_endpoint(self, client):
+        resp = client.get("/api/stats/cache")
+        assert resp.status_code == 200
+        assert {"hits", "misses", "evictions", "entries", "bytes"} <= set(resp.json())
+
+
+class TestSingleFlight:
+    def test_concurrent_misses_run_once(self):
+        import threading
+
+        call_count = 0
+        started = threading.Event()
+        release = threading.Event()
+
+        @cached(ttl_seconds=60)
+        def slow():
+            nonlocal call_count
+            call_count += 1
+            started.set()
+            release.wait(2)
+            return {"value": 42}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(slow())) for _ in range(8)]
+        threads[0].start()
+        started.wait(2)
+        for t in threads[1:]:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join(2)
+
+        assert call_count == 1
+        assert results == [{"value": 42}] * 8
+
+    def test_leader_error_propagates_and_is_not_cached(self):
+        from src.backend.cache import SingleFlight
+
+        flight = SingleFlight()
+
+        def boom():
+            raise ValueError("db down")
+
+        try:
+            flight.do("k", boom)
+        except ValueError:
+            pass
+        assert flight.in_flight() == 0
+        assert flight.do("k", lambda: 1) == 1
+
+
+class TestStaleWhileRevalidate:
+    def test_serves_stale_and_refreshes_in_background(self):
+        call_count = 0
+
+        @cached(ttl_seconds=0.05, stale_ttl=60)
+        def value():
+            nonlocal call_count
+            call_count += 1
+            return call_count
+
+        assert value() == 1
+        time.sleep(0.1)
+        assert value() == 1  # stale value served immediately
+        for _ in range(50):
+            if call_count == 2:
+                break
+            time.sleep(0.02)
+        assert call_count == 2
+        assert value() == 2
+
+    def test_hard_expiry_blocks_for_fresh_value(self):
+        call_count = 0
+
+        @cached(ttl_seconds=0.05, stale_ttl=0.05)
+        def value():
+            nonlocal call_count
+            call_count += 1
+            return call_count
+
+        assert value() == 1
+        time.sleep(0.15)
+        assert value() == 2
+
+    def test_failed_refresh_keeps_stale_value(self):
+        calls = []
+
+        @cached(ttl_seconds=0.05, stale_ttl=60)
+        def flaky():
+            calls.append(1)
+            if len(calls) > 1:
+                raise RuntimeError("db down")
+            return "ok"
+
+        assert flaky() == "ok"
+        time.sleep(0.1)
+        assert flaky() == "ok"
+        time.sleep(0.1)
+        assert flaky() == "ok"
+
+
+class TestSharedCacheTier:
+    def test_sqlite_backend_roundtrip(self, tmp_path):
+        from src.backend.cache import SQLiteCacheBackend
+
+        backend = SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"))
+        backend.set("k", b'{"a":1}', ex=60)
+        assert backend.get("k") == b'{"a":1}'
+        assert backend.delete("k") == 1
+        assert backend.get("k") is None
+
+    def test_sqlite_backend_expires(self, tmp_path):
+        from src.backend.cache import SQLiteCacheBackend
+
+        backend = SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"))
+        backend.set("k", b"1", ex=1)
+        backend._conn().execute("UPDATE cache SET expires_at = 0")
+        assert backend.get("k") is None
+
+    def test_entry_encoding_matches_api_json(self):
+        from datetime import date
+        from decimal import Decimal
+        from src.backend.cache import encode_entry, decode_entry
+
+        raw = encode_entry({"n": Decimal("1500000"), "p": Decimal("1.5"), "d": date(2025, 1, 15)}, 123.0)
+        value, fresh_until = decode_entry(raw)
+        assert value == {"n": 1500000, "p": 1.5, "d": "2025-01-15"}
+        assert fresh_until == 123.0
+
+    def test_workers_share_computed_value(self, tmp_path, monkeypatch):
+        from src.backend import database
+        from src.backend.cache import SQLiteCacheBackend
+
+        monkeypatch.setattr(database, "_shared", SQLiteCacheBackend(str(tmp_path / "cache.sqlite3")))
+        call_count = 0
+
+        @cached(ttl_seconds=60)
+        def shared_fn(x):
+            nonlocal call_count
+            call_count += 1
+            return {"x": x}
+
+        assert shared_fn(1) == {"x": 1}
+        _cache.clear()  # simulate another worker with a cold in-process cache
+        assert shared_fn(1) == {"x": 1}
+        assert call_count == 1
+
+    def test_shared_hits_and_errors_counted_across_threads(self, tmp_path, monkeypatch):
+        import threading
+        from src.backend import database
+        from src.backend.cache import SQLiteCacheBackend, encode_entry
+
+        monkeypatch.setattr(database, "_shared", SQLiteCacheBackend(str(tmp_path / "cache.sqlite3")))
+        monkeypatch.setattr(database, "_shared_counters", {"hits": 0, "errors": 0})
+        database._shared.set(database._shared_key(("k",)), encode_entry(("a", "b"), time.time() + 60), ex=60)
+        database._shared.set(database._shared_key(("bad",)), b"not an entry", ex=60)
+
+        def read():
+            for _ in range(50):
+                database._shared_get(("k",), 0)
+                database._shared_get(("bad",), 0)
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = database.cache_stats()
+        assert stats["shared_hits"] == 200 and stats["shared_errors"] == 200
+        # JSON round trip: the tuple comes back as a list
+        assert database._cache.peek(("k",)) == ["a", "b"]
+
+    def test_redis_compatible_client(self, monkeypatch):
+        from src.backend import database
+
+        class FakeRedis:
+            def __init__(self):
+                self.store = {}
+
+            def get(self, name):
+                return self.store.get(name)
+
+            def set(self, name, value, ex=None):
+                self.store[name] = value
+                return True
+
+        fake = FakeRedis()
+        monkeypatch.setattr(database, "_shared", fake)
+
+        @cached(ttl_seconds=60)
+        def redis_fn():
+            return [1, 2, 3]
+
+        redis_fn()
+        assert len(fake.store) == 1
+        assert next(iter(fake.store.values())).endswith(b"[1,2,3]")
+
+
+class TestQueryDictsBatch:
+    def _conn(self, engine):
+        conn = engine.connect.return_value.__enter__.return_value
+
+        def execute(stmt, params=None):
+            if "broken" in str(stmt):
+                raise RuntimeError("relation does not exist")
+            result = MagicMock()
+            result.returns_rows = True
+            result.keys.return_value = ["n"]
+            result.fetchall.return_value = [(1,)]
+            return result
+
+        conn.execute.side_effect = execute
+        return conn
+
+    def test_failed_query_yields_empty_list(self):
+        from src.backend.database import query_dicts_batch
+
+        with patch("src.backend.database.engine") as engine:
+            self._conn(engine)
+            assert query_dicts_batch([("SELECT broken", None), ("SELECT 1", None)]) == [[], [{"n": 1}]]
+
+    def test_strict_raises_on_failed_query(self):
+        from src.backend.database import query_dicts_batch
+
+        with patch("src.backend.database.engine") as engine:
+            self._conn(engine)
+            with pytest.raises(RuntimeError):
+                query_dicts_batch([("SELECT 1", None), ("SELECT broken", None)], strict=True)
@@ -1,5 +1,6 @@
 """Tests for the empleo router endpoints."""
 from unittest.mock import patch, MagicMock
+import pytest
 from sqlalchemy import text
 
 
@@ -64,23 +65,101 @@ class TestOfertasEndpoint:
         assert data["page"] == 3
         assert data["total_pages"] == 5
 
+    def test_get_ofertas_next_cursor_and_keyset_page(self, client, mock_query_dicts):
+        rows = [{"id": i, "fecha_publicacion": "2025-01-15"} for i in (9, 8, 7)]
+        mock_query_dicts.side_effect = [[{"total": 3}], rows]
+        data = client.get("/api/empleo/ofertas?page_size=2").json()
+        assert [r["id"] for r in data["items"]] == [9, 8]
+        assert data["next_cursor"]
+
+        mock_query_dicts.side_effect = [rows[2:], []]
+        resp = client.get(f"/api/empleo/ofertas?page_size=2&cursor={data['next_cursor']}")
+        assert resp.status_code == 200
+        page2 = resp.json()
+        assert page2["total"] is None and page2["total_mode"] == "none"
+        assert page2["next_cursor"] is None
+        (sql, params), (tail_sql, tail_params) = [c[0] for c in mock_query_dicts.call_args_list[-2:]]
+        assert "OFFSET" in sql and params["off"] == 0
+        assert "(fecha_publicacion, id) < (CAST(:cur_v AS date), :cur_id)" in sql
+        assert params["cur_v"] == "2025-01-15" and params["cur_id"] == 8
+        # Non-NULL dates exhausted: the rest of the page comes from the NULLS LAST tail
+        assert "fecha_publicacion IS NULL" in tail_sql and tail_params["lim"] == 2
+
+    def test_get_ofertas_invalid_cursor(self, client, mock_query_dicts):
+        mock_query_dicts.return_value = []
+        assert client.get("/api/empleo/ofertas?cursor=not-a-cursor").status_code == 400
+
+    def test_busqueda_full_text_ranked(self, client, mock_query_dicts):
+        mock_query_dicts.side_effect = [[{"total": 1}], [{"id": 4, "relevancia": 0.5}]]
+        with patch("src.backend.search.search_available", return_value=True):
+            resp = client.get("/api/empleo/ofertas?busqueda=Educación&orden=relevancia")
+        assert resp.status_code == 200
+        sql, params = mock_query_dicts.call_args[0]
+        assert "search_tsv @@ websearch_to_tsquery('spanish', :q_fold)" in sql
+        assert "ILIKE" not in sql
+        assert "AS relevancia" in sql and "ORDER BY (ts_rank_cd" in sql
+        assert params["q_fold"] == "educacion"
+
+    def test_busqueda_falls_back_to_ilike(self, client, mock_query_dicts):
+        mock_query_dicts.side_effect = [[{"total": 0}], []]
+        with patch("src.backend.search.search_available", return_value=False):
+            client.get("/api/empleo/ofertas?busqueda=banano&orden=relevancia")
+        sql, params = mock_query_dicts.call_args[0]
+        assert "titulo ILIKE :q" in sql
+        assert "ORDER BY fecha_publicacion DESC" in sql
+        assert params["q"] == "%banano%"
+
+    def test_unicas_keeps_cluster_representatives(self, client, mock_query_dicts):
+        mock_query_dicts.side_effect = [[{"total": 0}], []]
+        client.get("/api/empleo/ofertas?unicas=true")
+        count_sql = mock_query_dicts.call_args_list[0][0][0]
+        page_sql = mock_query_dicts.call_args_list[1][0][0]
+        for sql in (count_sql, page_sql):
+            assert "(near_dup_cluster IS NULL OR near_dup_cluster = dedup_hash)" in sql
+
 
 class TestEmpleoStats:
     def test_stats_basic(self, client, mock_query_dicts):
-        mock_query_dicts.side_effect = [
-            [{"total": 100}],
-            [{"municipio": "Apartadó", "total": 60}, {"municipio": "Turbo", "total": 40}],
-            [{"fuente": "computrabajo", "total": 70}],
-            [{"sector": "Agroindustria", "total": 50}],
-            [{"empresa": "Unibán", "total": 20}],
-            [{"total": 30}],
-            [{"promedio": 1500000, "minimo": 1000000, "maximo": 5000000, "mediana": 1300000}],
+        facet = {"con_salario": None, "promedio": None, "minimo": None, "maximo": None, "mediana": None}
+        mock_query_dicts.return_value = [
+            {"faceta": "empresa", "clave": "Unibán", "total": 20, **facet},
+            {"faceta": "fuente", "clave": "computrabajo", "total": 70, **facet},
+            {"faceta": "municipio", "clave": "Apartadó", "total": 60, **facet},
+            {"faceta": "municipio", "clave": "Turbo", "total": 40, **facet},
+            {"faceta": "sector", "clave": "Agroindustria", "total": 50, **facet},
+            {"faceta": "total", "clave": None, "total": 100, "con_salario": 30,
+             "promedio": 1500000, "minimo": 1000000, "maximo": 5000000, "mediana": 1300000.0},
         ]
         resp = client.get("/api/empleo/stats")
         assert resp.status_code == 200
         data = resp.json()
         assert data["total_ofertas"] == 100
-        assert len(data["por_municipio"]) == 2
+        assert data["con_salario"] == 30
+        assert data["salario_mediana"] == 1300000
+        assert data["por_municipio"] == [
+            {"municipio": "Apartadó", "total": 60}, {"municipio": "Turbo", "total": 40},
+        ]
+        assert data["top_empresas"] == [{"empresa": "Unibán", "total": 20}]
+        # Una sola sentencia para todas las facetas
+        assert mock_query_dicts.call_count == 1
+        assert "GROUPING SETS" in mock_query_dicts.call_args[0][0]
+
+    def test_stats_empty_table(self, client, mock_query_dicts):
+        mock_query_dicts.return_value = [
+            {"faceta": "total", "clave": None, "total": 0, "con_salario": 0,
+             "promedio": None, "minimo": None, "maximo": None, "mediana": None},
+        ]
+        data = client.get("/api/empleo/stats?dane_code=05045").json()
+        assert data["total_ofertas"] == 0
+        assert data["salario_promedio"] is None
+        assert data["por_sector"] == []
+        assert mock_query_dicts.call_args[0][1] == {"dane": "05045"}
+
+    @pytest.mark.parametrize("path", ["/api/empleo/stats", "/api/empleo/sectores", "/api/empleo/contratos"])
+    def test_aggregates_count_one_offer_per_vacancy(self, client, mock_query_dicts, path):
+        mock_query_dicts.return_value = []
+        client.get(path)
+        assert "(near_dup_cluster IS NULL OR near_dup_cluster = dedup_hash)" in mock_query_dicts.call_args[0][0]
 
 
 class TestEmpleoSkills:
@@ -0,0 +1,144 @@
+"""Tests for the in-memory empleo cube and the endpoints it answers."""
+from unittest.mock import patch
+
+import pytest
+
+from src.backend.services.empleo_cube import CUBE_SQL, UNICAS_CONDITION, EmpleoCube
+
+# dane_code, municipio, fuente, sector, empresa, periodo,
+# tipo_contrato, nivel_educativo, nivel_experiencia, modalidad, salario_numerico
+ROWS = [
+    ("05045", "Apartadó", "computrabajo", "Agroindustria", "Unibán", "2025-01",
+     "Indefinido", "Bachiller", "1-2 años", "Presencial", 1500000),
+    ("05045", "Apartadó", "computrabajo", "Agroindustria", "Unibán", "2025-01",
+     "Fijo", "Técnico", None, "Presencial", 2000000),
+    ("05045", "Apartadó", "elempleo", "Salud", "Clínica", "2025-02",
+     None, None, "Sin experiencia", None, None),
+    ("05837", "Turbo", "elempleo", "Agroindustria", "No especificada", "2025-02",
+     "Indefinido", "Bachiller", "1-2 años", "Remoto", 1300001),
+    ("05837", "Turbo", "sena", None, None, None,
+     None, None, None, None, None),
+]
+
+
+@pytest.fixture()
+def cube():
+    return EmpleoCube(ROWS)
+
+
+class TestEmpleoCube:
+    def test_group_counts_and_null_group(self, cube):
+        groups = cube.group("sector", cube.mask())
+        assert [(g["key"], g["count"]) for g in groups] == [
+            ("Agroindustria", 3), (None, 1), ("Salud", 1),
+        ]
+
+    def test_dane_filter_and_salary(self, cube):
+        m = cube.mask("05045")
+        assert cube.count(m) == 3
+        assert cube.salary(m) == {
+            "count": 2, "avg": 1750000, "min": 1500000, "max": 2000000, "median": 1750000.0,
+        }
+        assert cube.count(cube.mask("99999")) == 0
+
+    def test_average_rounds_half_up(self, cube):
+        agro = cube.group("sector", cube.mask())[0]
+        # (1500000 + 2000000 + 1300001) / 3 = 1600000.33
+        assert agro["salary_avg"] == 1600000
+        assert cube.salary(cube.mask("05837"))["avg"] == 1300001
+
+    def test_distinct_ignores_null(self, cube):
+        m = cube.mask()
+        assert cube.distinct("empresa", m) == 3
+        groups = {g["key"]: g for g in cube.group("sector", m, distinct=("empresa", "municipio"))}
+        assert groups["Agroindustria"]["distinct_empresa"] == 2
+        assert groups["Agroindustria"]["distinct_municipio"] == 2
+        assert groups[None]["distinct_empresa"] == 0
+
+    def test_exclude_matches_sql_not_equal(self, cube):
+        m = cube.exclude(cube.mask(), "empresa", "No especificada")
+        assert cube.count(m) == 3  # NULL and 'No especificada' excluded
+
+    def test_cube_holds_one_offer_per_vacancy(self):
+        assert CUBE_SQL.rstrip().endswith(f"WHERE {UNICAS_CONDITION}")
+
+    def test_crosstab(self, cube):
+        m = cube.exclude(cube.mask(), "sector", "Otro")
+        assert sorted(cube.crosstab("sector", "municipio", m)) == [
+            ("Agroindustria", "Apartadó", 2), ("Agroindustria", "Turbo", 1), ("Salud", "Apartadó", 1),
+        ]
+
+
+class TestCubeRefresh:
+    def test_rebuilt_when_table_version_changes(self, monkeypatch):
+        from src.backend.services import empleo_cube
+
+        version = {"v": "16384.16384.5.0.0"}
+        built = []
+
+        def fake_build():
+            built.append(version["v"])
+            return EmpleoCube(ROWS, version["v"])
+
+        monkeypatch.setattr(empleo_cube, "build_cube", fake_build)
+        monkeypatch.setattr(empleo_cube, "table_version", lambda table: version["v"])
+        monkeypatch.setattr(empleo_cube, "CUBE_ENABLED", True)
+        monkeypatch.setattr(empleo_cube, "_cube", None)
+        monkeypatch.setattr(empleo_cube, "_checked_at", 0.0)
+        monkeypatch.setattr(empleo_cube, "CUBE_CHECK", 0)
+        monkeypatch.setattr(empleo_cube.threading, "Thread",
+                            lambda target, daemon: type("T", (), {"start": staticmethod(target)}))
+
+        first = empleo_cube.get_cube()
+        assert empleo_cube.get_cube() is first and built == ["16384.16384.5.0.0"]
+
+        version["v"] = "16384.16384.5.3.0"  # ETL updated three rows
+        empleo_cube.get_cube()
+        assert empleo_cube.get_cube() is not first
+        assert built == ["16384.16384.5.0.0", "16384.16384.5.3.0"]
+
+    def test_unknown_version_falls_back_to_ttl(self, monkeypatch):
+        from src.backend.services import empleo_cube
+
+        monkeypatch.setattr(empleo_cube, "table_version", lambda table: None)
+        cube = EmpleoCube(ROWS, None)
+        assert not empleo_cube.is_stale(cube)
+        cube.built_at -= empleo_cube.CUBE_TTL + 1
+        assert empleo_cube.is_stale(cube)
+
+
+class TestCubeEndpoints:
+    @pytest.fixture()
+    def with_cube(self, cube):
+        with patch("src.backend.routers.empleo.get_cube", return_value=cube), \
+             patch("src.backend.routers.analytics.get_cube", return_value=cube):
+            yield cube
+
+    def test_stats_from_cube(self, client, mock_query_dicts, with_cube):
+        data = client.get("/api/empleo/stats?dane_code=05045").json()
+        mock_query_dicts.assert_not_called()
+        assert data["total_ofertas"] == 3
+        assert data["con_salario"] == 2
+        assert data["salario_mediana"] == 1750000
+        assert data["por_municipio"] == [{"municipio": "Apartadó", "total": 3}]
+        assert data["top_empresas"][0] == {"empresa": "Unibán", "total": 2}
+
+    def test_kpis_from_cube(self, client, with_cube):
+        data = client.get("/api/empleo/kpis").json()
+        assert data == {
+            "total_ofertas": 5, "total_empresas": 3, "total_sectores": 2,
+            "salario_promedio": 1600000, "sector_top": "Agroindustria", "empresa_top": "Unibán",
+        }
+
+    def test_distribution_excludes_null(self, client, with_cube):
+        data = client.get("/api/empleo/contratos").json()
+        assert data == [{"tipo": "Indefinido", "total": 2}, {"tipo": "Fijo", "total": 1}]
+
+    def test_serie_temporal_sorted_by_period(self, client, with_cube):
+        data = client.get("/api/empleo/serie-temporal").json()
+        assert [d["periodo"] for d in data] == ["2025-01", "2025-02"]
+        assert data[0] == {"periodo": "2025-01", "ofertas": 2, "empresas": 1, "salario_promedio": 1750000}
+
+    def test_sector_municipio_matrix(self, client, with_cube):
+        data = client.get("/api/analytics/laboral/sector-municipio").json()
+        assert data[0] == {"sector": "Agroindustria", "total": 3, "Apartadó": 2, "Turbo": 1}
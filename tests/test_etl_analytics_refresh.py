@@ -0,0 +1,36 @@
+"""Tests for the analytics views refresh (etl/analytics_refresh.py)."""
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "etl"))
+
+from analytics_refresh import ANALYTICS_VIEWS, refresh_analytics
+
+
+def _engine(current_views):
+    engine = MagicMock()
+    conn = engine.begin.return_value.__enter__.return_value
+    conn.execute.return_value.scalar.return_value = current_views
+    return engine, conn
+
+
+def _statements(conn):
+    return [str(c[0][0]) for c in conn.execute.call_args_list]
+
+
+class TestRefreshAnalytics:
+    def test_existing_views_only_refreshed(self):
+        engine, conn = _engine(len(ANALYTICS_VIEWS))
+        refresh_analytics(engine)
+        sql = _statements(conn)
+        assert not any("ALTER TABLE" in s or "CREATE MATERIALIZED VIEW" in s for s in sql)
+        refreshes = [s for s in sql if s.startswith("REFRESH")]
+        assert refreshes == [f"REFRESH MATERIALIZED VIEW CONCURRENTLY {v}" for v in ANALYTICS_VIEWS]
+
+    def test_missing_view_runs_creation_script(self):
+        engine, conn = _engine(len(ANALYTICS_VIEWS) - 1)
+        refresh_analytics(engine)
+        sql = _statements(conn)
+        assert any("CREATE MATERIALIZED VIEW IF NOT EXISTS analytics.salario_cobertura" in s for s in sql)
+        assert not any("ALTER TABLE" in s for s in sql)
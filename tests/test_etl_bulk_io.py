@@ -0,0 +1,91 @@
+"""Tests for the COPY-based bulk writer of the ETL (etl/bulk_io.py)."""
+import csv
+import io
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "etl"))
+
+from bulk_io import OFFER_STAGING_COLUMNS, bulk_insert_offers, bulk_update, encode_csv
+
+
+class TestEncodeCsv:
+    def test_null_vs_empty_and_quotes(self):
+        out = encode_csv([{"a": None, "b": "", "c": 'Dice "hola"\nadiós', "d": 1300000}], "abcd")
+        assert out == ',"","Dice ""hola""\nadiós","1300000"\n'
+        # Round-trips through a CSV parser as PostgreSQL would read it
+        assert next(csv.reader(io.StringIO(out))) == ["", "", 'Dice "hola"\nadiós', "1300000"]
+
+    def test_skills_as_array_literal(self):
+        out = encode_csv([{"skills": ["Excel", 'Cadena "frio"', "a\\b"], "x": []}], ["skills", "x"])
+        value = next(csv.reader(io.StringIO(out)))[0]
+        assert value == '{"Excel","Cadena \\"frio\\"","a\\\\b"}'
+        assert out.endswith(',"{}"\n')
+
+    def test_bytes_as_bytea_hex(self):
+        assert encode_csv([{"m": b"\x01\xff"}], ["m"]) == '"\\x01ff"\n'
+
+
+class TestBulkInsertOffers:
+    def _conn(self, inserted):
+        conn = MagicMock()
+        conn.execute.return_value.fetchall.return_value = [(h,) for h in inserted]
+        return conn
+
+    def test_copies_in_chunks_then_single_insert(self):
+        conn = self._conn(inserted=["0", "1", "3", None])
+        rows = ({"titulo": f"Oferta {i}", "dedup_hash": str(i)} for i in range(4))
+        rows = [*rows, {"titulo": "Sin hash", "dedup_hash": None}]
+        inserted, skipped, hashes = bulk_insert_offers(conn, rows, chunk_rows=2)
+        assert (inserted, skipped) == (4, 1)
+        assert hashes == {"0", "1", "3"}
+
+        cursor = conn.connection.cursor.return_value
+        assert cursor.copy_expert.call_count == 3
+        copy_sql, buf = cursor.copy_expert.call_args_list[0][0]
+        assert copy_sql.startswith("COPY _ofertas_staging (titulo, empresa,")
+        assert buf.getvalue().count("\n") == 2
+
+        create_sql, insert_sql = (str(c[0][0]) for c in conn.execute.call_args_list)
+        assert "CREATE TEMP TABLE IF NOT EXISTS _ofertas_staging" in create_sql
+        assert "ON COMMIT DROP" in create_sql
+        assert "ON CONFLICT (dedup_hash) WHERE dedup_hash IS NOT NULL DO NOTHING" in insert_sql
+        assert "to_tsvector('spanish', s.search_titulo)" in insert_sql
+        assert "o.content_hash = s.content_hash" in insert_sql
+        assert "search_titulo," not in insert_sql.split("SELECT")[0]
+        assert insert_sql.rstrip().endswith("RETURNING dedup_hash")
+
+    def test_nothing_to_insert(self):
+        conn = self._conn(inserted=[])
+        assert bulk_insert_offers(conn, iter([])) == (0, 0, set())
+        assert conn.execute.call_count == 1  # only the staging table
+        assert len(OFFER_STAGING_COLUMNS) == len({c for c, _ in OFFER_STAGING_COLUMNS})
+
+
+class TestBulkUpdate:
+    def test_one_transaction_per_chunk_and_changed_rows_only(self, capsys):
+        engine = MagicMock()
+        conn = engine.begin.return_value.__enter__.return_value
+        conn.execute.return_value.rowcount = 1
+        rows = ({"id": i, "skills": ["Excel"], "modalidad": None, "extra": "x"} for i in range(5))
+
+        changed = bulk_update(engine, "empleo.ofertas_laborales", ("id", "INTEGER"),
+                              [("skills", "TEXT[]"), ("modalidad", "TEXT")], rows,
+                              chunk_rows=2, label="test")
+        assert changed == 3  # three chunks, rowcount 1 each
+        assert engine.begin.call_count == 3
+
+        copy_sql, buf = conn.connection.cursor.return_value.copy_expert.call_args_list[0][0]
+        assert copy_sql == "COPY _bulk_update_staging (id, skills, modalidad) FROM STDIN WITH (FORMAT csv)"
+        assert buf.getvalue() == '"0","{""Excel""}",\n"1","{""Excel""}",\n'
+
+        update_sql = str(conn.execute.call_args_list[1][0][0])
+        assert "SET skills = s.skills, modalidad = s.modalidad" in update_sql
+        assert "t.skills IS DISTINCT FROM s.skills OR t.modalidad IS DISTINCT FROM s.modalidad" in update_sql
+        assert "test: 5 filas procesadas, 3 cambiadas" in capsys.readouterr().out
+
+    def test_empty_input_opens_no_transaction(self):
+        engine = MagicMock()
+        assert bulk_update(engine, "t", ("id", "INTEGER"), [("x", "TEXT")], []) == 0
+        engine.begin.assert_not_called()
@@ -1,4 +1,6 @@
 """Tests for ETL enrichment functions: skill extraction, sector classification, salary parsing, deduplication."""
+import random
+import re
 import sys
 from pathlib import Path
 
@@ -14,6 +16,15 @@ from etl_sync import (
     compute_dedup_hash,
     categorize_skills,
     SKILL_CATEGORIES,
+    search_fields,
+    enrich_offer,
+    PatternMatcher,
+    SKILL_PATTERNS,
+    SECTOR_PATTERNS,
+    CONTRATO_PATTERNS,
+    EDUCACION_PATTERNS,
+    EXPERIENCIA_PATTERNS,
+    MODALIDAD_PATTERNS,
 )
 
 
@@ -233,3 +244,96 @@ class TestCategorizeSkills:
         expected = {"Tecnológica", "Agroindustrial", "Blanda", "Industrial",
                     "Administrativa", "Logística y Transporte", "Turismo y Gastronomía"}
         assert set(SKILL_CATEGORIES.keys()) == expected
+
+
+class TestSearchFields:
+    def test_fields_are_accent_folded(self):
+        fields = search_fields("Auxiliar de Educación", "Unibán S.A.", "Niñera")
+        assert fields["search_titulo"] == "auxiliar de educacion"
+        assert fields["search_empresa"] == fields["empresa_norm"] == "uniban s.a."
+        assert fields["search_descripcion"] == "ninera"
+
+    def test_missing_empresa_has_no_trigram_key(self):
+        fields = search_fields("Operario", None, None)
+        assert fields["empresa_norm"] is None
+        assert fields["search_descripcion"] == ""
+
+    def test_matches_api_query_folding(self):
+        from src.backend.search import fold
+        for value in ("Chigorodó", "  NECOCLÍ ", "Vigía del Fuerte", "pingüino"):
+            assert search_fields(value, value, value)["search_titulo"] == fold(value)
+
+
+def _reference_first(patterns, text):
+    return next((label for pattern, label in patterns if re.search(pattern, text, re.IGNORECASE)), None)
+
+
+class TestPatternMatcher:
+    """The prefiltered matcher must agree with one re.search per pattern."""
+
+    def _corpus(self):
+        labels = [label for _, label in SKILL_PATTERNS + SECTOR_PATTERNS]
+        words = " ".join(labels).lower().split() + [
+            "de", "con", "2 años", "12 meses", "término fijo", "11°", "home office",
+            "IPS", "ıps", "ſap", "ingeniero civil", "maestro de obra", "más de 5",
+        ]
+        rng = random.Random(7)
+        return [" ".join(rng.choices(words, k=rng.randint(1, 60))) for _ in range(400)]
+
+    def test_equivalent_to_sequential_search(self):
+        for doc in self._corpus():
+            text = doc.lower()
+            skills = []
+            for pattern, name in SKILL_PATTERNS:
+                if name not in skills and re.search(pattern, text, re.IGNORECASE):
+                    skills.append(name)
+            expected = {
+                "skills": skills,
+                "sector": _reference_first(SECTOR_PATTERNS, text) or "Otro",
+                "nivel_experiencia": _reference_first(EXPERIENCIA_PATTERNS, text),
+                "tipo_contrato": _reference_first(CONTRATO_PATTERNS, text),
+                "nivel_educativo": _reference_first(EDUCACION_PATTERNS, text),
+                "modalidad": _reference_first(MODALIDAD_PATTERNS, text),
+            }
+            assert enrich_offer(doc, None) == expected, doc
+
+    def test_ignorecase_equivalents_pass_prefilter(self):
+        matcher = PatternMatcher({"x": [(r"\bIPS\b", "Salud"), (r"\bsap\b", "SAP")]})
+        assert matcher.first("x", "ıps") == "Salud"
+        assert matcher.all("x", "ſap") == ["SAP"]
+
+    def test_unfilterable_pattern_always_checked(self):
+        matcher = PatternMatcher({"x": [(r"[45]\s*a[nñ]os?", "4-5 anos")]})
+        assert matcher.families["x"][0][2] is None
+        assert matcher.first("x", "5 años") == "4-5 anos"
+
+
+class TestEnrichmentPipeline:
+    RECORDS = [
+        {"id": i, "titulo": titulo, "descripcion": desc, "empresa": "Unibán",
+         "municipio": "Apartadó", "salario": "$1.500.000"}
+        for i, (titulo, desc) in enumerate([
+            ("Operario de cosecha", "Finca bananera, sin experiencia"),
+            ("Auxiliar contable", "Manejo de Excel y SIIGO, contrato indefinido"),
+            ("Enfermera jefe", "IPS en Turbo, profesional, 2 años"),
+            ("Conductor", "Licencia C2, término fijo"),
+            ("Docente de inglés", "Colegio, presencial"),
+        ] * 3)
+    ]
+
+    def test_record_enrichment(self):
+        from enrichment_pipeline import enrich_record
+        out = enrich_record(self.RECORDS[1])
+        assert out["id"] == 1
+        assert "Excel" in out["skills"]
+        assert out["sector"] == "Contabilidad y Finanzas"
+        assert out["tipo_contrato"] == "Indefinido"
+        assert out["salario_numerico"] == 1500000
+        assert out["dedup_hash"] == compute_dedup_hash("Auxiliar contable", "Unibán", "Apartadó")
+
+    def test_process_pool_keeps_input_order(self):
+        from enrichment_pipeline import enrich_stream
+        serial = list(enrich_stream(iter(self.RECORDS), workers=1, chunk_size=4))
+        parallel = list(enrich_stream(iter(self.RECORDS), workers=2, chunk_size=2))
+        assert [r["id"] for r in parallel] == list(range(len(self.RECORDS)))
+        assert parallel == serial
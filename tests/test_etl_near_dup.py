@@ -0,0 +1,121 @@
+"""Tests for the MinHash/LSH near-duplicate clustering (etl/near_dup.py)."""
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "etl"))
+
+from near_dup import (BANDS, NUM_PERM, LSHIndex, NearDupAssigner, assign_clusters,
+                      band_keys, offer_text, pack, shingles, signature, similarity, unpack)
+
+DESCRIPCION = (
+    "Importante empresa del sector bananero requiere auxiliar de bodega con experiencia "
+    "minima de un año en manejo de inventarios, cargue y descargue de mercancia, "
+    "disponibilidad de tiempo completo y residencia en Apartadó o Carepa."
+)
+
+
+def _offer(dedup_hash, titulo="Auxiliar de bodega", empresa="Unibán", descripcion=DESCRIPCION):
+    return {"dedup_hash": dedup_hash, "titulo": titulo, "empresa": empresa,
+            "municipio": "Apartadó", "descripcion": descripcion}
+
+
+def _jaccard(a: str, b: str) -> float:
+    sa, sb = set(shingles(a).tolist()), set(shingles(b).tolist())
+    return len(sa & sb) / len(sa | sb)
+
+
+class TestSignature:
+    def test_deterministic_and_packable(self):
+        sig = signature(offer_text("Auxiliar", "Unibán", "Apartadó", DESCRIPCION))
+        assert sig.shape == (NUM_PERM,) and sig.dtype == np.uint32
+        assert np.array_equal(sig, signature(offer_text("AUXILIAR", "Uniban", "Apartado", DESCRIPCION)))
+        assert np.array_equal(unpack(memoryview(pack(sig))), sig)
+        assert len(band_keys(sig)) == BANDS
+
+    def test_too_short_text(self):
+        assert signature("abc") is None
+        assert shingles("").size == 0
+
+    def test_similarity_estimates_jaccard(self):
+        a = offer_text("Auxiliar de bodega", "Unibán", "Apartadó", DESCRIPCION)
+        b = offer_text("Auxiliar bodega - Urgente", "Uniban S.A.", "Apartadó",
+                       DESCRIPCION.replace("un año", "dos años"))
+        est = similarity(signature(a), signature(b))
+        assert abs(est - _jaccard(a, b)) < 0.2
+        assert est >= 0.7
+        other = offer_text("Enfermera jefe", "IPS Urabá", "Turbo",
+                           "Se requiere enfermera profesional para servicio de urgencias nocturno.")
+        assert similarity(signature(a), signature(other)) < 0.3
+
+
+class TestAssignClusters:
+    def test_repost_on_other_portal_joins_first_offer(self):
+        rows = [
+            _offer("h1"),
+            _offer("h2", titulo="Auxiliar bodega", empresa="UNIBAN S.A."),
+            _offer("h3", titulo="Enfermera jefe", empresa="IPS Urabá",
+                   descripcion="Se requiere enfermera profesional para servicio de urgencias nocturno."),
+        ]
+        entries = assign_clusters(rows)
+        assert [r["near_dup_cluster"] for r in rows] == ["h1", "h1", "h3"]
+        assert all(isinstance(r["minhash"], bytes) for r in rows)
+        assert len(entries) == 3 * BANDS
+        assert {e["dedup_hash"] for e in entries} == {"h1", "h2", "h3"}
+
+    def test_rows_without_hash_or_text_are_left_out(self):
+        rows = [_offer(None), {"dedup_hash": "h9", "titulo": "Ok"}]
+        assert assign_clusters(rows) == []
+        assert rows[0]["near_dup_cluster"] is None and rows[1]["minhash"] is None
+
+    def test_index_supplies_stored_candidates(self):
+        index = LSHIndex()
+        stored = signature(offer_text("Auxiliar de bodega", "Unibán", "Apartadó", DESCRIPCION))
+        index.add("viejo", stored, "raiz")
+        rows = [_offer("nuevo")]
+        assign_clusters(rows, index)
+        assert rows[0]["near_dup_cluster"] == "raiz"
+
+
+class TestNearDupAssigner:
+    def test_one_candidate_query_per_chunk(self):
+        conn = MagicMock()
+        conn.execute.return_value = []
+        assigner = NearDupAssigner(conn, chunk_rows=2)
+        ddl_calls = conn.execute.call_count
+        rows = list(assigner.stream(_offer(f"h{i}") for i in range(5)))
+        assert [r["dedup_hash"] for r in rows] == ["h0", "h1", "h2", "h3", "h4"]
+        assert conn.execute.call_count - ddl_calls == 3
+        params = conn.execute.call_args_list[-1][0][1]
+        assert params["bands"] == list(range(BANDS))
+        # Identical text: all five rows end up in the first offer's cluster
+        assert {r["near_dup_cluster"] for r in rows} == {"h0"}
+        assert len(assigner.entries) == 5 * BANDS
+
+    def test_write_only_inserted_rows_and_reroots_orphans(self):
+        conn = MagicMock()
+        conn.execute.return_value = []
+        assigner = NearDupAssigner(conn)
+        # h0 roots the cluster but is skipped by the insert (content_hash already stored)
+        list(assigner.stream(_offer(f"h{i}") for i in range(3)))
+        conn.reset_mock()
+        conn.execute.return_value = []  # h0 is not in the table either
+
+        with patch("near_dup.write_lsh_entries", return_value=2 * BANDS) as write_lsh:
+            assert assigner.write({"h1", "h2"}) == 2 * BANDS
+        entries = write_lsh.call_args[0][1]
+        assert {e["dedup_hash"] for e in entries} == {"h1", "h2"}
+
+        lookup, reroot = conn.execute.call_args_list
+        assert lookup[0][1] == {"h": ["h0"]}
+        assert "SET near_dup_cluster = r.new" in str(reroot[0][0])
+        assert reroot[0][1] == {"old": ["h0"], "new": ["h1"]}
+        assert assigner.entries == [] and assigner.clusters == {}
+
+    def test_cluster_rooted_at_stored_offer_is_kept(self):
+        assigner = NearDupAssigner(MagicMock())
+        assigner.clusters = {"h0": "h0", "h1": "h0", "h2": "viejo", "h3": "h3"}
+        assert assigner.orphan_roots({"h1", "h2", "h3"}, stored={"h0", "viejo"}) == {}
+        assert assigner.orphan_roots({"h1", "h2", "h3"}, stored=set()) == {"h0": "h1", "viejo": "h2"}
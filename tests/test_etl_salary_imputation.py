@@ -0,0 +1,96 @@
+"""Tests for the vectorised salary imputation of ETL 16 (etl/salary_imputation.py)."""
+import random
+import statistics
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "etl"))
+
+from salary_imputation import (NULL_SECTOR, OFFER_COLUMNS, changed_sectors, impute,
+                               level_counts, sector_fingerprints, to_updates)
+
+
+def _offers(n=400, seed=7):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(1, n + 1):
+        salary = rnd.choice([None, None, rnd.randrange(1_300_000, 4_000_000, 50_000)])
+        rows.append((i, rnd.choice(["Salud", "Agro", None]), rnd.choice(["Apartadó", "Turbo", None]),
+                     rnd.choice(["Bachiller", "Técnico", None]), rnd.choice(["Junior", None]), salary))
+    return pd.DataFrame(rows, columns=OFFER_COLUMNS)
+
+
+def _loop_reference(offers):
+    """The per-offer dict lookup the vectorised version replaces."""
+    def medians(keys):
+        groups = {}
+        for row in offers.itertuples(index=False):
+            if not pd.isna(row.salario_numerico):
+                groups.setdefault(tuple(getattr(row, k) for k in keys), []).append(row.salario_numerico)
+        return {k: int(statistics.median(v)) for k, v in groups.items() if len(v) >= 3}
+
+    ref1 = medians(["sector", "municipio", "nivel_educativo", "nivel_experiencia"])
+    ref2 = medians(["sector", "municipio"])
+    ref3 = medians(["sector"])
+    out = {}
+    for r in offers.itertuples(index=False):
+        if not pd.isna(r.salario_numerico):
+            out[r.id] = None
+            continue
+        out[r.id] = ref1.get((r.sector, r.municipio, r.nivel_educativo, r.nivel_experiencia),
+                             ref2.get((r.sector, r.municipio), ref3.get((r.sector,))))
+    return out
+
+
+class TestImpute:
+    def test_matches_loop_implementation(self):
+        offers = _offers()
+        result = impute(offers)
+        expected = _loop_reference(offers)
+        assert {u["id"]: u["salario_imputado"] for u in to_updates(result)} == expected
+
+    def test_level_fallback_and_counts(self):
+        offers = pd.DataFrame([
+            (1, "Salud", "Turbo", "Técnico", "Junior", 2_000_000),
+            (2, "Salud", "Turbo", "Técnico", "Junior", 2_100_000),
+            (3, "Salud", "Turbo", "Técnico", "Junior", 2_300_000),
+            (4, "Salud", "Apartadó", None, None, 1_500_000),
+            (5, "Salud", "Turbo", "Técnico", "Junior", None),   # L1
+            (6, "Salud", "Turbo", "Bachiller", None, None),     # L2
+            (7, "Salud", "Necoclí", None, None, None),          # L3
+            (8, "Agro", "Turbo", None, None, None),             # miss
+        ], columns=OFFER_COLUMNS)
+        result = impute(offers)
+        niveles = [None if pd.isna(n) else n for n in result["nivel"]]
+        assert niveles == [None] * 4 + ["L1", "L2", "L3", None]
+        assert to_updates(result)[4:] == [
+            {"id": 5, "salario_imputado": 2_100_000},
+            {"id": 6, "salario_imputado": 2_100_000},
+            {"id": 7, "salario_imputado": 2_050_000},
+            {"id": 8, "salario_imputado": None},
+        ]
+        assert level_counts(result, offers) == {"L1": 1, "L2": 1, "L3": 1, "misses": 1}
+
+
+class TestSectorFingerprints:
+    def test_only_touched_sector_changes(self):
+        offers = _offers()
+        before = sector_fingerprints(offers)
+        assert set(before) == {"Salud", "Agro", NULL_SECTOR}
+        # Row order does not matter
+        assert sector_fingerprints(offers.iloc[::-1]) == before
+
+        edited = offers.copy()
+        idx = edited.index[edited["sector"] == "Agro"][0]
+        edited.loc[idx, "salario_numerico"] = 9_999_999
+        assert changed_sectors(sector_fingerprints(edited), before) == {"Agro"}
+
+    def test_added_and_removed_sectors(self):
+        before = sector_fingerprints(_offers())
+        after = dict(before)
+        del after["Agro"]
+        after["Pesca"] = "1:1"
+        assert changed_sectors(after, before) == {"Agro", "Pesca"}
+        assert changed_sectors(before, before) == set()
@@ -0,0 +1,44 @@
+"""Tests for the incremental sync watermarks (etl/sync_state.py)."""
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "etl"))
+
+from sync_state import WatermarkTracker, pending_rows_sql
+
+
+def _scrape():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE ofertas (id INTEGER PRIMARY KEY, fuente TEXT, fecha_scraping TEXT)")
+    conn.executemany("INSERT INTO ofertas VALUES (?, ?, ?)", [
+        (1, "computrabajo", "2025-01-01"), (2, "elempleo", "2025-01-01"),
+        (3, "computrabajo", "2025-01-02"), (4, "elempleo", "2025-01-02"),
+        (5, "sena", "2025-01-03"), (6, "computrabajo", "2025-01-03"),
+    ])
+    return conn
+
+
+class TestPendingRows:
+    def test_first_run_reads_everything(self):
+        sql, params = pending_rows_sql({})
+        assert [r["id"] for r in _scrape().execute(sql, params)] == [1, 2, 3, 4, 5, 6]
+
+    def test_only_rows_past_each_source_watermark(self):
+        sql, params = pending_rows_sql({"computrabajo": 3, "elempleo": 4})
+        ids = [r["id"] for r in _scrape().execute(sql, params)]
+        # sena has no watermark yet, so all its rows are pending
+        assert ids == [5, 6]
+
+
+class TestWatermarkTracker:
+    def test_keeps_highest_id_per_source(self):
+        tracker = WatermarkTracker()
+        for row in _scrape().execute("SELECT * FROM ofertas ORDER BY id DESC"):
+            tracker.see(row)
+        assert tracker.marks == {
+            "computrabajo": (6, "2025-01-03"),
+            "elempleo": (4, "2025-01-02"),
+            "sena": (5, "2025-01-03"),
+        }
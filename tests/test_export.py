@@ -0,0 +1,257 @@
+"""Tests for the export endpoints (/api/export): streaming NDJSON/CSV and Parquet/Arrow files."""
+import datetime
+import decimal
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+
+def _fake_stream(columns, *batches):
+    calls = []
+
+    def stream(sql, params):
+        calls.append((sql, params))
+        yield columns
+        yield from batches
+    stream.calls = calls
+    return stream
+
+
+class TestStreamQuery:
+    def test_yields_columns_then_batches(self):
+        from src.backend import database
+
+        engine = create_engine("sqlite://", poolclass=StaticPool,
+                               connect_args={"check_same_thread": False})
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE t (id INTEGER, nombre TEXT)"))
+            conn.execute(text("INSERT INTO t VALUES (:i, :n)"), [{"i": i, "n": f"n{i}"} for i in range(5)])
+        with patch.object(database, "engine", engine):
+            stream = database.stream_query("SELECT id, nombre FROM t WHERE id >= :m ORDER BY id",
+                                           {"m": 1}, batch_rows=2)
+            assert next(stream) == ["id", "nombre"]
+            assert list(stream) == [[(1, "n1"), (2, "n2")], [(3, "n3"), (4, "n4")]]
+
+
+class TestExportOfertas:
+    def test_ndjson_rows_and_filters(self, client):
+        stream = _fake_stream(
+            ["id", "titulo", "skills", "fecha_publicacion"],
+            [(1, "Enfermera", ["Excel"], datetime.date(2025, 3, 1))],
+            [(2, "Operario", None, None)],
+        )
+        with patch("src.backend.routers.export.stream_query", stream):
+            resp = client.get("/api/export/ofertas.ndjson?sector=Salud&unicas=true")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        assert 'filename="ofertas.ndjson"' in resp.headers["content-disposition"]
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+        assert lines == [
+            {"id": 1, "titulo": "Enfermera", "skills": ["Excel"], "fecha_publicacion": "2025-03-01"},
+            {"id": 2, "titulo": "Operario", "skills": None, "fecha_publicacion": None},
+        ]
+        sql, params = stream.calls[0]
+        assert "sector = :sector" in sql and "near_dup_cluster = dedup_hash" in sql
+        assert sql.rstrip().endswith("ORDER BY id")
+        assert params == {"sector": "Salud"}
+
+    def test_csv_header_and_arrays(self, client):
+        stream = _fake_stream(["id", "titulo", "skills"], [(1, 'Dice "hola"', ["Excel", "SQL"])])
+        with patch("src.backend.routers.export.stream_query", stream):
+            resp = client.get("/api/export/ofertas.csv")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/csv")
+        assert resp.text.splitlines() == ["id,titulo,skills", '1,"Dice ""hola""",Excel|SQL']
+
+    def test_empty_csv_still_has_header(self, client):
+        with patch("src.backend.routers.export.stream_query", _fake_stream(["id", "titulo"])):
+            resp = client.get("/api/export/ofertas.csv")
+        assert resp.text.splitlines() == ["id,titulo"]
+
+    def test_unknown_format(self, client):
+        assert client.get("/api/export/ofertas.xlsx").status_code == 404
+
+
+class TestExportTerridata:
+    def test_same_filters_as_indicators_endpoint(self, client):
+        stream = _fake_stream(["dane_code", "indicador"], [("05045", "Cobertura")])
+        with patch("src.backend.routers.export.stream_query", stream):
+            resp = client.get("/api/export/terridata.ndjson?dane_code=05045&dimension=Salud")
+        assert resp.status_code == 200
+        assert json.loads(resp.text) == {"dane_code": "05045", "indicador": "Cobertura"}
+        sql, params = stream.calls[0]
+        assert "dane_code = :dane" in sql and "dimension = :dim" in sql
+        assert params == {"dane": "05045", "dim": "Salud"}
+
+
+class TestColumnarExport:
+    def test_without_pyarrow_is_501(self, client):
+        with patch("src.backend.services.columnar_export.pyarrow_available", return_value=False):
+            resp = client.get("/api/export/ofertas.parquet")
+        # Served by the columnar route, not by /ofertas.{fmt}
+        assert resp.status_code == 501
+        assert "pyarrow" in resp.json()["detail"]
+
+    def test_unknown_dataset(self, client):
+        assert client.get("/api/export/usuarios.arrow").status_code == 404
+
+    def test_file_served_with_range_support(self, client, tmp_path):
+        path = tmp_path / "icfes-1.0.0.parquet"
+        path.write_bytes(b"PAR1" + b"x" * 96)
+        with patch("src.backend.services.columnar_export.pyarrow_available", return_value=True), \
+             patch("src.backend.services.columnar_export.export_path", return_value=(str(path), True)) as ep:
+            full = client.get("/api/export/icfes.parquet")
+            part = client.get("/api/export/icfes.parquet", headers={"Range": "bytes=0-3"})
+        assert ep.call_args[0][:3] == ("icfes", "socioeconomico.icfes", "parquet")
+        assert full.status_code == 200 and len(full.content) == 100
+        assert full.headers["accept-ranges"] == "bytes"
+        assert 'filename="icfes.parquet"' in full.headers["content-disposition"]
+        assert part.status_code == 206 and part.content == b"PAR1"
+        assert path.exists()
+
+
+class TestExportPath:
+    def _export(self, monkeypatch, tmp_path, version):
+        from src.backend.services import columnar_export
+
+        writes = []
+
+        def fake_write(path, fmt, table, columns):
+            writes.append(path)
+            with open(path, "wb") as f:
+                f.write(b"data")
+            return 1
+
+        monkeypatch.setattr(columnar_export, "EXPORT_CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(columnar_export, "_write", fake_write)
+        monkeypatch.setattr(columnar_export, "data_version", lambda table: version)
+        return columnar_export, writes
+
+    def test_generated_once_per_version(self, monkeypatch, tmp_path):
+        mod, writes = self._export(monkeypatch, tmp_path, "10.2.0")
+        first = mod.export_path("icfes", "socioeconomico.icfes", "parquet")
+        assert first == (str(tmp_path / "icfes-10.2.0.parquet"), True)
+        assert mod.export_path("icfes", "socioeconomico.icfes", "parquet") == first
+        assert len(writes) == 1
+
+        monkeypatch.setattr(mod, "data_version", lambda table: "11.2.0")
+        path, cached = mod.export_path("icfes", "socioeconomico.icfes", "parquet")
+        assert path.endswith("icfes-11.2.0.parquet") and len(writes) == 2
+        # The previous version is removed once the new one exists
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["icfes-11.2.0.parquet"]
+
+    def test_without_version_not_cached(self, monkeypatch, tmp_path):
+        mod, writes = self._export(monkeypatch, tmp_path, None)
+        path, cached = mod.export_path("hurtos", "seguridad.hurtos", "arrow")
+        assert not cached and path.endswith(".arrow") and len(writes) == 1
+
+
+class TestDataVersion:
+    def test_is_the_table_version(self):
+        from src.backend.services import columnar_export
+
+        with patch.object(columnar_export, "table_version", return_value="16500.16500.120.0.0") as tv:
+            assert columnar_export.data_version.__wrapped__("seguridad.hurtos") == "16500.16500.120.0.0"
+        tv.assert_called_once_with("seguridad.hurtos")
+
+    def test_recreated_table_gets_new_version(self):
+        """DROP + CREATE resets pg_stat counters; the relation oid still changes."""
+        from src.backend import database
+
+        conn = MagicMock()
+        conn.__enter__.return_value = conn
+        conn.execute.return_value.fetchone.side_effect = [(16500, 16500, 120, 0, 0), (16620, 16620, 120, 0, 0)]
+        with patch.object(database, "engine") as engine:
+            engine.connect.return_value = conn
+            before = database.table_version("socioeconomico.terridata")
+            after = database.table_version("socioeconomico.terridata")
+        assert before != after
+        assert "to_regclass(:t)" in str(conn.execute.call_args[0][0])
+
+
+class TestColumnarWrite:
+    """Real Parquet / Arrow files written by _write and read back with pyarrow."""
+
+    TYPES = [
+        ("id", "integer", 32, 0),
+        ("puntaje", "numeric", 18, 6),
+        ("tasa", "numeric", None, None),
+        ("fecha", "date", None, None),
+        ("skills", "ARRAY", None, None),
+        ("nombre", "text", None, None),
+    ]
+    BATCHES = [
+        [(1, decimal.Decimal("250.123456"), decimal.Decimal("0.1000000000000000000001"),
+          datetime.date(2024, 3, 1), ["Excel", "SQL"], "Ana"),
+         (2, None, None, None, None, None)],
+        [(3, decimal.Decimal("7"), decimal.Decimal("12"), datetime.date(2025, 12, 31), [], "Luis")],
+    ]
+
+    @pytest.fixture()
+    def write(self, monkeypatch):
+        pytest.importorskip("pyarrow")
+        from src.backend.services import columnar_export
+
+        calls = []
+
+        def stream(sql, params=None, batch_rows=None):
+            calls.append(sql)
+            yield [t[0] for t in self.TYPES]
+            yield from self.BATCHES
+
+        monkeypatch.setattr(columnar_export, "_column_types", lambda table: list(self.TYPES))
+        monkeypatch.setattr(columnar_export, "stream_query", stream)
+        return columnar_export._write, calls
+
+    def _check(self, table):
+        import pyarrow as pa
+
+        assert table.schema.field("id").type == pa.int32()
+        assert table.schema.field("puntaje").type == pa.decimal128(18, 6)
+        assert table.schema.field("tasa").type == pa.string()
+        assert table.schema.field("fecha").type == pa.date32()
+        assert table.schema.field("skills").type == pa.list_(pa.string())
+        assert table.schema.field("nombre").type == pa.string()
+        assert table.to_pylist() == [
+            {"id": 1, "puntaje": decimal.Decimal("250.123456"), "tasa": "0.1000000000000000000001",
+             "fecha": datetime.date(2024, 3, 1), "skills": ["Excel", "SQL"], "nombre": "Ana"},
+            {"id": 2, "puntaje": None, "tasa": None, "fecha": None, "skills": None, "nombre": None},
+            {"id": 3, "puntaje": decimal.Decimal("7.000000"), "tasa": "12",
+             "fecha": datetime.date(2025, 12, 31), "skills": [], "nombre": "Luis"},
+        ]
+
+    def test_parquet_round_trip(self, write, tmp_path):
+        import pyarrow.parquet as pq
+
+        write, calls = write
+        path = tmp_path / "icfes.parquet"
+        assert write(str(path), "parquet", "socioeconomico.icfes", None) == 3
+        assert calls == ['SELECT "id", "puntaje", "tasa", "fecha", "skills", "nombre" FROM socioeconomico.icfes']
+        self._check(pq.read_table(path))
+
+    def test_arrow_round_trip(self, write, tmp_path):
+        import pyarrow as pa
+
+        write, _ = write
+        path = tmp_path / "icfes.arrow"
+        assert write(str(path), "arrow", "socioeconomico.icfes", None) == 3
+        with pa.memory_map(str(path)) as source:
+            reader = pa.ipc.open_file(source)
+            assert reader.num_record_batches == 2  # one per streamed batch
+            self._check(reader.read_all())
+
+    def test_selected_columns_keep_numeric_precision(self, write, tmp_path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        write, calls = write
+        path = tmp_path / "icfes.parquet"
+        self.BATCHES = [[(decimal.Decimal("1.5"), "x")]]
+        write(str(path), "parquet", "socioeconomico.icfes", ["puntaje", "desconocida"])
+        assert calls == ['SELECT "puntaje", "desconocida" FROM socioeconomico.icfes']
+        schema = pq.read_schema(path)
+        assert schema.field("puntaje").type == pa.decimal128(18, 6)
+        assert schema.field("desconocida").type == pa.string()
@@ -0,0 +1,336 @@
+"""Tests for the geo and layers routers."""
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+
+def _mock_conn(mock_engine, row):
+    conn = MagicMock()
+    conn.__enter__ = MagicMock(return_value=conn)
+    conn.__exit__ = MagicMock(return_value=False)
+    conn.execute.return_value.fetchone.return_value = row
+    mock_engine.connect.return_value = conn
+    return conn
+
+
+FC_TEXT = (
+    '{"type" : "FeatureCollection", "features" : [{"type" : "Feature", '
+    '"geometry" : {"type":"Point","coordinates":[-76.62,7.88]}, '
+    '"properties" : {"id": 1, "highway": "primary"}}]}'
+)
+
+
+class TestGeoJSONPassthrough:
+    def test_vias_returns_postgis_text_verbatim(self, client, mock_engine):
+        conn = _mock_conn(mock_engine, (FC_TEXT,))
+        resp = client.get("/api/geo/vias?dane_code=05045")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("application/geo+json")
+        assert resp.text == FC_TEXT
+        sql = str(conn.execute.call_args[0][0])
+        assert "::text" in sql
+
+    def test_layer_geojson_empty_result(self, client, mock_engine):
+        _mock_conn(mock_engine, None)
+        resp = client.get("/api/layers/osm_vias/geojson")
+        assert resp.status_code == 200
+        assert json.loads(resp.text) == {"type": "FeatureCollection", "features": []}
+
+    def test_unknown_layer_404(self, client):
+        resp = client.get("/api/layers/no_existe/geojson")
+        assert resp.status_code == 404
+
+
+class TestVectorTiles:
+    @pytest.fixture()
+    def layers_engine(self):
+        with patch("src.backend.routers.layers.engine") as mock:
+            yield mock
+
+    def _conn(self, mock_engine, columns, tile):
+        conn = _mock_conn(mock_engine, None)
+        conn.execute.return_value.fetchall.return_value = [(c,) for c in columns]
+        conn.execute.return_value.scalar.return_value = tile
+        return conn
+
+    def test_tile_returns_mvt_bytes(self, client, layers_engine):
+        conn = self._conn(layers_engine, ["id", "highway", "name"], b"\x1a\x05tile")
+        resp = client.get("/api/layers/osm_vias/tiles/12/1180/1940.mvt?dane_code=05045&fields=highway")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == "application/vnd.mapbox-vector-tile"
+        assert resp.content == b"\x1a\x05tile"
+        sql, params = conn.execute.call_args[0]
+        assert "ST_AsMVTGeom" in str(sql)
+        assert 't."highway"' in str(sql)
+        assert 't."name"' not in str(sql)
+        # Candidate features come from the envelope grown by the MVT buffer
+        assert "margin => 0.015625" in str(sql)
+        assert "ST_Transform(bounds.query_env, 4326)" in str(sql)
+        assert params["dane"] == "05045"
+
+    def test_empty_tile_is_204(self, client, layers_engine):
+        self._conn(layers_engine, ["dane_code", "nombre"], None)
+        resp = client.get("/api/layers/limite_municipal/tiles/8/70/123.mvt")
+        assert resp.status_code == 204
+
+    def test_unknown_field_rejected(self, client, layers_engine):
+        self._conn(layers_engine, ["id", "highway"], b"x")
+        resp = client.get("/api/layers/osm_vias/tiles/12/1180/1940.mvt?fields=password")
+        assert resp.status_code == 400
+
+    def test_out_of_range_tile_rejected(self, client):
+        resp = client.get("/api/layers/osm_vias/tiles/3/9/1.mvt")
+        assert resp.status_code == 400
+
+
+class TestTileCache:
+    def test_get_put_and_version_prune(self, tmp_path):
+        from src.backend.tile_cache import TileCache
+
+        cache = TileCache(str(tmp_path / "tiles.mbtiles"))
+        assert cache.get("igac_uraba", "1", 8, 76, 123) is None
+        cache.put("igac_uraba", "1", 8, 76, 123, b"\x1a\x02")
+        cache.put("igac_uraba", "1", 8, 76, 124, b"")
+        assert cache.get("igac_uraba", "1", 8, 76, 123) == b"\x1a\x02"
+        assert cache.get("igac_uraba", "1", 8, 76, 124) == b""
+        cache.put("igac_uraba", "2", 8, 76, 123, b"\x1a\x03")
+        assert cache.get("igac_uraba", "1", 8, 76, 123) is None
+        assert cache.count("igac_uraba") == 1
+
+    def test_stale_worker_does_not_prune_newer_version(self, tmp_path):
+        from src.backend.tile_cache import TileCache
+
+        path = str(tmp_path / "tiles.mbtiles")
+        seeder, worker = TileCache(path), TileCache(path)
+        seeder.put("igac_uraba", "3", 8, 76, 123, b"\x1a\x03")
+        # A worker still on version 2 (cached _layer_version) writes a tile
+        worker.put("igac_uraba", "2", 8, 76, 124, b"\x1a\x02")
+        assert worker.get("igac_uraba", "3", 8, 76, 123) == b"\x1a\x03"
+
+    def test_tiles_for_bbox_covers_uraba(self):
+        from src.backend.tile_cache import lonlat_to_tile, tiles_for_bbox
+
+        tiles = list(tiles_for_bbox([-77.10, 6.40, -76.10, 9.20], 8))
+        assert lonlat_to_tile(-76.62, 7.88, 8) in tiles
+        assert len(tiles) == len(set(tiles))
+
+    def test_static_layer_tile_served_from_cache(self, client, tmp_path, monkeypatch):
+        from src.backend.routers import layers
+        from src.backend.tile_cache import TileCache
+
+        cache = TileCache(str(tmp_path / "tiles.mbtiles"))
+        monkeypatch.setattr(layers, "_tile_cache", cache)
+        monkeypatch.setattr(layers, "_layer_version", lambda layer_id: "3")
+        monkeypatch.setattr(layers, "_layer_attributes", lambda layer_id: ["nombre"])
+        render = MagicMock(return_value=b"\x1a\x05tile")
+        monkeypatch.setattr(layers, "render_tile", render)
+
+        for _ in range(2):
+            resp = client.get("/api/layers/limite_municipal/tiles/8/76/123.mvt")
+            assert resp.status_code == 200
+            assert resp.content == b"\x1a\x05tile"
+        assert render.call_count == 1
+        assert cache.get("limite_municipal", "3", 8, 76, 123) == b"\x1a\x05tile"
+
+
+class TestGeometryDetail:
+    def test_zoom_maps_to_tolerance_and_digits(self):
+        from src.backend.spatial import FULL_PRECISION, geometry_detail
+
+        assert geometry_detail() == (None, FULL_PRECISION)
+        tol_low, digits_low = geometry_detail(zoom=6)
+        tol_high, digits_high = geometry_detail(zoom=14)
+        assert tol_low > tol_high > 0
+        assert digits_low < digits_high <= 8
+
+    def test_explicit_tolerance_wins(self):
+        from src.backend.spatial import geometry_detail
+
+        assert geometry_detail(zoom=6, tolerance=0.0001) == (0.0001, 5)
+
+    def test_lod_for_zoom_picks_finer_level(self):
+        from src.backend.spatial import lod_for_zoom
+
+        assert lod_for_zoom(5) == 6
+        assert lod_for_zoom(9) == 9
+        assert lod_for_zoom(10) == 12
+        assert lod_for_zoom(16) is None
+
+    def test_vias_zoom_simplifies(self, client, mock_engine):
+        conn = _mock_conn(mock_engine, (FC_TEXT,))
+        resp = client.get("/api/geo/vias?zoom=10")
+        assert resp.status_code == 200
+        sql = str(conn.execute.call_args[0][0])
+        assert "ST_SimplifyPreserveTopology(sub.geom" in sql
+        assert "ST_AsGeoJSON(ST_SimplifyPreserveTopology" in sql
+
+    def test_points_only_reduce_precision(self, client, mock_engine):
+        conn = _mock_conn(mock_engine, (FC_TEXT,))
+        client.get("/api/geo/places?zoom=10")
+        sql = str(conn.execute.call_args[0][0])
+        assert "ST_SimplifyPreserveTopology" not in sql
+        assert "ST_AsGeoJSON(sub.geom, 4)" in sql
+
+    def test_uraba_uses_precomputed_lod(self, client, mock_engine):
+        conn = _mock_conn(mock_engine, (FC_TEXT,))
+        with patch("src.backend.spatial.has_simplified", return_value=True):
+            client.get("/api/geo/uraba?zoom=8")
+        sql = str(conn.execute.call_args[0][0])
+        assert "cartografia.igac_uraba_simplified" in sql
+        assert "ST_SimplifyPreserveTopology" not in sql
+        assert conn.execute.call_args[0][1] == {"lod": 9}
+
+    def test_layer_lod_column_not_in_properties(self, client, mock_engine):
+        conn = _mock_conn(mock_engine, (FC_TEXT,))
+        with patch("src.backend.spatial.has_simplified", return_value=True):
+            client.get("/api/layers/igac_uraba/geojson?zoom=8")
+        sql = str(conn.execute.call_args[0][0])
+        assert "FROM cartografia.igac_uraba_simplified WHERE" in sql
+        assert "to_jsonb(sub) - 'geometry' - 'lod'" in sql
+
+
+class TestViewportFilter:
+    def test_bbox_pushes_intersects_predicate(self, client, mock_engine):
+        conn = _mock_conn(mock_engine, (FC_TEXT,))
+        resp = client.get("/api/geo/edificaciones?bbox=-76.64,7.87,-76.61,7.89")
+        assert resp.status_code == 200
+        sql = str(conn.execute.call_args[0][0])
+        assert "ST_Intersects(geom, ST_MakeEnvelope(" in sql
+        params = conn.execute.call_args[0][1]
+        assert params["bbox_minx"] == -76.64 and params["bbox_maxy"] == 7.89
+
+    @pytest.mark.parametrize("bbox", ["1,2,3", "a,b,c,d", "-76.6,7.9,-76.7,7.8", "0,0,200,1"])
+    def test_invalid_bbox_rejected(self, client, bbox):
+        resp = client.get(f"/api/geo/vias?bbox={bbox}")
+        assert resp.status_code == 400
+
+    def test_count_only_preflight(self, client):
+        with patch("src.backend.spatial.engine") as spatial_engine:
+            conn = _mock_conn(spatial_engine, None)
+            conn.execute.return_value.scalar.return_value = 1234
+            resp = client.get("/api/geo/places?bbox=-76.7,7.8,-76.6,7.9&count_only=true")
+        assert resp.status_code == 200
+        assert resp.json() == {"count": 1234}
+        sql = str(conn.execute.call_args[0][0])
+        assert sql.startswith("SELECT COUNT(*) FROM servicios.google_places_regional")
+        assert "ST_Intersects" in sql
+
+    def test_manzanas_count_error_not_a_feature_collection(self, client):
+        from sqlalchemy.exc import OperationalError
+
+        with patch("src.backend.spatial.engine") as spatial_engine:
+            conn = _mock_conn(spatial_engine, None)
+            conn.execute.side_effect = OperationalError("SELECT", {}, Exception("down"))
+            resp = client.get("/api/geo/manzanas?count_only=true")
+        assert resp.status_code == 503
+        assert "features" not in resp.json()
+
+    def test_layer_geojson_bbox(self, client, mock_engine):
+        conn = _mock_conn(mock_engine, (FC_TEXT,))
+        client.get("/api/layers/igac_uraba/geojson?bbox=-76.7,7.8,-76.6,7.9")
+        sql = str(conn.execute.call_args[0][0])
+        assert 'ST_Intersects("geometry", ST_MakeEnvelope(' in sql
+
+
+class TestPlacesHeatmap:
+    @pytest.fixture()
+    def geo_engine(self):
+        with patch("src.backend.routers.geo.engine") as mock:
+            yield mock
+
+    def test_grid_mode_aggregates_in_postgis(self, client, geo_engine):
+        conn = _mock_conn(geo_engine, None)
+        conn.execute.return_value.fetchall.return_value = [(7.88, -76.62, 120, 3)]
+        resp = client.get("/api/geo/places/heatmap?mode=grid&zoom=12")
+        assert resp.status_code == 200
+        assert resp.json() == [{"lat": 7.88, "lon": -76.62, "weight": 120, "count": 3}]
+        sql = str(conn.execute.call_args[0][0])
+        assert "ST_SnapToGrid(geom, :cell)" in sql
+        assert conn.execute.call_args[0][1]["cell"] > 0
+
+    def test_hex_mode_cached_per_zoom(self, client, geo_engine):
+        conn = _mock_conn(geo_engine, None)
+        conn.execute.return_value.fetchall.return_value = []
+        for _ in range(2):
+            assert client.get("/api/geo/places/heatmap?mode=hex&zoom=9").status_code == 200
+        assert conn.execute.call_count == 1
+        assert "ST_HexagonGrid" in str(conn.execute.call_args[0][0])
+        client.get("/api/geo/places/heatmap?mode=hex&zoom=11")
+        assert conn.execute.call_count == 2
+
+    def test_hex_index_computed_per_point(self, client, geo_engine):
+        conn = _mock_conn(geo_engine, None)
+        conn.execute.return_value.fetchall.return_value = []
+        client.get("/api/geo/places/heatmap?mode=hex&zoom=12")
+        sql = str(conn.execute.call_args[0][0])
+        assert "CROSS JOIN LATERAL ST_HexagonGrid(:cell, p.geom)" in sql
+        assert "ST_Extent" not in sql
+
+    def test_high_zoom_clamped(self, client, geo_engine):
+        from src.backend.spatial import HEATMAP_MAX_ZOOM, heatmap_cell_size
+
+        conn = _mock_conn(geo_engine, None)
+        conn.execute.return_value.fetchall.return_value = []
+        for zoom in (HEATMAP_MAX_ZOOM, 20, 22):
+            assert client.get(f"/api/geo/places/heatmap?mode=grid&zoom={zoom}").status_code == 200
+        # Same cell size, served from the cache after the first query
+        assert conn.execute.call_count == 1
+        assert conn.execute.call_args[0][1]["cell"] == heatmap_cell_size(HEATMAP_MAX_ZOOM)
+        assert heatmap_cell_size(22) == heatmap_cell_size(HEATMAP_MAX_ZOOM)
+
+    def test_invalid_mode_rejected(self, client):
+        assert client.get("/api/geo/places/heatmap?mode=h3").status_code == 422
+
+
+class TestPlacesDirectory:
+    def test_cursor_is_bound_to_sort_order(self, client, mock_query_dicts):
+        rows = [{"place_id": p, "name": n, "rating": None} for p, n in (("a", "Bar"), ("b", None))]
+        mock_query_dicts.side_effect = [rows]
+        data = client.get("/api/geo/places/directory?page_size=1&total=none").json()
+        assert data["total"] is None
+        cursor = data["next_cursor"]
+
+        mock_query_dicts.side_effect = [rows[1:], []]
+        resp = client.get(f"/api/geo/places/directory?page_size=1&cursor={cursor}")
+        assert resp.status_code == 200
+        sql, params = mock_query_dicts.call_args_list[-2][0]
+        assert "ORDER BY name ASC NULLS LAST, place_id ASC" in sql
+        assert "(name, place_id) > (:cur_v, :cur_id)" in sql
+        assert params["cur_v"] == "Bar" and params["cur_id"] == "a"
+
+        mock_query_dicts.side_effect = None
+        mock_query_dicts.return_value = []
+        resp = client.get(f"/api/geo/places/directory?sort_by=rating&cursor={cursor}")
+        assert resp.status_code == 400
+
+    def test_keyset_continues_into_null_tail(self, client, mock_query_dicts):
+        from src.backend.pagination import encode_cursor
+
+        mock_query_dicts.side_effect = [[{"place_id": "c", "rating": 3.5}],
+                                        [{"place_id": "z", "rating": None}]]
+        cursor = encode_cursor("rating:desc", [4.0, "d"])
+        data = client.get(f"/api/geo/places/directory?sort_by=rating&sort_order=desc"
+                          f"&page_size=2&cursor={cursor}").json()
+        assert [r["place_id"] for r in data["items"]] == ["c", "z"]
+        (sql, params), (tail_sql, tail_params) = [c[0] for c in mock_query_dicts.call_args_list]
+        assert "(rating, place_id) < (:cur_v, :cur_id)" in sql and params["lim"] == 3
+        assert "rating IS NULL" in tail_sql and tail_params["lim"] == 2
+
+        # Inside the tail only the tiebreaker advances, in a single query
+        mock_query_dicts.reset_mock()
+        mock_query_dicts.side_effect = [[]]
+        cursor = encode_cursor("rating:desc", [None, "z"])
+        client.get(f"/api/geo/places/directory?sort_by=rating&sort_order=desc&cursor={cursor}")
+        sql, params = mock_query_dicts.call_args[0]
+        assert "(rating IS NULL AND place_id < :cur_id)" in sql
+        assert mock_query_dicts.call_count == 1
+
+    def test_estimated_total_uses_planner(self, client, mock_query_dicts):
+        mock_query_dicts.return_value = []
+        with patch("src.backend.pagination.engine") as engine:
+            conn = engine.connect.return_value.__enter__.return_value
+            conn.execute.return_value.scalar.return_value = [{"Plan": {"Plan Rows": 420}}]
+            data = client.get("/api/geo/places/directory?total=estimate").json()
+        assert data["total"] == 420 and data["total_mode"] == "estimate"
+        assert str(conn.execute.call_args[0][0]).startswith("EXPLAIN (FORMAT JSON)")
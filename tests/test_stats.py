@@ -0,0 +1,84 @@
+"""Tests for the stats router (executive summary)."""
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.backend.routers import stats
+
+
+@pytest.fixture()
+def stats_conn():
+    conn = MagicMock()
+    conn.__enter__ = MagicMock(return_value=conn)
+    conn.__exit__ = MagicMock(return_value=False)
+    with patch("src.backend.routers.stats.engine") as eng:
+        eng.connect.return_value = conn
+        yield conn
+
+
+def _row(**overrides):
+    row = {key: None for key, _, _, _ in stats.SUMMARY_AGGREGATES}
+    row.update(terridata=None, hechos=None)
+    row.update(overrides)
+    return row
+
+
+class TestSummary:
+    def test_single_round_trip(self, client, stats_conn):
+        stats_conn.execute.return_value.mappings.return_value.fetchone.return_value = _row(
+            manzanas_censales=1200, establecimientos_comerciales=350, homicidios=Decimal("42"),
+            icfes=Decimal("251.37"), victimas=900,
+            terridata=[[stats.TD_POBLACION, 130000, 2024], [stats.TD_HURTOS, 100.0, 2023]],
+            hechos=[["Desplazamiento", 800], ["Homicidio", 100]],
+        )
+        everything = frozenset(t for _, t, _, _ in stats.SUMMARY_AGGREGATES) | {stats.TERRIDATA_TABLE}
+        with patch("src.backend.routers.stats._existing_tables", return_value=everything):
+            data = client.get("/api/stats/summary?dane_code=5045").json()
+
+        assert stats_conn.execute.call_count == 1
+        sql = str(stats_conn.execute.call_args[0][0])
+        assert sql.startswith("WITH td AS")
+        assert stats_conn.execute.call_args[0][1]["dane"] == "05045"
+        assert data["municipio"] == "Apartadó"
+        assert data["poblacion_total"] == 130000
+        assert data["poblacion_anio"] == 2024
+        assert data["manzanas_censales"] == 1200
+        assert data["total_homicidios"] == 42
+        # Sin tabla de hurtos con datos: tasa TerriData × población
+        assert data["total_hurtos"] == 130
+        assert data["total_vif"] == 0
+        assert data["icfes"] == {"promedio_global": 251.4}
+        assert data["principales_hechos_victimizantes"][0] == {"hecho": "Desplazamiento", "personas": 800}
+
+    def test_missing_tables_become_null(self, client, stats_conn):
+        stats_conn.execute.return_value.mappings.return_value.fetchone.return_value = _row()
+        with patch("src.backend.routers.stats._existing_tables",
+                   return_value=frozenset({"cartografia.manzanas_censales"})):
+            data = client.get("/api/stats/summary").json()
+        sql = str(stats_conn.execute.call_args[0][0])
+        assert "NULL AS ips_salud" in sql
+        assert "FROM cartografia.manzanas_censales" in sql
+        assert data["divipola"] == "REGIONAL"
+        assert data["ips_salud"] == 0
+        assert data["principales_hechos_victimizantes"] == []
+
+    def test_falls_back_to_sequential_queries(self, client, stats_conn):
+        calls = []
+
+        def execute(stmt, params=None):
+            calls.append(str(stmt))
+            if len(calls) == 1:
+                raise RuntimeError("column does not exist")
+            result = MagicMock()
+            result.fetchone.return_value = (7,) if "ips_salud" in str(stmt) else None
+            result.fetchall.return_value = []
+            return result
+
+        stats_conn.execute.side_effect = execute
+        with patch("src.backend.routers.stats._existing_tables", return_value=frozenset()):
+            data = client.get("/api/stats/summary?dane_code=05837").json()
+        stats_conn.rollback.assert_called_once()
+        assert len(calls) > len(stats.SUMMARY_AGGREGATES)
+        assert data["ips_salud"] == 7
+        assert data["manzanas_censales"] == 0